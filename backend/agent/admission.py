@@ -0,0 +1,144 @@
+"""
+Admission control for agent runs.
+
+Each account may only have a limited number of runs active (queued or
+executing) at once, depending on its subscription tier. Runs beyond that
+limit are rejected with a 429 and a Retry-After header instead of being
+queued, so one account can't fill the run queue. When the queue as a whole is
+backed up, new runs are rejected with a 503.
+
+Admitted runs are queued on the queue of their tier, and workers claim from
+the tier queues weighted by TIER_LIMITS, so higher tiers get a larger share of
+the workers while lower tiers still make progress.
+
+Redis keys:
+    account:{id}:active_runs          Admitted runs of an account, mapped to their admission time
+"""
+
+import time
+from typing import Dict, Optional
+
+from fastapi import HTTPException
+
+from agent import scheduler
+from services import redis
+from services.billing import get_subscription_tier
+from utils.config import config, EnvMode
+from utils.logger import logger
+
+# Concurrent runs per account and claim weight of the tier queue, by tier name
+TIER_LIMITS = {
+    'free': {'max_runs': 2, 'weight': 1},
+    'tier_2_20': {'max_runs': 2, 'weight': 2},
+    'tier_6_50': {'max_runs': 3, 'weight': 3},
+    'tier_12_100': {'max_runs': 5, 'weight': 4},
+    'tier_25_200': {'max_runs': 8, 'weight': 6},
+    'tier_50_400': {'max_runs': 12, 'weight': 8},
+    'tier_125_800': {'max_runs': 20, 'weight': 10},
+    'tier_200_1000': {'max_runs': 25, 'weight': 12},
+}
+DEFAULT_TIER = 'free'
+
+RETRY_AFTER_SECONDS = 30  # Retry-After sent with rejected runs
+ADMISSION_GRACE = 120     # Seconds an admitted run may take to be queued before it counts as stale
+
+# Drops stale runs (past the grace period and no longer scheduled), counts the
+# remaining ones and claims a slot if one is free, all atomically so concurrent
+# requests neither both take nor both miss the last slot. The job keys are
+# built in the script, so this assumes a single Redis node.
+# KEYS: active runs. ARGV: run ID, now, max runs, grace, ttl, job key format.
+# Returns {admitted (0/1), other active runs, pruned runs}.
+ADMIT_SCRIPT = """
+local now = tonumber(ARGV[2])
+local grace = tonumber(ARGV[4])
+local active = 0
+local pruned = 0
+local runs = redis.call('HGETALL', KEYS[1])
+for i = 1, #runs, 2 do
+    local agent_run_id = runs[i]
+    local admitted_at = tonumber(runs[i + 1]) or 0
+    if now - admitted_at >= grace and redis.call('EXISTS', string.format(ARGV[6], agent_run_id)) == 0 then
+        redis.call('HDEL', KEYS[1], agent_run_id)
+        pruned = pruned + 1
+    elseif agent_run_id ~= ARGV[1] then
+        active = active + 1
+    end
+end
+if active >= tonumber(ARGV[3]) then
+    return {0, active, pruned}
+end
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[5])
+return {1, active, pruned}
+"""
+
+
+def _active_runs_key(account_id: str) -> str:
+    return f"account:{account_id}:active_runs"
+
+
+def get_run_tier(subscription: Optional[Dict]) -> str:
+    """Name of the tier that the runs of a subscription are admitted and queued under."""
+    if config.ENV_MODE == EnvMode.LOCAL:
+        return DEFAULT_TIER
+    tier = get_subscription_tier(subscription)['name']
+    return tier if tier in TIER_LIMITS else DEFAULT_TIER
+
+
+def queue_weights() -> Dict[str, int]:
+    """Claim weight of each tier queue, for the RunWorker."""
+    return {tier: limits['weight'] for tier, limits in TIER_LIMITS.items()}
+
+
+async def admit_run(account_id: str, agent_run_id: str, tier: str) -> None:
+    """Admit a new run of an account, or reject it.
+
+    Must be called before the run is created; release_run has to be called once
+    it ends.
+
+    Raises:
+        HTTPException: 503 if the run queue is full, 429 if the account already
+            has as many active runs as its tier allows
+    """
+    if config.ENV_MODE == EnvMode.LOCAL:
+        return
+
+    queued_runs = await scheduler.queued_run_count(TIER_LIMITS)
+    if queued_runs >= config.AGENT_MAX_QUEUED_RUNS:
+        logger.warning(f"Rejecting agent run for account {account_id}: {queued_runs} runs queued")
+        raise HTTPException(
+            status_code=503,
+            detail={"message": "Agents are at capacity right now. Please try again shortly."},
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+        )
+
+    max_runs = TIER_LIMITS.get(tier, TIER_LIMITS[DEFAULT_TIER])['max_runs']
+    # Runs that ended without being released (e.g. their worker was killed) are pruned
+    admitted, active_runs, pruned = await redis.eval_script(
+        ADMIT_SCRIPT,
+        [_active_runs_key(account_id)],
+        [agent_run_id, time.time(), max_runs, ADMISSION_GRACE, redis.REDIS_KEY_TTL, scheduler.job_key_format()]
+    )
+    if pruned:
+        logger.info(f"Released {pruned} stale agent runs of account {account_id}")
+    if not admitted:
+        logger.info(f"Rejecting agent run for account {account_id}: {active_runs} of {max_runs} runs active")
+        raise HTTPException(
+            status_code=429,
+            detail={
+                "message": f"Your plan allows {max_runs} agents running at the same time. Stop one or wait for it to finish.",
+                "active_runs": active_runs,
+                "max_runs": max_runs
+            },
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+        )
+
+
+async def release_run(account_id: Optional[str], agent_run_id: str) -> None:
+    """Free the slot of a run that ended."""
+    if not account_id or config.ENV_MODE == EnvMode.LOCAL:
+        return
+    try:
+        await redis.hdel(_active_runs_key(account_id), agent_run_id)
+    except Exception as e:
+        logger.warning(f"Failed to release agent run {agent_run_id} of account {account_id}: {e}")
@@ -12,11 +12,15 @@ import tempfile
 import os
 
 from agentpress.thread_manager import ThreadManager
+from agentpress.chunk_aggregator import aggregate_content_chunks
 from services.supabase import DBConnection
 from services import redis
 from agent.run import run_agent
+from agent import scheduler, admission
+from agent.checkpoint import delete_checkpoint
 from utils.auth_utils import get_current_user_id_from_jwt, get_user_id_from_stream_auth, verify_thread_access
 from utils.logger import logger
+from utils.json_utils import loads, encode_message
 from services.billing import check_billing_status
 from utils.config import config
 from sandbox.sandbox import create_sandbox, get_or_start_sandbox
@@ -27,10 +31,14 @@ router = APIRouter()
 thread_manager = None
 db = None
 instance_id = None # Global instance ID for this backend instance
+run_worker: Optional[scheduler.RunWorker] = None # Executes queued runs in this process, if enabled
 
 # TTL for Redis response lists (24 hours)
 REDIS_RESPONSE_LIST_TTL = 3600 * 24
 
+# How often a running agent refreshes the TTL of its active run key (seconds)
+ACTIVE_RUN_KEY_REFRESH_INTERVAL = 60
+
 MODEL_NAME_ALIASES = {
     # Short names to full names
     "sonnet-3.7": "anthropic/claude-3-7-sonnet-latest",
@@ -88,10 +96,30 @@ def initialize(
 
     # Note: Redis will be initialized in the lifespan function in api.py
 
+async def start_run_worker():
+    """Start executing queued agent runs in this process, using the instance ID as worker ID."""
+    global run_worker
+    run_worker = scheduler.RunWorker(
+        worker_id=instance_id,
+        execute_run=execute_scheduled_run,
+        fail_run=fail_scheduled_run,
+        max_runs=config.AGENT_WORKER_MAX_RUNS,
+        min_free_memory_mb=config.AGENT_WORKER_MIN_FREE_MEMORY_MB,
+        queue_weights=admission.queue_weights()
+    )
+    await run_worker.start()
+
 async def cleanup():
     """Clean up resources and stop running agents on shutdown."""
     logger.info("Starting cleanup of agent API resources")
 
+    # Interrupt this worker's runs and put them back on the queue for other workers
+    if run_worker:
+        try:
+            await run_worker.stop()
+        except Exception as e:
+            logger.error(f"Failed to stop agent worker {instance_id}: {str(e)}")
+
     # Use the instance_id to find and clean up this instance's keys
     try:
         if instance_id: # Ensure instance_id is set
@@ -179,12 +207,21 @@ async def stop_agent_run(agent_run_id: str, error_message: Optional[str] = None)
     client = await db.client
     final_status = "failed" if error_message else "stopped"
 
+    # A run no worker has claimed yet just leaves the queue, and frees its slot
+    try:
+        queued_job = await scheduler.cancel_queued_run(agent_run_id)
+        if queued_job:
+            await admission.release_run(queued_job.get('account_id'), agent_run_id)
+    except Exception as e:
+        logger.warning(f"Failed to remove agent run {agent_run_id} from the queue: {str(e)}")
+    await delete_checkpoint(agent_run_id)
+
     # Attempt to fetch final responses from Redis
     response_list_key = f"agent_run:{agent_run_id}:responses"
     all_responses = []
     try:
         all_responses_json = await redis.lrange(response_list_key, 0, -1)
-        all_responses = [json.loads(r) for r in all_responses_json]
+        all_responses = [loads(r) for r in all_responses_json]
         logger.info(f"Fetched {len(all_responses)} responses from Redis for DB update on stop/fail: {agent_run_id}")
     except Exception as e:
         logger.error(f"Failed to fetch responses from Redis for {agent_run_id} during stop/fail: {e}")
@@ -244,13 +281,29 @@ async def _cleanup_redis_response_list(agent_run_id: str):
         logger.warning(f"Failed to set TTL on response list {response_list_key}: {str(e)}")
 
 async def restore_running_agent_runs():
-    """Mark agent runs that were still 'running' in the database as failed and clean up Redis resources."""
+    """Mark agent runs that were still 'running' in the database as failed and clean up Redis resources.
+
+    Runs the scheduler still tracks are left alone: they are queued or owned by a live
+    worker, and the runs of dead workers are requeued here first.
+    """
     logger.info("Restoring running agent runs after server restart")
     client = await db.client
+    try:
+        requeued = await scheduler.reap_dead_workers()
+        if requeued:
+            logger.info(f"Requeued {requeued} agent runs of dead workers")
+    except Exception as e:
+        logger.error(f"Failed to reap dead agent workers: {e}")
     running_agent_runs = await client.table('agent_runs').select('id').eq("status", "running").execute()
 
     for run in running_agent_runs.data:
         agent_run_id = run['id']
+        try:
+            if await scheduler.is_scheduled(agent_run_id):
+                continue
+        except Exception as e:
+            logger.error(f"Failed to check whether agent run {agent_run_id} is scheduled: {e}")
+            continue
         logger.warning(f"Found running agent run {agent_run_id} from before server restart")
 
         # Clean up Redis resources for this run
@@ -406,40 +459,36 @@ async def start_agent(
     if active_run_id:
         logger.info(f"Stopping existing agent run {active_run_id} for project {project_id}")
         await stop_agent_run(active_run_id)
+        await admission.release_run(account_id, active_run_id)
+
+    # Reserve one of the account's concurrent runs before creating the run
+    tier = admission.get_run_tier(subscription)
+    agent_run_id = str(uuid.uuid4())
+    await admission.admit_run(account_id, agent_run_id, tier)
 
     try:
-        sandbox, sandbox_id, sandbox_pass = await get_or_create_project_sandbox(client, project_id)
-    except Exception as e:
-        logger.error(f"Failed to get/create sandbox for project {project_id}: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Failed to initialize sandbox: {str(e)}")
-
-    agent_run = await client.table('agent_runs').insert({
-        "thread_id": thread_id, "status": "running",
-        "started_at": datetime.now(timezone.utc).isoformat()
-    }).execute()
-    agent_run_id = agent_run.data[0]['id']
-    logger.info(f"Created new agent run: {agent_run_id}")
-
-    # Register this run in Redis with TTL using instance ID
-    instance_key = f"active_run:{instance_id}:{agent_run_id}"
-    try:
-        await redis.set(instance_key, "running", ex=redis.REDIS_KEY_TTL)
-    except Exception as e:
-        logger.warning(f"Failed to register agent run in Redis ({instance_key}): {str(e)}")
-
-    # Run the agent in the background
-    task = asyncio.create_task(
-        run_agent_background(
-            agent_run_id=agent_run_id, thread_id=thread_id, instance_id=instance_id,
-            project_id=project_id, sandbox=sandbox,
-            model_name=model_name,  # Already resolved above
-            enable_thinking=body.enable_thinking, reasoning_effort=body.reasoning_effort,
-            stream=body.stream, enable_context_manager=body.enable_context_manager
-        )
-    )
+        try:
+            sandbox, sandbox_id, sandbox_pass = await get_or_create_project_sandbox(client, project_id)
+        except Exception as e:
+            logger.error(f"Failed to get/create sandbox for project {project_id}: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Failed to initialize sandbox: {str(e)}")
+
+        await client.table('agent_runs').insert({
+            "id": agent_run_id, "thread_id": thread_id, "status": "running",
+            "started_at": datetime.now(timezone.utc).isoformat()
+        }).execute()
+        logger.info(f"Created new agent run: {agent_run_id}")
 
-    # Set a callback to clean up Redis instance key when task is done
-    task.add_done_callback(lambda _: asyncio.create_task(_cleanup_redis_instance_key(agent_run_id)))
+        # Queue the run for an agent worker
+        await scheduler.enqueue_run(agent_run_id, {
+            "thread_id": thread_id, "project_id": project_id, "account_id": account_id,
+            "model_name": model_name,  # Already resolved above
+            "enable_thinking": body.enable_thinking, "reasoning_effort": body.reasoning_effort,
+            "stream": body.stream, "enable_context_manager": body.enable_context_manager
+        }, queue=tier)
+    except Exception:
+        await admission.release_run(account_id, agent_run_id)
+        raise
 
     return {"agent_run_id": agent_run_id, "status": "running"}
 
@@ -478,6 +527,19 @@ async def get_agent_run(agent_run_id: str, user_id: str = Depends(get_current_us
         "error": agent_run_data['error']
     }
 
+def _get_terminal_status(response_json: str) -> Optional[str]:
+    """Return the status if a serialized response ends the run, otherwise None.
+
+    Only responses with a top-level "status" key are parsed; in all other responses
+    (content chunks, tool results) the key can only appear escaped inside a string.
+    """
+    if '"status"' not in response_json:
+        return None
+    response = loads(response_json)
+    if response.get('type') == 'status' and response.get('status') in ['completed', 'failed', 'stopped']:
+        return response.get('status')
+    return None
+
 @router.get("/agent-run/{agent_run_id}/stream")
 async def stream_agent_run(
     agent_run_id: str,
@@ -498,22 +560,19 @@ async def stream_agent_run(
     async def stream_generator():
         logger.debug(f"Streaming responses for {agent_run_id} using Redis list {response_list_key} and channel {response_channel}")
         last_processed_index = -1
-        pubsub_response = None
-        pubsub_control = None
-        listener_task = None
+        subscription = None
         terminate_stream = False
         initial_yield_complete = False
 
         try:
             # 1. Fetch and yield initial responses from Redis list
+            # Responses are stored already serialized and are forwarded as is
             initial_responses_json = await redis.lrange(response_list_key, 0, -1)
-            initial_responses = []
             if initial_responses_json:
-                initial_responses = [json.loads(r) for r in initial_responses_json]
-                logger.debug(f"Sending {len(initial_responses)} initial responses for {agent_run_id}")
-                for response in initial_responses:
-                    yield f"data: {json.dumps(response)}\n\n"
-                last_processed_index = len(initial_responses) - 1
+                logger.debug(f"Sending {len(initial_responses_json)} initial responses for {agent_run_id}")
+                for response_json in initial_responses_json:
+                    yield f"data: {response_json}\n\n"
+                last_processed_index = len(initial_responses_json) - 1
             initial_yield_complete = True
 
             # 2. Check run status *after* yielding initial data
@@ -522,102 +581,48 @@ async def stream_agent_run(
 
             if current_status != 'running':
                 logger.info(f"Agent run {agent_run_id} is not running (status: {current_status}). Ending stream.")
+                # Status messages stay on json.dumps; the frontend matches some of them by exact text
                 yield f"data: {json.dumps({'type': 'status', 'status': 'completed'})}\n\n"
                 return
 
-            # 3. Set up Pub/Sub listeners for new responses and control signals
-            pubsub_response = await redis.create_pubsub()
-            await pubsub_response.subscribe(response_channel)
-            logger.debug(f"Subscribed to response channel: {response_channel}")
-
-            pubsub_control = await redis.create_pubsub()
-            await pubsub_control.subscribe(control_channel)
-            logger.debug(f"Subscribed to control channel: {control_channel}")
+            # 3. Subscribe to new responses and control signals on the shared pubsub connection
+            subscription = await redis.subscribe(response_channel, control_channel)
+            logger.debug(f"Subscribed to response channel {response_channel} and control channel {control_channel}")
 
-            # Queue to communicate between listeners and the main generator loop
-            message_queue = asyncio.Queue()
-
-            async def listen_messages():
-                response_reader = pubsub_response.listen()
-                control_reader = pubsub_control.listen()
-                tasks = [asyncio.create_task(response_reader.__anext__()), asyncio.create_task(control_reader.__anext__())]
-
-                while not terminate_stream:
-                    done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
-                    for task in done:
-                        try:
-                            message = task.result()
-                            if message and isinstance(message, dict) and message.get("type") == "message":
-                                channel = message.get("channel")
-                                data = message.get("data")
-                                if isinstance(data, bytes): data = data.decode('utf-8')
-
-                                if channel == response_channel and data == "new":
-                                    await message_queue.put({"type": "new_response"})
-                                elif channel == control_channel and data in ["STOP", "END_STREAM", "ERROR"]:
-                                    logger.info(f"Received control signal '{data}' for {agent_run_id}")
-                                    await message_queue.put({"type": "control", "data": data})
-                                    return # Stop listening on control signal
-
-                        except StopAsyncIteration:
-                            logger.warning(f"Listener {task} stopped.")
-                            # Decide how to handle listener stopping, maybe terminate?
-                            await message_queue.put({"type": "error", "data": "Listener stopped unexpectedly"})
-                            return
-                        except Exception as e:
-                            logger.error(f"Error in listener for {agent_run_id}: {e}")
-                            await message_queue.put({"type": "error", "data": "Listener failed"})
-                            return
-                        finally:
-                            # Reschedule the completed listener task
-                            if task in tasks:
-                                tasks.remove(task)
-                                if message and isinstance(message, dict) and message.get("channel") == response_channel:
-                                     tasks.append(asyncio.create_task(response_reader.__anext__()))
-                                elif message and isinstance(message, dict) and message.get("channel") == control_channel:
-                                     tasks.append(asyncio.create_task(control_reader.__anext__()))
-
-                # Cancel pending listener tasks on exit
-                for p_task in pending: p_task.cancel()
-                for task in tasks: task.cancel()
-
-
-            listener_task = asyncio.create_task(listen_messages())
-
-            # 4. Main loop to process messages from the queue
+            # 4. Main loop to process messages from the subscription
             while not terminate_stream:
                 try:
-                    queue_item = await message_queue.get()
+                    message = await subscription.get()
+                    channel, data = message.get("channel"), message.get("data")
 
-                    if queue_item["type"] == "new_response":
+                    if channel == response_channel and data == "new":
                         # Fetch new responses from Redis list starting after the last processed index
                         new_start_index = last_processed_index + 1
                         new_responses_json = await redis.lrange(response_list_key, new_start_index, -1)
 
                         if new_responses_json:
-                            new_responses = [json.loads(r) for r in new_responses_json]
-                            num_new = len(new_responses)
+                            num_new = len(new_responses_json)
                             # logger.debug(f"Received {num_new} new responses for {agent_run_id} (index {new_start_index} onwards)")
-                            for response in new_responses:
-                                yield f"data: {json.dumps(response)}\n\n"
+                            for response_json in new_responses_json:
+                                yield f"data: {response_json}\n\n"
                                 # Check if this response signals completion
-                                if response.get('type') == 'status' and response.get('status') in ['completed', 'failed', 'stopped']:
-                                    logger.info(f"Detected run completion via status message in stream: {response.get('status')}")
+                                terminal_status = _get_terminal_status(response_json)
+                                if terminal_status:
+                                    logger.info(f"Detected run completion via status message in stream: {terminal_status}")
                                     terminate_stream = True
                                     break # Stop processing further new responses
                             last_processed_index += num_new
                         if terminate_stream: break
 
-                    elif queue_item["type"] == "control":
-                        control_signal = queue_item["data"]
-                        terminate_stream = True # Stop the stream on any control signal
-                        yield f"data: {json.dumps({'type': 'status', 'status': control_signal})}\n\n"
-                        break
+                    elif channel == response_channel and data.startswith("rewind:"):
+                        # A resumed run dropped the responses of its interrupted iteration
+                        response_offset = int(data.split(":", 1)[1])
+                        last_processed_index = min(last_processed_index, response_offset - 1)
 
-                    elif queue_item["type"] == "error":
-                        logger.error(f"Listener error for {agent_run_id}: {queue_item['data']}")
-                        terminate_stream = True
-                        yield f"data: {json.dumps({'type': 'status', 'status': 'error'})}\n\n"
+                    elif channel == control_channel and data in ["STOP", "END_STREAM", "ERROR"]:
+                        logger.info(f"Received control signal '{data}' for {agent_run_id}")
+                        terminate_stream = True # Stop the stream on any control signal
+                        yield f"data: {json.dumps({'type': 'status', 'status': data})}\n\n"
                         break
 
                 except asyncio.CancelledError:
@@ -637,22 +642,8 @@ async def stream_agent_run(
                  yield f"data: {json.dumps({'type': 'status', 'status': 'error', 'message': f'Failed to start stream: {e}'})}\n\n"
         finally:
             terminate_stream = True
-            # Graceful shutdown order: unsubscribe → close → cancel
-            if pubsub_response: await pubsub_response.unsubscribe(response_channel)
-            if pubsub_control: await pubsub_control.unsubscribe(control_channel)
-            if pubsub_response: await pubsub_response.close()
-            if pubsub_control: await pubsub_control.close()
-
-            if listener_task:
-                listener_task.cancel()
-                try:
-                    await listener_task  # Reap inner tasks & swallow their errors
-                except asyncio.CancelledError:
-                    pass
-                except Exception as e:
-                    logger.debug(f"listener_task ended with: {e}")
-            # Wait briefly for tasks to cancel
-            await asyncio.sleep(0.1)
+            if subscription:
+                await subscription.close()
             logger.debug(f"Streaming cleanup complete for agent run: {agent_run_id}")
 
     return StreamingResponse(stream_generator(), media_type="text/event-stream", headers={
@@ -661,12 +652,34 @@ async def stream_agent_run(
         "Access-Control-Allow-Origin": "*"
     })
 
+async def execute_scheduled_run(agent_run_id: str, job: Dict[str, Any]):
+    """Execute a run claimed from the scheduler queue on this instance."""
+    client = await db.client
+    run_status = await client.table('agent_runs').select('status').eq("id", agent_run_id).maybe_single().execute()
+    if not run_status.data or run_status.data.get('status') != 'running':
+        logger.info(f"Skipping agent run {agent_run_id}, it is no longer running")
+        await admission.release_run(job.get('account_id'), agent_run_id)
+        return
+
+    await run_agent_background(
+        agent_run_id=agent_run_id, thread_id=job['thread_id'], instance_id=instance_id,
+        project_id=job['project_id'], model_name=job['model_name'],
+        enable_thinking=job.get('enable_thinking'), reasoning_effort=job.get('reasoning_effort'),
+        stream=job.get('stream', True), enable_context_manager=job.get('enable_context_manager', False)
+    )
+    # Not reached when the worker shuts down mid-run (cancellation), as the run is requeued then
+    await admission.release_run(job.get('account_id'), agent_run_id)
+
+async def fail_scheduled_run(agent_run_id: str, job: Dict[str, Any], error_message: str):
+    """Fail a claimed run that can't be executed, e.g. after too many interrupted attempts."""
+    await stop_agent_run(agent_run_id, error_message=error_message)
+    await admission.release_run(job.get('account_id'), agent_run_id)
+
 async def run_agent_background(
     agent_run_id: str,
     thread_id: str,
     instance_id: str, # Use the global instance ID passed during initialization
     project_id: str,
-    sandbox,
     model_name: str,
     enable_thinking: Optional[bool],
     reasoning_effort: Optional[str],
@@ -680,9 +693,13 @@ async def run_agent_background(
     client = await db.client
     start_time = datetime.now(timezone.utc)
     total_responses = 0
-    pubsub = None
-    stop_checker = None
-    stop_signal_received = False
+    final_status = "running"
+    control_subscription = None
+    stop_listener = None
+    key_refresher = None
+    agent_task = None
+    stop_waiter = None
+    stop_event = asyncio.Event()
 
     # Define Redis keys and channels
     response_list_key = f"agent_run:{agent_run_id}:responses"
@@ -691,72 +708,94 @@ async def run_agent_background(
     global_control_channel = f"agent_run:{agent_run_id}:control"
     instance_active_key = f"active_run:{instance_id}:{agent_run_id}"
 
-    async def check_for_stop_signal():
-        nonlocal stop_signal_received
-        if not pubsub: return
+    async def listen_for_stop_signal():
+        """Set stop_event when a STOP signal arrives on the control channels."""
         try:
-            while not stop_signal_received:
-                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=0.5)
-                if message and message.get("type") == "message":
-                    data = message.get("data")
-                    if isinstance(data, bytes): data = data.decode('utf-8')
-                    if data == "STOP":
-                        logger.info(f"Received STOP signal for agent run {agent_run_id} (Instance: {instance_id})")
-                        stop_signal_received = True
-                        break
-                # Periodically refresh the active run key TTL
-                if total_responses % 50 == 0: # Refresh every 50 responses or so
-                    try: await redis.expire(instance_active_key, redis.REDIS_KEY_TTL)
-                    except Exception as ttl_err: logger.warning(f"Failed to refresh TTL for {instance_active_key}: {ttl_err}")
-                await asyncio.sleep(0.1) # Short sleep to prevent tight loop
+            async for message in control_subscription.listen():
+                if message.get("data") == "STOP":
+                    logger.info(f"Received STOP signal for agent run {agent_run_id} (Instance: {instance_id})")
+                    stop_event.set()
+                    return
         except asyncio.CancelledError:
-            logger.info(f"Stop signal checker cancelled for {agent_run_id} (Instance: {instance_id})")
+            logger.debug(f"Stop signal listener cancelled for {agent_run_id} (Instance: {instance_id})")
         except Exception as e:
-            logger.error(f"Error in stop signal checker for {agent_run_id}: {e}", exc_info=True)
-            stop_signal_received = True # Stop the run if the checker fails
+            logger.error(f"Error in stop signal listener for {agent_run_id}: {e}", exc_info=True)
+            stop_event.set() # Stop the run if the listener fails
+
+    async def refresh_active_run_key():
+        """Keep the active run key alive for as long as the run is going."""
+        while True:
+            await asyncio.sleep(ACTIVE_RUN_KEY_REFRESH_INTERVAL)
+            try: await redis.expire(instance_active_key, redis.REDIS_KEY_TTL)
+            except Exception as ttl_err: logger.warning(f"Failed to refresh TTL for {instance_active_key}: {ttl_err}")
+
+    async def publish_responses(agent_gen):
+        """Store and publish the agent's responses.
+
+        Returns:
+            Tuple of the final status ("running" if the agent didn't signal one) and error message
+        """
+        nonlocal total_responses
+        async for response in agent_gen:
+            # Store response in Redis list and publish notification
+            response_json = encode_message(response)
+            await redis.rpush(response_list_key, response_json)
+            await redis.publish(response_channel, "new")
+            total_responses += 1
+
+            # Check for agent-signaled completion or error
+            if response.get('type') == 'status':
+                 status_val = response.get('status')
+                 if status_val in ['completed', 'failed', 'stopped']:
+                     logger.info(f"Agent run {agent_run_id} finished via status message: {status_val}")
+                     error_message = None
+                     if status_val == 'failed' or status_val == 'stopped':
+                         error_message = response.get('message', f"Run ended with status: {status_val}")
+                     return status_val, error_message
+        return "running", None
 
     try:
         # Setup Pub/Sub listener for control signals
-        pubsub = await redis.create_pubsub()
-        await pubsub.subscribe(instance_control_channel, global_control_channel)
+        control_subscription = await redis.subscribe(instance_control_channel, global_control_channel)
         logger.debug(f"Subscribed to control channels: {instance_control_channel}, {global_control_channel}")
-        stop_checker = asyncio.create_task(check_for_stop_signal())
+        stop_listener = asyncio.create_task(listen_for_stop_signal())
 
         # Ensure active run key exists and has TTL
         await redis.set(instance_active_key, "running", ex=redis.REDIS_KEY_TTL)
+        key_refresher = asyncio.create_task(refresh_active_run_key())
 
         # Initialize agent generator
         agent_gen = run_agent(
             thread_id=thread_id, project_id=project_id, stream=stream,
             thread_manager=thread_manager, model_name=model_name,
             enable_thinking=enable_thinking, reasoning_effort=reasoning_effort,
-            enable_context_manager=enable_context_manager
+            enable_context_manager=enable_context_manager, agent_run_id=agent_run_id
+        )
+        # Merge the LLM's small content deltas before they're published
+        agent_gen = aggregate_content_chunks(
+            agent_gen,
+            window_ms=config.AGENT_STREAM_AGGREGATION_WINDOW_MS,
+            max_bytes=config.AGENT_STREAM_AGGREGATION_MAX_BYTES
         )
 
         final_status = "running"
         error_message = None
 
-        async for response in agent_gen:
-            if stop_signal_received:
-                logger.info(f"Agent run {agent_run_id} stopped by signal.")
-                final_status = "stopped"
-                break
+        # Run the agent until it finishes or a STOP signal arrives. Stopping cancels the
+        # agent task, which interrupts the LLM stream or tool calls it is waiting on.
+        agent_task = asyncio.create_task(publish_responses(agent_gen))
+        stop_waiter = asyncio.create_task(stop_event.wait())
+        await asyncio.wait([agent_task, stop_waiter], return_when=asyncio.FIRST_COMPLETED)
 
-            # Store response in Redis list and publish notification
-            response_json = json.dumps(response)
-            await redis.rpush(response_list_key, response_json)
-            await redis.publish(response_channel, "new")
-            total_responses += 1
-
-            # Check for agent-signaled completion or error
-            if response.get('type') == 'status':
-                 status_val = response.get('status')
-                 if status_val in ['completed', 'failed', 'stopped']:
-                     logger.info(f"Agent run {agent_run_id} finished via status message: {status_val}")
-                     final_status = status_val
-                     if status_val == 'failed' or status_val == 'stopped':
-                         error_message = response.get('message', f"Run ended with status: {status_val}")
-                     break
+        if agent_task.done():
+            final_status, error_message = agent_task.result()
+        else:
+            logger.info(f"Agent run {agent_run_id} stopped by signal.")
+            final_status = "stopped"
+            agent_task.cancel()
+            try: await agent_task
+            except asyncio.CancelledError: pass
+            except Exception as e: logger.warning(f"Error while cancelling agent run {agent_run_id}: {e}")
 
         # If loop finished without explicit completion/error/stop signal, mark as completed
         if final_status == "running":
@@ -764,12 +803,14 @@ async def run_agent_background(
              duration = (datetime.now(timezone.utc) - start_time).total_seconds()
              logger.info(f"Agent run {agent_run_id} completed normally (duration: {duration:.2f}s, responses: {total_responses})")
              completion_message = {"type": "status", "status": "completed", "message": "Agent run completed successfully"}
+             # Keep json.dumps here, not utils.json_utils.dumps: useAgentStream matches this
+             # message by its exact text, including json.dumps' spacing
              await redis.rpush(response_list_key, json.dumps(completion_message))
              await redis.publish(response_channel, "new") # Notify about the completion message
 
         # Fetch final responses from Redis for DB update
         all_responses_json = await redis.lrange(response_list_key, 0, -1)
-        all_responses = [json.loads(r) for r in all_responses_json]
+        all_responses = [loads(r) for r in all_responses_json]
 
         # Update DB status
         await update_agent_run_status(client, agent_run_id, final_status, error=error_message, responses=all_responses)
@@ -793,6 +834,8 @@ async def run_agent_background(
         # Push error message to Redis list
         error_response = {"type": "status", "status": "error", "message": error_message}
         try:
+            # Keep json.dumps, not utils.json_utils.dumps, like the completion message above:
+            # the run's status messages are kept in the exact format the frontend was written against
             await redis.rpush(response_list_key, json.dumps(error_response))
             await redis.publish(response_channel, "new")
         except Exception as redis_err:
@@ -802,7 +845,7 @@ async def run_agent_background(
         all_responses = []
         try:
              all_responses_json = await redis.lrange(response_list_key, 0, -1)
-             all_responses = [json.loads(r) for r in all_responses_json]
+             all_responses = [loads(r) for r in all_responses_json]
         except Exception as fetch_err:
              logger.error(f"Failed to fetch responses from Redis after error for {agent_run_id}: {fetch_err}")
              all_responses = [error_response] # Use the error message we tried to push
@@ -818,21 +861,26 @@ async def run_agent_background(
             logger.warning(f"Failed to publish ERROR signal: {str(e)}")
 
     finally:
-        # Cleanup stop checker task
-        if stop_checker and not stop_checker.done():
-            stop_checker.cancel()
-            try: await stop_checker
-            except asyncio.CancelledError: pass
-            except Exception as e: logger.warning(f"Error during stop_checker cancellation: {e}")
-
-        # Close pubsub connection
-        if pubsub:
+        # Cleanup the agent and background tasks
+        for task in (agent_task, stop_waiter, stop_listener, key_refresher):
+            if task and not task.done():
+                task.cancel()
+                try: await task
+                except asyncio.CancelledError: pass
+                except Exception as e: logger.warning(f"Error during task cancellation for {agent_run_id}: {e}")
+
+        # Unsubscribe from the control channels
+        if control_subscription:
             try:
-                await pubsub.unsubscribe()
-                await pubsub.close()
-                logger.debug(f"Closed pubsub connection for {agent_run_id}")
+                await control_subscription.close()
+                logger.debug(f"Closed control subscription for {agent_run_id}")
             except Exception as e:
-                logger.warning(f"Error closing pubsub for {agent_run_id}: {str(e)}")
+                logger.warning(f"Error closing control subscription for {agent_run_id}: {str(e)}")
+
+        # A run that ended can't be resumed anymore. One that was interrupted (still
+        # "running") keeps its checkpoint for the worker it is reassigned to.
+        if final_status != "running":
+            await delete_checkpoint(agent_run_id)
 
         # Set TTL on the response list in Redis
         await _cleanup_redis_response_list(agent_run_id)
@@ -922,6 +970,11 @@ async def initiate_agent_with_files(
     if not can_run:
         raise HTTPException(status_code=402, detail={"message": message, "subscription": subscription})
 
+    # Reserve one of the account's concurrent runs before creating anything
+    tier = admission.get_run_tier(subscription)
+    agent_run_id = str(uuid.uuid4())
+    await admission.admit_run(account_id, agent_run_id, tier)
+
     try:
         # 1. Create Project
         placeholder_name = f"{prompt[:30]}..." if len(prompt) > 30 else prompt
@@ -1015,35 +1068,24 @@ async def initiate_agent_with_files(
         }).execute()
 
         # 6. Start Agent Run
-        agent_run = await client.table('agent_runs').insert({
-            "thread_id": thread_id, "status": "running",
+        await client.table('agent_runs').insert({
+            "id": agent_run_id, "thread_id": thread_id, "status": "running",
             "started_at": datetime.now(timezone.utc).isoformat()
         }).execute()
-        agent_run_id = agent_run.data[0]['id']
         logger.info(f"Created new agent run: {agent_run_id}")
 
-        # Register run in Redis
-        instance_key = f"active_run:{instance_id}:{agent_run_id}"
-        try:
-            await redis.set(instance_key, "running", ex=redis.REDIS_KEY_TTL)
-        except Exception as e:
-            logger.warning(f"Failed to register agent run in Redis ({instance_key}): {str(e)}")
-
-        # Run agent in background
-        task = asyncio.create_task(
-            run_agent_background(
-                agent_run_id=agent_run_id, thread_id=thread_id, instance_id=instance_id,
-                project_id=project_id, sandbox=sandbox,
-                model_name=model_name,  # Already resolved above
-                enable_thinking=enable_thinking, reasoning_effort=reasoning_effort,
-                stream=stream, enable_context_manager=enable_context_manager
-            )
-        )
-        task.add_done_callback(lambda _: asyncio.create_task(_cleanup_redis_instance_key(agent_run_id)))
+        # Queue the run for an agent worker
+        await scheduler.enqueue_run(agent_run_id, {
+            "thread_id": thread_id, "project_id": project_id, "account_id": account_id,
+            "model_name": model_name,  # Already resolved above
+            "enable_thinking": enable_thinking, "reasoning_effort": reasoning_effort,
+            "stream": stream, "enable_context_manager": enable_context_manager
+        }, queue=tier)
 
         return {"thread_id": thread_id, "agent_run_id": agent_run_id}
 
     except Exception as e:
+        await admission.release_run(account_id, agent_run_id)
         logger.error(f"Error in agent initiation: {str(e)}\n{traceback.format_exc()}")
         # TODO: Clean up created project/thread if initiation fails mid-way
         raise HTTPException(status_code=500, detail=f"Failed to initiate agent session: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,139 @@
+"""
+Iteration checkpoints for resuming interrupted agent runs.
+
+After every completed iteration, run_agent stores a checkpoint in Redis. When
+a run is interrupted (a deploy, a crashed worker) and the scheduler hands it to
+another worker, run_agent finds the checkpoint and continues with the next
+iteration. Everything an iteration produces is saved as thread messages before
+it counts as completed, so its tool results are part of the thread by then.
+The messages of the interrupted iteration are rolled back, and that iteration
+runs again.
+"""
+
+from dataclasses import dataclass, asdict
+from datetime import datetime, timezone
+from typing import Optional
+
+from services import redis
+from utils.json_utils import dumps, loads
+from utils.logger import logger
+
+# Messages an iteration produces, which are removed again when it is rolled back.
+# User messages and recorded costs are kept.
+ITERATION_MESSAGE_TYPES = ['assistant', 'tool', 'status', 'browser_state', 'image_context', 'summary']
+
+
+def _checkpoint_key(agent_run_id: str) -> str:
+    return f"agent_run:{agent_run_id}:checkpoint"
+
+
+@dataclass
+class RunCheckpoint:
+    """State of an agent run after its last completed iteration.
+
+    Attributes:
+        agent_run_id: ID of the agent run
+        thread_id: ID of the thread the run works on
+        iteration: Number of completed iterations
+        last_message_id: Latest thread message when the checkpoint was written
+        last_message_created_at: Creation time of that message
+        response_offset: Length of the run's Redis response list at that point;
+            responses after it belong to the interrupted iteration
+        updated_at: When the checkpoint was written
+    """
+    agent_run_id: str
+    thread_id: str
+    iteration: int
+    last_message_id: Optional[str]
+    last_message_created_at: Optional[str]
+    response_offset: int
+    updated_at: str
+
+
+async def load_checkpoint(agent_run_id: str) -> Optional[RunCheckpoint]:
+    """Get the checkpoint of a run, if it was interrupted before."""
+    checkpoint_json = await redis.get(_checkpoint_key(agent_run_id))
+    if not checkpoint_json:
+        return None
+    try:
+        return RunCheckpoint(**loads(checkpoint_json))
+    except (TypeError, ValueError) as e:
+        logger.warning(f"Ignoring invalid checkpoint of agent run {agent_run_id}: {e}")
+        return None
+
+
+async def save_checkpoint(client, agent_run_id: str, thread_id: str, iteration: int) -> Optional[RunCheckpoint]:
+    """Record that a run completed `iteration` iterations.
+
+    Failures are logged and not raised: a missing checkpoint only means an
+    interrupted run repeats more work.
+
+    Returns:
+        The saved checkpoint, or None if it couldn't be saved
+    """
+    try:
+        latest_message = await client.table('messages').select('message_id', 'created_at') \
+            .eq('thread_id', thread_id) \
+            .order('created_at', desc=True) \
+            .limit(1) \
+            .execute()
+        last_message = latest_message.data[0] if latest_message.data else {}
+
+        checkpoint = RunCheckpoint(
+            agent_run_id=agent_run_id,
+            thread_id=thread_id,
+            iteration=iteration,
+            last_message_id=last_message.get('message_id'),
+            last_message_created_at=last_message.get('created_at'),
+            response_offset=await redis.llen(f"agent_run:{agent_run_id}:responses"),
+            updated_at=datetime.now(timezone.utc).isoformat()
+        )
+        await redis.set(_checkpoint_key(agent_run_id), dumps(asdict(checkpoint)), ex=redis.REDIS_KEY_TTL)
+        return checkpoint
+    except Exception as e:
+        logger.warning(f"Failed to save checkpoint of agent run {agent_run_id} after iteration {iteration}: {e}")
+        return None
+
+
+async def rollback_to_checkpoint(client, checkpoint: RunCheckpoint) -> int:
+    """Delete the messages the interrupted iteration saved after the checkpoint.
+
+    Without the creation time of the checkpoint's last message there is no
+    bound, so nothing is deleted rather than every iteration message of the
+    thread.
+
+    Returns:
+        Number of deleted messages
+    """
+    if not checkpoint.last_message_created_at:
+        logger.warning(f"Checkpoint of agent run {checkpoint.agent_run_id} has no message timestamp, not rolling back")
+        return 0
+    result = await client.table('messages').delete() \
+        .eq('thread_id', checkpoint.thread_id) \
+        .in_('type', ITERATION_MESSAGE_TYPES) \
+        .gt('created_at', checkpoint.last_message_created_at) \
+        .execute()
+    return len(result.data or [])
+
+
+async def discard_responses_after(checkpoint: RunCheckpoint) -> None:
+    """Drop the responses the interrupted iteration stored after the checkpoint.
+
+    Streams that replay the response list would otherwise show the abandoned
+    iteration before the resumed one. Connected streams are told the new length
+    with a "rewind:<offset>" notification on the response channel.
+    """
+    response_list_key = f"agent_run:{checkpoint.agent_run_id}:responses"
+    if checkpoint.response_offset > 0:
+        await redis.ltrim(response_list_key, 0, checkpoint.response_offset - 1)
+    else:
+        await redis.delete(response_list_key)
+    await redis.publish(f"agent_run:{checkpoint.agent_run_id}:new_response", f"rewind:{checkpoint.response_offset}")
+
+
+async def delete_checkpoint(agent_run_id: str) -> None:
+    """Remove the checkpoint of a run that ended."""
+    try:
+        await redis.delete(_checkpoint_key(agent_run_id))
+    except Exception as e:
+        logger.warning(f"Failed to delete checkpoint of agent run {agent_run_id}: {e}")
@@ -22,7 +22,8 @@ from agent.prompt import get_system_prompt
 from utils.logger import logger
 from utils.auth_utils import get_account_id_from_thread
 from services.billing import check_billing_status
-from agent.tools.sb_vision_tool import SandboxVisionTool
+from agent.tools.sb_vision_tool import SandboxVisionTool, load_image_context
+from agent.checkpoint import load_checkpoint, save_checkpoint, rollback_to_checkpoint, discard_responses_after
 
 load_dotenv()
 
@@ -36,7 +37,8 @@ async def run_agent(
     model_name: str = "anthropic/claude-3-7-sonnet-latest",
     enable_thinking: Optional[bool] = False,
     reasoning_effort: Optional[str] = 'low',
-    enable_context_manager: bool = True
+    enable_context_manager: bool = True,
+    agent_run_id: Optional[str] = None
 ):
     """Run the development agent with specified configuration."""
     logger.info(f"🚀 Starting agent with model: {model_name}")
@@ -62,10 +64,10 @@ async def run_agent(
 
     # Initialize tools with project_id instead of sandbox object
     # This ensures each tool independently verifies it's operating on the correct project
-    thread_manager.add_tool(SandboxShellTool, project_id=project_id, thread_manager=thread_manager)
+    thread_manager.add_tool(SandboxShellTool, project_id=project_id, thread_manager=thread_manager, agent_run_id=agent_run_id)
     thread_manager.add_tool(SandboxFilesTool, project_id=project_id, thread_manager=thread_manager)
     thread_manager.add_tool(SandboxBrowserTool, project_id=project_id, thread_id=thread_id, thread_manager=thread_manager)
-    thread_manager.add_tool(SandboxDeployTool, project_id=project_id, thread_manager=thread_manager)
+    thread_manager.add_tool(SandboxDeployTool, project_id=project_id, thread_manager=thread_manager, agent_run_id=agent_run_id)
     thread_manager.add_tool(SandboxExposeTool, project_id=project_id, thread_manager=thread_manager)
     thread_manager.add_tool(MessageTool) # we are just doing this via prompt as there is no need to call it as a tool
     thread_manager.add_tool(SandboxWebSearchTool, project_id=project_id, thread_manager=thread_manager)
@@ -85,42 +87,76 @@ async def run_agent(
     else:
         system_message = { "role": "system", "content": get_system_prompt() }
 
-    iteration_count = 0
-    continue_execution = True
-
-    while continue_execution and iteration_count < max_iterations:
-        iteration_count += 1
-        logger.info(f"🔄 Running iteration {iteration_count} of {max_iterations}...")
-
-        # Billing check on each iteration - still needed within the iterations
-        can_run, message, subscription = await check_billing_status(client, account_id)
-        if not can_run:
-            error_msg = f"Billing limit reached: {message}"
-            # Yield a special message to indicate billing limit reached
+    try:
+        iteration_count = 0
+        continue_execution = True
+
+        # Resume an interrupted run after its last completed iteration
+        checkpoint = await load_checkpoint(agent_run_id) if agent_run_id else None
+        if checkpoint:
+            iteration_count = checkpoint.iteration
+            rolled_back = await rollback_to_checkpoint(client, checkpoint)
+            await discard_responses_after(checkpoint)
+            logger.info(f"Resuming agent run {agent_run_id} after iteration {iteration_count}, rolled back {rolled_back} messages of the interrupted iteration")
             yield {
                 "type": "status",
-                "status": "stopped",
-                "message": error_msg
+                "content": json.dumps({
+                    "status_type": "run_resumed",
+                    "iteration": iteration_count,
+                    "response_offset": checkpoint.response_offset
+                })
             }
-            break
-        # Check if last message is from assistant using direct Supabase query
-        latest_message = await client.table('messages').select('*').eq('thread_id', thread_id).in_('type', ['assistant', 'tool', 'user']).order('created_at', desc=True).limit(1).execute()
-        if latest_message.data and len(latest_message.data) > 0:
-            message_type = latest_message.data[0].get('type')
-            if message_type == 'assistant':
-                logger.info(f"Last message was from assistant, stopping execution")
-                continue_execution = False
+        elif agent_run_id:
+            await save_checkpoint(client, agent_run_id, thread_id, iteration_count)
+
+        while continue_execution and iteration_count < max_iterations:
+            iteration_count += 1
+            logger.info(f"🔄 Running iteration {iteration_count} of {max_iterations}...")
+
+            # Billing check on each iteration - still needed within the iterations
+            can_run, message, subscription = await check_billing_status(client, account_id)
+            if not can_run:
+                error_msg = f"Billing limit reached: {message}"
+                # Yield a special message to indicate billing limit reached
+                yield {
+                    "type": "status",
+                    "status": "stopped",
+                    "message": error_msg
+                }
                 break
+            # Check if last message is from assistant using direct Supabase query
+            latest_message = await client.table('messages').select('*').eq('thread_id', thread_id).in_('type', ['assistant', 'tool', 'user']).order('created_at', desc=True).limit(1).execute()
+            if latest_message.data and len(latest_message.data) > 0:
+                message_type = latest_message.data[0].get('type')
+                if message_type == 'assistant':
+                    logger.info(f"Last message was from assistant, stopping execution")
+                    continue_execution = False
+                    break
 
-        # ---- Temporary Message Handling (Browser State & Image Context) ----
-        temporary_message = None
-        temp_message_content_list = [] # List to hold text/image blocks
+            # ---- Temporary Message Handling (Browser State & Image Context) ----
+            temporary_message = None
+            temp_message_content_list = [] # List to hold text/image blocks
+
+            # Every browser_state and image_context message saved since the last iteration;
+            # one turn can save several (parallel tool calls, several browser contexts)
+            temporary_messages = await client.table('messages').select('*').eq('thread_id', thread_id).in_('type', ['browser_state', 'image_context']).order('created_at').execute()
+            temporary_messages = temporary_messages.data or []
+
+            # Only the latest state of each browser context is current
+            latest_browser_states = {}
+            image_contexts = []
+            for temp_message in temporary_messages:
+                try:
+                    temp_content = json.loads(temp_message["content"])
+                except Exception as e:
+                    logger.error(f"Error parsing {temp_message['type']} message: {e}")
+                    continue
+                if temp_message['type'] == 'browser_state':
+                    latest_browser_states[temp_content.get("context_id") or "default"] = temp_content
+                else:
+                    image_contexts.append(temp_content)
 
-        # Get the latest browser_state message
-        latest_browser_state_msg = await client.table('messages').select('*').eq('thread_id', thread_id).eq('type', 'browser_state').order('created_at', desc=True).limit(1).execute()
-        if latest_browser_state_msg.data and len(latest_browser_state_msg.data) > 0:
-            try:
-                browser_content = json.loads(latest_browser_state_msg.data[0]["content"])
+            for context_id, browser_content in latest_browser_states.items():
                 screenshot_base64 = browser_content.get("screenshot_base64")
                 # Create a copy of the browser state without screenshot
                 browser_state_text = browser_content.copy()
@@ -129,9 +165,10 @@ async def run_agent(
                 browser_state_text.pop('screenshot_url_base64', None)
 
                 if browser_state_text:
+                    context_label = "browser" if len(latest_browser_states) == 1 else f"browser context '{context_id}'"
                     temp_message_content_list.append({
                         "type": "text",
-                        "text": f"The following is the current state of the browser:\n{json.dumps(browser_state_text, indent=2)}"
+                        "text": f"The following is the current state of the {context_label}:\n{json.dumps(browser_state_text, indent=2)}"
                     })
                 if screenshot_base64:
                     temp_message_content_list.append({
@@ -141,22 +178,20 @@ async def run_agent(
                         }
                     })
                 else:
-                    logger.warning("Browser state found but no screenshot base64 data.")
-
-                await client.table('messages').delete().eq('message_id', latest_browser_state_msg.data[0]["message_id"]).execute()
-            except Exception as e:
-                logger.error(f"Error parsing browser state: {e}")
+                    logger.warning(f"Browser state of context '{context_id}' found but no screenshot base64 data.")
 
-        # Get the latest image_context message (NEW)
-        latest_image_context_msg = await client.table('messages').select('*').eq('thread_id', thread_id).eq('type', 'image_context').order('created_at', desc=True).limit(1).execute()
-        if latest_image_context_msg.data and len(latest_image_context_msg.data) > 0:
-            try:
-                image_context_content = json.loads(latest_image_context_msg.data[0]["content"])
-                base64_image = image_context_content.get("base64")
-                mime_type = image_context_content.get("mime_type")
+            for image_context_content in image_contexts:
                 file_path = image_context_content.get("file_path", "unknown file")
-
-                if base64_image and mime_type:
+                # The image is usually a reference into the image cache rather than inline base64
+                try:
+                    image_data = await load_image_context(image_context_content)
+                except Exception as e:
+                    logger.error(f"Error loading image context for '{file_path}': {e}")
+                    continue
+
+                if image_data:
+                    base64_image = image_data["base64"]
+                    mime_type = image_data["mime_type"]
                     temp_message_content_list.append({
                         "type": "text",
                         "text": f"Here is the image you requested to see: '{file_path}'"
@@ -168,114 +203,134 @@ async def run_agent(
                         }
                     })
                 else:
-                    logger.warning(f"Image context found for '{file_path}' but missing base64 or mime_type.")
-
-                await client.table('messages').delete().eq('message_id', latest_image_context_msg.data[0]["message_id"]).execute()
-            except Exception as e:
-                logger.error(f"Error parsing image context: {e}")
-
-        # If we have any content, construct the temporary_message
-        if temp_message_content_list:
-            temporary_message = {"role": "user", "content": temp_message_content_list}
-            # logger.debug(f"Constructed temporary message with {len(temp_message_content_list)} content blocks.")
-        # ---- End Temporary Message Handling ----
-
-        # Set max_tokens based on model
-        max_tokens = None
-        if "sonnet" in model_name.lower():
-            max_tokens = 64000
-        elif "gpt-4" in model_name.lower():
-            max_tokens = 4096
+                    logger.warning(f"Image context found for '{file_path}' but the image data is missing or expired.")
+
+            # Delete all of them, so none is shown again on a later iteration
+            if temporary_messages:
+                try:
+                    await client.table('messages').delete().in_('message_id', [m["message_id"] for m in temporary_messages]).execute()
+                except Exception as e:
+                    logger.error(f"Error deleting temporary messages: {e}")
+
+            # If we have any content, construct the temporary_message
+            if temp_message_content_list:
+                temporary_message = {"role": "user", "content": temp_message_content_list}
+                # logger.debug(f"Constructed temporary message with {len(temp_message_content_list)} content blocks.")
+            # ---- End Temporary Message Handling ----
+
+            # Set max_tokens based on model
+            max_tokens = None
+            if "sonnet" in model_name.lower():
+                max_tokens = 64000
+            elif "gpt-4" in model_name.lower():
+                max_tokens = 4096
             
-        try:
-            # Make the LLM call and process the response
-            response = await thread_manager.run_thread(
-                thread_id=thread_id,
-                system_prompt=system_message,
-                stream=stream,
-                llm_model=model_name,
-                llm_temperature=0,
-                llm_max_tokens=max_tokens,
-                tool_choice="auto",
-                max_xml_tool_calls=1,
-                temporary_message=temporary_message,
-                processor_config=ProcessorConfig(
-                    xml_tool_calling=True,
-                    native_tool_calling=False,
-                    execute_tools=True,
-                    execute_on_stream=True,
-                    tool_execution_strategy="parallel",
-                    xml_adding_strategy="user_message"
-                ),
-                native_max_auto_continues=native_max_auto_continues,
-                include_xml_examples=True,
-                enable_thinking=enable_thinking,
-                reasoning_effort=reasoning_effort,
-                enable_context_manager=enable_context_manager
-            )
-
-            if isinstance(response, dict) and "status" in response and response["status"] == "error":
-                logger.error(f"Error response from run_thread: {response.get('message', 'Unknown error')}")
-                yield response
-                break
-
-            # Track if we see ask, complete, or web-browser-takeover tool calls
-            last_tool_call = None
-
-            # Process the response
-            error_detected = False
             try:
-                async for chunk in response:
-                    # If we receive an error chunk, we should stop after this iteration
-                    if isinstance(chunk, dict) and chunk.get('type') == 'status' and chunk.get('status') == 'error':
-                        logger.error(f"Error chunk detected: {chunk.get('message', 'Unknown error')}")
-                        error_detected = True
-                        yield chunk  # Forward the error chunk
-                        continue     # Continue processing other chunks but don't break yet
-                        
-                    # Check for XML versions like <ask>, <complete>, or <web-browser-takeover> in assistant content chunks
-                    if chunk.get('type') == 'assistant' and 'content' in chunk:
-                        try:
-                            # The content field might be a JSON string or object
-                            content = chunk.get('content', '{}')
-                            if isinstance(content, str):
-                                assistant_content_json = json.loads(content)
-                            else:
-                                assistant_content_json = content
-
-                            # The actual text content is nested within
-                            assistant_text = assistant_content_json.get('content', '')
-                            if isinstance(assistant_text, str): # Ensure it's a string
-                                 # Check for the closing tags as they signal the end of the tool usage
-                                if '</ask>' in assistant_text or '</complete>' in assistant_text or '</web-browser-takeover>' in assistant_text:
-                                   if '</ask>' in assistant_text:
-                                       xml_tool = 'ask'
-                                   elif '</complete>' in assistant_text:
-                                       xml_tool = 'complete'
-                                   elif '</web-browser-takeover>' in assistant_text:
-                                       xml_tool = 'web-browser-takeover'
-
-                                   last_tool_call = xml_tool
-                                   logger.info(f"Agent used XML tool: {xml_tool}")
-                        except json.JSONDecodeError:
-                            # Handle cases where content might not be valid JSON
-                            logger.warning(f"Warning: Could not parse assistant content JSON: {chunk.get('content')}")
-                        except Exception as e:
-                            logger.error(f"Error processing assistant chunk: {e}")
-
-                    yield chunk
-
-                # Check if we should stop based on the last tool call or error
-                if error_detected:
-                    logger.info(f"Stopping due to error detected in response")
+                # Make the LLM call and process the response
+                response = await thread_manager.run_thread(
+                    thread_id=thread_id,
+                    system_prompt=system_message,
+                    stream=stream,
+                    llm_model=model_name,
+                    llm_temperature=0,
+                    llm_max_tokens=max_tokens,
+                    tool_choice="auto",
+                    max_xml_tool_calls=config.AGENT_MAX_XML_TOOL_CALLS,
+                    temporary_message=temporary_message,
+                    processor_config=ProcessorConfig(
+                        xml_tool_calling=True,
+                        native_tool_calling=False,
+                        execute_tools=True,
+                        execute_on_stream=True,
+                        tool_execution_strategy="parallel",
+                        xml_adding_strategy="user_message"
+                    ),
+                    native_max_auto_continues=native_max_auto_continues,
+                    include_xml_examples=True,
+                    enable_thinking=enable_thinking,
+                    reasoning_effort=reasoning_effort,
+                    enable_context_manager=enable_context_manager
+                )
+
+                if isinstance(response, dict) and "status" in response and response["status"] == "error":
+                    logger.error(f"Error response from run_thread: {response.get('message', 'Unknown error')}")
+                    yield response
                     break
+
+                # Track if we see ask, complete, or web-browser-takeover tool calls
+                last_tool_call = None
+
+                # Process the response
+                error_detected = False
+                try:
+                    async for chunk in response:
+                        # If we receive an error chunk, we should stop after this iteration
+                        if isinstance(chunk, dict) and chunk.get('type') == 'status' and chunk.get('status') == 'error':
+                            logger.error(f"Error chunk detected: {chunk.get('message', 'Unknown error')}")
+                            error_detected = True
+                            yield chunk  # Forward the error chunk
+                            continue     # Continue processing other chunks but don't break yet
+                        
+                        # Check for XML versions like <ask>, <complete>, or <web-browser-takeover> in saved assistant messages.
+                        # Streamed content chunks are skipped: the saved message has the complete text, so there's no need
+                        # to parse every chunk.
+                        if chunk.get('type') == 'assistant' and chunk.get('message_id') and 'content' in chunk:
+                            try:
+                                # The content field might be a JSON string or object
+                                content = chunk.get('content', '{}')
+                                if isinstance(content, str):
+                                    assistant_content_json = json.loads(content)
+                                else:
+                                    assistant_content_json = content
+
+                                # The actual text content is nested within
+                                assistant_text = assistant_content_json.get('content', '')
+                                if isinstance(assistant_text, str): # Ensure it's a string
+                                     # Check for the closing tags as they signal the end of the tool usage
+                                    if '</ask>' in assistant_text or '</complete>' in assistant_text or '</web-browser-takeover>' in assistant_text:
+                                       if '</ask>' in assistant_text:
+                                           xml_tool = 'ask'
+                                       elif '</complete>' in assistant_text:
+                                           xml_tool = 'complete'
+                                       elif '</web-browser-takeover>' in assistant_text:
+                                           xml_tool = 'web-browser-takeover'
+
+                                       last_tool_call = xml_tool
+                                       logger.info(f"Agent used XML tool: {xml_tool}")
+                            except json.JSONDecodeError:
+                                # Handle cases where content might not be valid JSON
+                                logger.warning(f"Warning: Could not parse assistant content JSON: {chunk.get('content')}")
+                            except Exception as e:
+                                logger.error(f"Error processing assistant chunk: {e}")
+
+                        yield chunk
+
+                    # Check if we should stop based on the last tool call or error
+                    if error_detected:
+                        logger.info(f"Stopping due to error detected in response")
+                        break
                     
-                if last_tool_call in ['ask', 'complete', 'web-browser-takeover']:
-                    logger.info(f"Agent decided to stop with tool: {last_tool_call}")
-                    continue_execution = False
+                    if last_tool_call in ['ask', 'complete', 'web-browser-takeover']:
+                        logger.info(f"Agent decided to stop with tool: {last_tool_call}")
+                        continue_execution = False
+
+                    if agent_run_id:
+                        await save_checkpoint(client, agent_run_id, thread_id, iteration_count)
+                except Exception as e:
+                    # Just log the error and re-raise to stop all iterations
+                    error_msg = f"Error during response streaming: {str(e)}"
+                    logger.error(f"Error: {error_msg}")
+                    yield {
+                        "type": "status",
+                        "status": "error",
+                        "message": error_msg
+                    }
+                    # Stop execution immediately on any error
+                    break
+                
             except Exception as e:
                 # Just log the error and re-raise to stop all iterations
-                error_msg = f"Error during response streaming: {str(e)}"
+                error_msg = f"Error running thread: {str(e)}"
                 logger.error(f"Error: {error_msg}")
                 yield {
                     "type": "status",
@@ -284,18 +339,9 @@ async def run_agent(
                 }
                 # Stop execution immediately on any error
                 break
-                
-        except Exception as e:
-            # Just log the error and re-raise to stop all iterations
-            error_msg = f"Error running thread: {str(e)}"
-            logger.error(f"Error: {error_msg}")
-            yield {
-                "type": "status",
-                "status": "error",
-                "message": error_msg
-            }
-            # Stop execution immediately on any error
-            break
+    finally:
+        # Stops background work of the tools, e.g. live command output streams
+        await thread_manager.tool_registry.close_tools()
 
 
 # # TESTING
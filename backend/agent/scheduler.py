@@ -0,0 +1,400 @@
+"""
+Distributed scheduling of agent runs.
+
+The API enqueues runs in Redis instead of executing them itself. Agent workers
+(embedded in the API processes, or dedicated ones started with
+`python -m agent.worker`) claim runs from the queues while they have capacity
+left, and advertise that capacity with a heartbeat. When a worker stops
+heartbeating, the runs it had claimed are put back on the queue for another
+worker.
+
+Runs can be enqueued on named queues (e.g. one per subscription tier). Workers
+pick the queue to claim from by smooth weighted round robin over the queue
+weights they are given, falling back to the other queues when it is empty.
+Reassigned runs go on the main queue, which is always claimed from first.
+
+Redis keys:
+    agent_runs:queue                  Reassigned runs and runs enqueued without a queue name
+    agent_runs:queue:{name}           Runs of a named queue (LPUSH in, claimed from the right)
+    agent_runs:wakeup                 Tokens waking up idle workers after an enqueue
+    agent_run:{id}:job                Parameters of a queued or running run
+    agent_run:{id}:attempts           How often the run has been claimed
+    agent_workers                     IDs of registered workers
+    agent_worker:{id}                 Capacity of a live worker; expires without heartbeats
+    agent_worker:{id}:runs            Runs claimed by the worker
+"""
+
+import asyncio
+import socket
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from services import redis
+from utils.json_utils import dumps, loads
+from utils.logger import logger
+
+RUN_QUEUE_KEY = "agent_runs:queue"
+WAKEUP_KEY = "agent_runs:wakeup"
+WORKERS_KEY = "agent_workers"
+
+HEARTBEAT_INTERVAL = 10  # Seconds between heartbeats
+HEARTBEAT_TTL = 30       # Seconds without a heartbeat after which a worker counts as dead
+CLAIM_TIMEOUT = 2        # Seconds to block waiting for a run; below the Redis socket timeout
+CLAIM_RETRY_DELAY = 1    # Seconds to wait after a failed claim
+MAX_RUN_ATTEMPTS = 3     # Claims of one run before it is failed instead of reassigned
+MAX_WAKEUP_TOKENS = 100  # Pending wakeup tokens kept; idle workers sweep the queues regularly anyway
+
+
+def _queue_key(queue: Optional[str]) -> str:
+    return f"{RUN_QUEUE_KEY}:{queue}" if queue else RUN_QUEUE_KEY
+
+
+def _job_key(agent_run_id: str) -> str:
+    return f"agent_run:{agent_run_id}:job"
+
+
+def job_key_format() -> str:
+    """Key of a run's job with %s in place of the run ID, for Lua scripts."""
+    return _job_key("%s")
+
+
+def _attempts_key(agent_run_id: str) -> str:
+    return f"agent_run:{agent_run_id}:attempts"
+
+
+def _worker_key(worker_id: str) -> str:
+    return f"agent_worker:{worker_id}"
+
+
+def _claimed_runs_key(worker_id: str) -> str:
+    return f"agent_worker:{worker_id}:runs"
+
+
+async def _wake_workers(count: int = 1) -> None:
+    """Wake up to `count` idle workers to claim newly queued runs."""
+    await redis.lpush(WAKEUP_KEY, *(["1"] * count))
+    await redis.ltrim(WAKEUP_KEY, 0, MAX_WAKEUP_TOKENS - 1)
+
+
+async def enqueue_run(agent_run_id: str, job: Dict[str, Any], queue: Optional[str] = None) -> None:
+    """Queue a run for the next worker with free capacity.
+
+    Args:
+        agent_run_id: ID of the agent run
+        job: Parameters the worker needs to execute the run
+        queue: Name of the queue to put the run on, or None for the main queue
+    """
+    await redis.set(_job_key(agent_run_id), dumps({**job, "queue": queue}), ex=redis.REDIS_KEY_TTL)
+    await redis.lpush(_queue_key(queue), agent_run_id)
+    await _wake_workers()
+    logger.info(f"Queued agent run {agent_run_id} on {_queue_key(queue)}")
+
+
+async def queued_run_count(queues: Iterable[str]) -> int:
+    """Number of runs waiting on the main queue and the given named queues."""
+    total = await redis.llen(RUN_QUEUE_KEY)
+    for queue in queues:
+        total += await redis.llen(_queue_key(queue))
+    return total
+
+
+async def cancel_queued_run(agent_run_id: str) -> Optional[Dict[str, Any]]:
+    """Remove a run from its queue if no worker has claimed it yet.
+
+    Returns:
+        The job of the run if it was still queued, else None
+    """
+    job_json = await redis.get(_job_key(agent_run_id))
+    if job_json is None:
+        return None
+    job = loads(job_json)
+    queue = job.get("queue")
+    removed = await redis.lrem(_queue_key(queue), 0, agent_run_id)
+    if queue and not removed:
+        # It may have been reassigned to the main queue
+        removed = await redis.lrem(RUN_QUEUE_KEY, 0, agent_run_id)
+    if removed:
+        await redis.delete(_job_key(agent_run_id))
+        await redis.delete(_attempts_key(agent_run_id))
+        logger.info(f"Removed agent run {agent_run_id} from the queue")
+        return job
+    return None
+
+
+async def is_scheduled(agent_run_id: str) -> bool:
+    """Check whether a run is queued or owned by a worker."""
+    return bool(await redis.exists(_job_key(agent_run_id)))
+
+
+async def reap_dead_workers() -> int:
+    """Put the runs of workers that stopped heartbeating back on the queue.
+
+    Returns:
+        Number of runs that were requeued
+    """
+    requeued = 0
+    for worker_id in await redis.smembers(WORKERS_KEY):
+        if await redis.exists(_worker_key(worker_id)):
+            continue
+        claimed_runs_key = _claimed_runs_key(worker_id)
+        # Reassigned runs go to the consuming end of the queue, so they are claimed first
+        while (agent_run_id := await redis.lmove(claimed_runs_key, RUN_QUEUE_KEY, "RIGHT", "RIGHT")):
+            logger.warning(f"Requeued agent run {agent_run_id} of dead worker {worker_id}")
+            requeued += 1
+        await redis.srem(WORKERS_KEY, worker_id)
+        logger.warning(f"Removed dead agent worker {worker_id}")
+    if requeued:
+        await _wake_workers(requeued)
+    return requeued
+
+
+def available_memory_mb() -> Optional[int]:
+    """Memory still available to this process in MB, or None if it can't be determined.
+
+    Uses the cgroup (v2) limit when there is one, so the value is right inside containers.
+    """
+    try:
+        with open("/sys/fs/cgroup/memory.max") as f:
+            limit = f.read().strip()
+        if limit != "max":
+            with open("/sys/fs/cgroup/memory.current") as f:
+                current = int(f.read().strip())
+            return max(0, int(limit) - current) // (1024 * 1024)
+    except (OSError, ValueError):
+        pass
+
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) // 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+class RunWorker:
+    """Claims queued agent runs and executes them within its capacity.
+
+    A worker runs at most max_runs runs at once and only claims new ones while at
+    least min_free_memory_mb of memory is available. Its heartbeat advertises that
+    capacity and also reaps dead workers.
+
+    Each claim first tries the main queue, then the named queue picked by smooth
+    weighted round robin over queue_weights, then the remaining named queues by
+    weight. A queue with weight 3 thus gets three claims for every one of a queue
+    with weight 1 while both have runs waiting.
+    """
+
+    def __init__(
+        self,
+        worker_id: str,
+        execute_run: Callable[[str, Dict[str, Any]], Awaitable[None]],
+        fail_run: Callable[[str, Dict[str, Any], str], Awaitable[None]],
+        max_runs: int,
+        min_free_memory_mb: int = 0,
+        queue_weights: Optional[Dict[str, int]] = None
+    ):
+        """Initialize the RunWorker.
+
+        Args:
+            worker_id: Unique ID of this worker (the instance ID of the process)
+            execute_run: Executes a claimed run given its ID and job parameters
+            fail_run: Marks a run as failed given its ID, job parameters and an error message
+            max_runs: Maximum number of runs executed at once
+            min_free_memory_mb: Memory that must be available to claim another run
+            queue_weights: Claim weight of each named queue
+        """
+        self.worker_id = worker_id
+        self.execute_run = execute_run
+        self.fail_run = fail_run
+        self.max_runs = max_runs
+        self.min_free_memory_mb = min_free_memory_mb
+        self.queue_weights = {queue: weight for queue, weight in (queue_weights or {}).items() if weight > 0}
+        self.started_at = datetime.now(timezone.utc).isoformat()
+
+        self._runs: Dict[str, asyncio.Task] = {}
+        self._queue_credit: Dict[str, int] = {queue: 0 for queue in self.queue_weights}
+        self._capacity_freed = asyncio.Event()
+        self._claim_task: Optional[asyncio.Task] = None
+        self._heartbeat_task: Optional[asyncio.Task] = None
+
+    @property
+    def worker_key(self) -> str:
+        return _worker_key(self.worker_id)
+
+    @property
+    def claimed_runs_key(self) -> str:
+        return _claimed_runs_key(self.worker_id)
+
+    async def start(self) -> None:
+        """Register the worker and start claiming runs."""
+        await self._advertise()
+        self._heartbeat_task = asyncio.create_task(self._heartbeat())
+        self._claim_task = asyncio.create_task(self._claim_runs())
+        logger.info(f"Agent worker {self.worker_id} started (max runs: {self.max_runs}, min free memory: {self.min_free_memory_mb} MB)")
+
+    async def stop(self) -> None:
+        """Stop claiming, interrupt the runs in progress and put them back on the queue."""
+        for task in (self._claim_task, self._heartbeat_task):
+            if task and not task.done():
+                task.cancel()
+                try: await task
+                except asyncio.CancelledError: pass
+
+        interrupted = list(self._runs.values())
+        for task in interrupted:
+            task.cancel()
+        if interrupted:
+            await asyncio.gather(*interrupted, return_exceptions=True)
+
+        try:
+            while (agent_run_id := await redis.lmove(self.claimed_runs_key, RUN_QUEUE_KEY, "RIGHT", "RIGHT")):
+                # Being interrupted by a shutdown doesn't count as a failed attempt
+                await redis.incrby(_attempts_key(agent_run_id), -1)
+                await _wake_workers()
+                logger.info(f"Requeued agent run {agent_run_id} on shutdown of worker {self.worker_id}")
+            await redis.delete(self.worker_key)
+            await redis.srem(WORKERS_KEY, self.worker_id)
+        except Exception as e:
+            logger.error(f"Failed to release the runs of agent worker {self.worker_id}: {e}")
+        logger.info(f"Agent worker {self.worker_id} stopped")
+
+    def _has_capacity(self) -> bool:
+        if len(self._runs) >= self.max_runs:
+            return False
+        if self.min_free_memory_mb:
+            memory = available_memory_mb()
+            if memory is not None and memory < self.min_free_memory_mb:
+                return False
+        return True
+
+    async def _claim_runs(self) -> None:
+        """Move runs from the queue to this worker while it has capacity."""
+        while True:
+            if not self._has_capacity():
+                self._capacity_freed.clear()
+                try:
+                    # Memory can free up without a run finishing, so check again after a while
+                    await asyncio.wait_for(self._capacity_freed.wait(), HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            try:
+                agent_run_id = await self._claim_next_run()
+                if not agent_run_id:
+                    # Nothing queued: wait for an enqueue, sweeping the queues again after CLAIM_TIMEOUT
+                    await redis.blpop([WAKEUP_KEY], CLAIM_TIMEOUT)
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Agent worker {self.worker_id} failed to claim a run: {e}")
+                await asyncio.sleep(CLAIM_RETRY_DELAY)
+                continue
+
+            self._runs[agent_run_id] = asyncio.create_task(self._run(agent_run_id))
+
+    def _claim_order(self) -> List[str]:
+        """Queue keys to try for the next claim, in order."""
+        order = [RUN_QUEUE_KEY]
+        if not self.queue_weights:
+            return order
+
+        # Smooth weighted round robin: the queue with the most credit is next
+        total_weight = sum(self.queue_weights.values())
+        for queue, weight in self.queue_weights.items():
+            self._queue_credit[queue] += weight
+        chosen = max(self._queue_credit, key=self._queue_credit.get)
+        self._queue_credit[chosen] -= total_weight
+
+        order.append(_queue_key(chosen))
+        order.extend(
+            _queue_key(queue)
+            for queue in sorted(self.queue_weights, key=self.queue_weights.get, reverse=True)
+            if queue != chosen
+        )
+        return order
+
+    async def _claim_next_run(self) -> Optional[str]:
+        """Move the next run to this worker's claimed runs, or return None if all queues are empty."""
+        for queue_key in self._claim_order():
+            agent_run_id = await redis.lmove(queue_key, self.claimed_runs_key)
+            if agent_run_id:
+                return agent_run_id
+        return None
+
+    async def _run(self, agent_run_id: str) -> None:
+        """Execute a claimed run and release it when done."""
+        try:
+            attempts = await redis.incrby(_attempts_key(agent_run_id))
+            job_json = await redis.get(_job_key(agent_run_id))
+            if job_json is None:
+                logger.warning(f"Agent run {agent_run_id} has no job parameters, dropping it")
+            elif attempts > MAX_RUN_ATTEMPTS:
+                logger.error(f"Agent run {agent_run_id} was claimed {attempts} times, failing it")
+                await self.fail_run(agent_run_id, loads(job_json), f"Agent run was interrupted {attempts - 1} times")
+            else:
+                logger.info(f"Agent worker {self.worker_id} claimed run {agent_run_id} (attempt {attempts})")
+                await self.execute_run(agent_run_id, loads(job_json))
+        except asyncio.CancelledError:
+            # Stopped by stop(), which requeues the run, or by a lost claim; keep the job
+            self._runs.pop(agent_run_id, None)
+            self._capacity_freed.set()
+            raise
+        except Exception as e:
+            logger.error(f"Error executing agent run {agent_run_id} on worker {self.worker_id}: {e}", exc_info=True)
+
+        self._runs.pop(agent_run_id, None)
+        self._capacity_freed.set()
+        try:
+            await redis.lrem(self.claimed_runs_key, 0, agent_run_id)
+            await redis.delete(_job_key(agent_run_id))
+            await redis.delete(_attempts_key(agent_run_id))
+        except Exception as e:
+            logger.warning(f"Failed to release agent run {agent_run_id}: {e}")
+
+    async def _advertise(self) -> None:
+        """Publish this worker's capacity and renew its liveness."""
+        memory = available_memory_mb()
+        await redis.hset_mapping(self.worker_key, {
+            "host": socket.gethostname(),
+            "started_at": self.started_at,
+            "max_runs": self.max_runs,
+            "active_runs": len(self._runs),
+            "available_memory_mb": memory if memory is not None else -1,
+            "heartbeat_at": datetime.now(timezone.utc).isoformat()
+        })
+        await redis.expire(self.worker_key, HEARTBEAT_TTL)
+        await redis.sadd(WORKERS_KEY, self.worker_id)
+
+    async def _heartbeat(self) -> None:
+        """Advertise capacity, drop runs reassigned elsewhere and reap dead workers."""
+        while True:
+            try:
+                # Checked on every beat: a reaper may requeue our runs between any
+                # check of our own key and the renewal below
+                await self._drop_lost_runs()
+                await self._advertise()
+                await reap_dead_workers()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Heartbeat of agent worker {self.worker_id} failed: {e}")
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+
+    async def _drop_lost_runs(self) -> None:
+        """Cancel runs that were reassigned after this worker missed its heartbeats.
+
+        Another worker executes them now, so continuing here would run them twice.
+        """
+        # Snapshot first, so runs claimed while LRANGE is in flight aren't taken as lost
+        runs = list(self._runs.items())
+        if not runs:
+            return
+        claimed = set(await redis.lrange(self.claimed_runs_key, 0, -1))
+        for agent_run_id, task in runs:
+            if agent_run_id not in claimed:
+                logger.warning(f"Agent worker {self.worker_id} lost run {agent_run_id} to another worker, cancelling it")
+                task.cancel()
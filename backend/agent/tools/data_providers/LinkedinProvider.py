@@ -36,6 +36,7 @@ class LinkedinProvider(RapidDataProviderBase):
             "profile_updates": {
                 "route": "/profile_updates",
                 "method": "GET",
+                "cache_ttl": 3600,
                 "name": "Person Posts (WITH PAGINATION)",
                 "description": "Fetches posts of a linkedin profile alongwith reactions, comments, postLink and reposts data.",
                 "payload": {
@@ -48,6 +49,7 @@ class LinkedinProvider(RapidDataProviderBase):
             "profile_recent_comments": {
                 "route": "/profile_recent_comments",
                 "method": "POST",
+                "cache_ttl": 3600,
                 "name": "Person Recent Activity (Comments on Posts)",
                 "description": "Fetches 20 most recent comments posted by a linkedin user (per page).",
                 "payload": {
@@ -59,6 +61,7 @@ class LinkedinProvider(RapidDataProviderBase):
             "comments_from_recent_activity": {
                 "route": "/comments_from_recent_activity",
                 "method": "GET",
+                "cache_ttl": 3600,
                 "name": "Comments from recent activity",
                 "description": "Fetches recent comments posted by a person as per his recent activity tab.",
                 "payload": {
@@ -114,6 +117,7 @@ class LinkedinProvider(RapidDataProviderBase):
             "company_jobs": {
                 "route": "/company_jobs",
                 "method": "POST",
+                "cache_ttl": 3600,
                 "name": "Company Jobs",
                 "description": "Fetches job listings from a LinkedIn company page",
                 "payload": {
@@ -124,6 +128,7 @@ class LinkedinProvider(RapidDataProviderBase):
             "company_updates": {
                 "route": "/company_updates",
                 "method": "GET",
+                "cache_ttl": 3600,
                 "name": "Company Posts",
                 "description": "Fetches posts from a LinkedIn company page",
                 "payload": {
@@ -146,6 +151,7 @@ class LinkedinProvider(RapidDataProviderBase):
             "company_updates_post": {
                 "route": "/company_updates",
                 "method": "POST",
+                "cache_ttl": 3600,
                 "name": "Company Posts (POST)",
                 "description": "Fetches posts from a LinkedIn company page with specific count parameters",
                 "payload": {
@@ -158,6 +164,7 @@ class LinkedinProvider(RapidDataProviderBase):
             "search_posts_with_filters": {
                 "route": "/search_posts_with_filters",
                 "method": "GET",
+                "cache_ttl": 3600,
                 "name": "Search Posts With Filters",
                 "description": "Searches LinkedIn posts with various filtering options",
                 "payload": {
@@ -177,6 +184,7 @@ class LinkedinProvider(RapidDataProviderBase):
             "search_jobs": {
                 "route": "/search_jobs",
                 "method": "GET",
+                "cache_ttl": 3600,
                 "name": "Search Jobs",
                 "description": "Searches LinkedIn jobs with various filtering options",
                 "payload": {
@@ -234,17 +242,20 @@ class LinkedinProvider(RapidDataProviderBase):
             }
         }
         base_url = "https://linkedin-data-scraper.p.rapidapi.com"
-        super().__init__(base_url, endpoints)
+        super().__init__(base_url, endpoints, default_cache_ttl=86400)
 
 
 if __name__ == "__main__":
+    import asyncio
     from dotenv import load_dotenv
     load_dotenv()
     tool = LinkedinProvider()
 
-    result = tool.call_endpoint(
-        route="comments_from_recent_activity",
-        payload={"profile_url": "https://www.linkedin.com/in/adamcohenhillel/", "page": 1}
-    )
-    print(result)
+    async def main():
+        result = await tool.call_endpoint(
+            route="comments_from_recent_activity",
+            payload={"profile_url": "https://www.linkedin.com/in/adamcohenhillel/", "page": 1}
+        )
+        print(result)
 
+    asyncio.run(main())
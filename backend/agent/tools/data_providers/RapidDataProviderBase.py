@@ -1,6 +1,11 @@
 import os
-import requests
-from typing import Dict, Any, Optional, TypedDict, Literal
+import asyncio
+import random
+import httpx
+from typing import Dict, Any, Optional, TypedDict, Literal, NotRequired, Tuple
+
+from services import http_client, cache
+from utils.logger import logger
 
 
 class EndpointSchema(TypedDict):
@@ -9,17 +14,35 @@ class EndpointSchema(TypedDict):
     name: str
     description: str
     payload: Dict[str, Any]
+    cache_ttl: NotRequired[int]  # Seconds to cache successful responses; overrides the provider default, 0 disables
+
+
+# Transport settings for RapidAPI calls
+REQUEST_TIMEOUT = httpx.Timeout(30.0, connect=10.0)
+MAX_RETRIES = 3
+RETRY_BASE_DELAY = 1.0  # Seconds; doubled on every retry, with jitter
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Successful responses are cached across runs (see services/cache)
+CACHE_NAMESPACE = "data_provider"
+CACHE_MAX_BYTES = 128 * 1024 * 1024
+DEFAULT_CACHE_TTL = 3600
 
 
 class RapidDataProviderBase:
-    def __init__(self, base_url: str, endpoints: Dict[str, EndpointSchema]):
+    # Requests currently on the wire, shared by all providers in the process so
+    # identical concurrent calls (from any run) wait on a single request
+    _in_flight: Dict[str, asyncio.Task] = {}
+
+    def __init__(self, base_url: str, endpoints: Dict[str, EndpointSchema], default_cache_ttl: int = DEFAULT_CACHE_TTL):
         self.base_url = base_url
         self.endpoints = endpoints
+        self.default_cache_ttl = default_cache_ttl
     
     def get_endpoints(self):
         return self.endpoints
     
-    def call_endpoint(
+    async def call_endpoint(
             self,
             route: str,
             payload: Optional[Dict[str, Any]] = None
@@ -27,10 +50,15 @@ class RapidDataProviderBase:
         """
         Call an API endpoint with the given parameters and data.
         
+        Successful responses are cached for the endpoint's cache_ttl (or the
+        provider default), and identical calls already in flight are coalesced
+        into one request. Requests go through the shared, pooled HTTP client and
+        are retried with exponential backoff on timeouts, connection errors, 429
+        and 5xx responses.
+        
         Args:
-            endpoint (EndpointSchema): The endpoint configuration dictionary
-            params (dict, optional): Query parameters for GET requests
-            payload (dict, optional): JSON payload for POST requests
+            route (str): The key of the endpoint to call
+            payload (dict, optional): Query parameters for GET requests or JSON payload for POST requests
             
         Returns:
             dict: The JSON response from the API
@@ -51,11 +79,62 @@ class RapidDataProviderBase:
         }
 
         method = endpoint.get('method', 'GET').upper()
-        
-        if method == 'GET':
-            response = requests.get(url, params=payload, headers=headers)
-        elif method == 'POST':
-            response = requests.post(url, json=payload, headers=headers)
-        else:
+        if method not in ('GET', 'POST'):
             raise ValueError(f"Unsupported HTTP method: {method}")
-        return response.json()
+
+        ttl = endpoint.get('cache_ttl', self.default_cache_ttl)
+        cache_key = cache.make_key(method, url, payload)
+        if ttl > 0:
+            cached = await cache.get(CACHE_NAMESPACE, cache_key)
+            if cached:
+                logger.debug(f"Data provider cache hit for {route}")
+                return cached["value"]
+
+        # Join an identical request that is already running instead of sending another.
+        # The request runs in its own task so a cancelled caller doesn't abort it for the others.
+        task = self._in_flight.get(cache_key)
+        if task:
+            logger.debug(f"Coalescing data provider call to {route} with an in-flight request")
+        else:
+            task = asyncio.create_task(self._fetch(method, url, payload, headers, cache_key, ttl))
+            self._in_flight[cache_key] = task
+            task.add_done_callback(lambda t: self._in_flight.pop(cache_key, None) if self._in_flight.get(cache_key) is t else None)
+        return await asyncio.shield(task)
+
+    async def _fetch(self, method: str, url: str, payload: Optional[Dict[str, Any]], headers: Dict[str, str], cache_key: str, ttl: int) -> Any:
+        """Request an endpoint and cache the response if it succeeded."""
+        status_code, data = await self._request(method, url, payload, headers)
+        if ttl > 0 and 200 <= status_code < 300:
+            await cache.put(CACHE_NAMESPACE, cache_key, data, ttl=ttl, max_bytes=CACHE_MAX_BYTES)
+        return data
+
+    async def _request(self, method: str, url: str, payload: Optional[Dict[str, Any]], headers: Dict[str, str]) -> Tuple[int, Any]:
+        """Send a request with retries and return its status code and JSON body.
+
+        Calls aren't throttled per host, so one slow provider doesn't hold back
+        the calls of other runs; 429s with Retry-After provide the backpressure.
+        """
+        client = http_client.get_client()
+        for attempt in range(MAX_RETRIES + 1):
+            delay = RETRY_BASE_DELAY * (2 ** attempt) * (0.5 + random.random())
+            try:
+                if method == 'GET':
+                    response = await client.get(url, params=payload, headers=headers, timeout=REQUEST_TIMEOUT)
+                else:
+                    response = await client.post(url, json=payload, headers=headers, timeout=REQUEST_TIMEOUT)
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                if attempt >= MAX_RETRIES:
+                    raise
+                logger.warning(f"Request to {url} failed (attempt {attempt + 1}/{MAX_RETRIES + 1}): {str(e)}. Retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+
+            if response.status_code in RETRYABLE_STATUS_CODES and attempt < MAX_RETRIES:
+                retry_after = response.headers.get("retry-after")
+                if retry_after and retry_after.isdigit():
+                    delay = max(delay, float(retry_after))
+                logger.warning(f"Request to {url} returned {response.status_code} (attempt {attempt + 1}/{MAX_RETRIES + 1}). Retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+
+            return response.status_code, response.json()
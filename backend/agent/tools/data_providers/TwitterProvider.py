@@ -9,6 +9,7 @@ class TwitterProvider(RapidDataProviderBase):
             "user_info": {
                 "route": "/screenname.php",
                 "method": "GET",
+                "cache_ttl": 3600,
                 "name": "Twitter User Info",
                 "description": "Get information about a Twitter user by screenname or user ID.",
                 "payload": {
@@ -30,6 +31,7 @@ class TwitterProvider(RapidDataProviderBase):
             "following": {
                 "route": "/following.php",
                 "method": "GET",
+                "cache_ttl": 3600,
                 "name": "User Following",
                 "description": "Get users that a specific user follows.",
                 "payload": {
@@ -41,6 +43,7 @@ class TwitterProvider(RapidDataProviderBase):
             "followers": {
                 "route": "/followers.php",
                 "method": "GET",
+                "cache_ttl": 3600,
                 "name": "User Followers",
                 "description": "Get followers of a specific user.",
                 "payload": {
@@ -120,121 +123,124 @@ class TwitterProvider(RapidDataProviderBase):
             }
         }
         base_url = "https://twitter-api45.p.rapidapi.com"
-        super().__init__(base_url, endpoints)
+        super().__init__(base_url, endpoints, default_cache_ttl=300)
 
 
 if __name__ == "__main__":
+    import asyncio
     from dotenv import load_dotenv
     load_dotenv()
     tool = TwitterProvider()
 
-    # Example for getting user info
-    user_info = tool.call_endpoint(
-        route="user_info",
-        payload={
-            "screenname": "elonmusk",
-            # "rest_id": "44196397"  # Optional, uncomment to use user ID instead of screenname
-        }
-    )
-    print("User Info:", user_info)
+    async def main():
+        # Example for getting user info
+        user_info = await tool.call_endpoint(
+            route="user_info",
+            payload={
+                "screenname": "elonmusk",
+                # "rest_id": "44196397"  # Optional, uncomment to use user ID instead of screenname
+            }
+        )
+        print("User Info:", user_info)
     
-    # Example for getting user timeline
-    timeline = tool.call_endpoint(
-        route="timeline",
-        payload={
-            "screenname": "elonmusk",
-            # "cursor": "optional-cursor-value"  # Optional for pagination
-        }
-    )
-    print("Timeline:", timeline)
+        # Example for getting user timeline
+        timeline = await tool.call_endpoint(
+            route="timeline",
+            payload={
+                "screenname": "elonmusk",
+                # "cursor": "optional-cursor-value"  # Optional for pagination
+            }
+        )
+        print("Timeline:", timeline)
     
-    # Example for getting user following
-    following = tool.call_endpoint(
-        route="following",
-        payload={
-            "screenname": "elonmusk",
-            # "cursor": "optional-cursor-value"  # Optional for pagination
-        }
-    )
-    print("Following:", following)
+        # Example for getting user following
+        following = await tool.call_endpoint(
+            route="following",
+            payload={
+                "screenname": "elonmusk",
+                # "cursor": "optional-cursor-value"  # Optional for pagination
+            }
+        )
+        print("Following:", following)
     
-    # Example for getting user followers
-    followers = tool.call_endpoint(
-        route="followers",
-        payload={
-            "screenname": "elonmusk",
-            # "cursor": "optional-cursor-value"  # Optional for pagination
-        }
-    )
-    print("Followers:", followers)
+        # Example for getting user followers
+        followers = await tool.call_endpoint(
+            route="followers",
+            payload={
+                "screenname": "elonmusk",
+                # "cursor": "optional-cursor-value"  # Optional for pagination
+            }
+        )
+        print("Followers:", followers)
     
-    # Example for searching tweets
-    search_results = tool.call_endpoint(
-        route="search",
-        payload={
-            "query": "cybertruck",
-            "search_type": "Top"  # Optional, defaults to Top
-            # "cursor": "optional-cursor-value"  # Optional for pagination
-        }
-    )
-    print("Search Results:", search_results)
+        # Example for searching tweets
+        search_results = await tool.call_endpoint(
+            route="search",
+            payload={
+                "query": "cybertruck",
+                "search_type": "Top"  # Optional, defaults to Top
+                # "cursor": "optional-cursor-value"  # Optional for pagination
+            }
+        )
+        print("Search Results:", search_results)
     
-    # Example for getting user replies
-    replies = tool.call_endpoint(
-        route="replies",
-        payload={
-            "screenname": "elonmusk",
-            # "cursor": "optional-cursor-value"  # Optional for pagination
-        }
-    )
-    print("Replies:", replies)
+        # Example for getting user replies
+        replies = await tool.call_endpoint(
+            route="replies",
+            payload={
+                "screenname": "elonmusk",
+                # "cursor": "optional-cursor-value"  # Optional for pagination
+            }
+        )
+        print("Replies:", replies)
     
-    # Example for checking if user retweeted a tweet
-    check_retweet = tool.call_endpoint(
-        route="check_retweet",
-        payload={
-            "screenname": "elonmusk",
-            "tweet_id": "1671370010743263233"
-        }
-    )
-    print("Check Retweet:", check_retweet)
+        # Example for checking if user retweeted a tweet
+        check_retweet = await tool.call_endpoint(
+            route="check_retweet",
+            payload={
+                "screenname": "elonmusk",
+                "tweet_id": "1671370010743263233"
+            }
+        )
+        print("Check Retweet:", check_retweet)
     
-    # Example for getting tweet details
-    tweet = tool.call_endpoint(
-        route="tweet",
-        payload={
-            "id": "1671370010743263233"
-        }
-    )
-    print("Tweet:", tweet)
+        # Example for getting tweet details
+        tweet = await tool.call_endpoint(
+            route="tweet",
+            payload={
+                "id": "1671370010743263233"
+            }
+        )
+        print("Tweet:", tweet)
     
-    # Example for getting a tweet thread
-    tweet_thread = tool.call_endpoint(
-        route="tweet_thread",
-        payload={
-            "id": "1738106896777699464",
-            # "cursor": "optional-cursor-value"  # Optional for pagination
-        }
-    )
-    print("Tweet Thread:", tweet_thread)
+        # Example for getting a tweet thread
+        tweet_thread = await tool.call_endpoint(
+            route="tweet_thread",
+            payload={
+                "id": "1738106896777699464",
+                # "cursor": "optional-cursor-value"  # Optional for pagination
+            }
+        )
+        print("Tweet Thread:", tweet_thread)
     
-    # Example for getting retweets of a tweet
-    retweets = tool.call_endpoint(
-        route="retweets",
-        payload={
-            "id": "1700199139470942473",
-            # "cursor": "optional-cursor-value"  # Optional for pagination
-        }
-    )
-    print("Retweets:", retweets)
+        # Example for getting retweets of a tweet
+        retweets = await tool.call_endpoint(
+            route="retweets",
+            payload={
+                "id": "1700199139470942473",
+                # "cursor": "optional-cursor-value"  # Optional for pagination
+            }
+        )
+        print("Retweets:", retweets)
     
-    # Example for getting latest replies to a tweet
-    latest_replies = tool.call_endpoint(
-        route="latest_replies",
-        payload={
-            "id": "1738106896777699464",
-            # "cursor": "optional-cursor-value"  # Optional for pagination
-        }
-    )
-    print("Latest Replies:", latest_replies)
-  
\ No newline at end of file
+        # Example for getting latest replies to a tweet
+        latest_replies = await tool.call_endpoint(
+            route="latest_replies",
+            payload={
+                "id": "1738106896777699464",
+                # "cursor": "optional-cursor-value"  # Optional for pagination
+            }
+        )
+        print("Latest Replies:", latest_replies)
+
+    asyncio.run(main())
@@ -1,12 +1,18 @@
 import json
+import asyncio
+from typing import Optional, Union, List, Dict, Any
 
-from agentpress.tool import Tool, ToolResult, openapi_schema, xml_schema
+from agentpress.tool import Tool, ToolResult, ToolAccess, openapi_schema, xml_schema
 from agent.tools.data_providers.LinkedinProvider import LinkedinProvider
 from agent.tools.data_providers.YahooFinanceProvider import YahooFinanceProvider
 from agent.tools.data_providers.AmazonProvider import AmazonProvider
 from agent.tools.data_providers.ZillowProvider import ZillowProvider
 from agent.tools.data_providers.TwitterProvider import TwitterProvider
 
+# Upper bound on provider calls running at once within one tool invocation
+MAX_CONCURRENT_PROVIDER_CALLS = 5
+MAX_PROVIDER_CALLS = 20
+
 class DataProvidersTool(Tool):
     """Tool for making requests to various data providers."""
 
@@ -21,6 +27,30 @@ class DataProvidersTool(Tool):
             "twitter": TwitterProvider()
         }
 
+    def get_tool_access(self, method_name: str, arguments: Dict[str, Any]) -> ToolAccess:
+        """Data provider calls are independent of each other and of the sandbox."""
+        return ToolAccess()
+
+    def _validate_call(self, service_name: str, route: str) -> Optional[str]:
+        """Return an error message if the service/route pair can't be called, else None."""
+        if not service_name:
+            return "service_name is required."
+
+        if not route:
+            return "route is required."
+            
+        if service_name not in self.register_data_providers:
+            return f"API '{service_name}' not found. Available APIs: {list(self.register_data_providers.keys())}"
+        
+        data_provider = self.register_data_providers[service_name]
+        if route == service_name:
+            return f"route '{route}' is the same as service_name '{service_name}'. YOU FUCKING IDIOT!"
+        
+        if route not in data_provider.get_endpoints().keys():
+            return f"Endpoint '{route}' not found in {service_name} data provider."
+        
+        return None
+
     @openapi_schema({
         "type": "function",
         "function": {
@@ -52,7 +82,8 @@ Use this tool when you need to discover what endpoints are available.
 <!-- Example to get LinkedIn API endpoints -->
 <get-data-provider-endpoints service_name="linkedin">
 </get-data-provider-endpoints>
-        '''
+        ''',
+        speculative=True
     )
     async def get_data_provider_endpoints(
         self,
@@ -143,24 +174,12 @@ Use this tool when you need to discover what endpoints are available.
         try:
             payload = json.loads(payload)
 
-            if not service_name:
-                return self.fail_response("service_name is required.")
-
-            if not route:
-                return self.fail_response("route is required.")
-                
-            if service_name not in self.register_data_providers:
-                return self.fail_response(f"API '{service_name}' not found. Available APIs: {list(self.register_data_providers.keys())}")
+            error = self._validate_call(service_name, route)
+            if error:
+                return self.fail_response(error)
             
             data_provider = self.register_data_providers[service_name]
-            if route == service_name:
-                return self.fail_response(f"route '{route}' is the same as service_name '{service_name}'. YOU FUCKING IDIOT!")
-            
-            if route not in data_provider.get_endpoints().keys():
-                return self.fail_response(f"Endpoint '{route}' not found in {service_name} data provider.")
-            
-            
-            result = data_provider.call_endpoint(route, payload)
+            result = await data_provider.call_endpoint(route, payload)
             return self.success_response(result)
             
         except Exception as e:
@@ -170,3 +189,102 @@ Use this tool when you need to discover what endpoints are available.
             if len(error_message) > 200:
                 simplified_message += "..."
             return self.fail_response(simplified_message)
+
+    @openapi_schema({
+        "type": "function",
+        "function": {
+            "name": "execute_data_provider_calls",
+            "description": "Execute several data provider endpoint calls concurrently in one step. Use this instead of repeated execute_data_provider_call invocations when you need data from multiple endpoints, providers or payloads (e.g. quotes for several tickers).",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "calls": {
+                        "type": "array",
+                        "description": "The calls to execute. Each call has a service_name, a route and an optional payload.",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "service_name": {"type": "string"},
+                                "route": {"type": "string"},
+                                "payload": {"type": "object"}
+                            },
+                            "required": ["service_name", "route"]
+                        }
+                    }
+                },
+                "required": ["calls"]
+            }
+        }
+    })
+    @xml_schema(
+        tag_name="execute-data-provider-calls",
+        mappings=[
+            {"param_name": "calls", "node_type": "content", "path": "."}
+        ],
+        example='''
+        <!-- 
+        The execute-data-provider-calls tool runs several data provider calls at once.
+        The content is a JSON list of calls; each route must be a valid endpoint key
+        obtained from the get-data-provider-endpoints tool.
+        -->
+        
+        <!-- Example to fetch the asset profiles of two companies concurrently -->
+        <execute-data-provider-calls>
+            [
+                {"service_name": "yahoo_finance", "route": "get_stock_module", "payload": {"ticker": "AAPL", "module": "asset-profile"}},
+                {"service_name": "yahoo_finance", "route": "get_stock_module", "payload": {"ticker": "MSFT", "module": "asset-profile"}}
+            ]
+        </execute-data-provider-calls>
+        '''
+    )
+    async def execute_data_provider_calls(
+        self,
+        calls: Union[str, List[Dict[str, Any]]]
+    ) -> ToolResult:
+        """
+        Execute several data provider calls concurrently.
+        
+        Parameters:
+        - calls: List (or JSON string of a list) of {"service_name", "route", "payload"} dicts
+        """
+        try:
+            if isinstance(calls, str):
+                calls = json.loads(calls)
+            if not isinstance(calls, list) or not calls:
+                return self.fail_response("calls must be a non-empty list of {service_name, route, payload} objects.")
+            if len(calls) > MAX_PROVIDER_CALLS:
+                return self.fail_response(f"Too many calls ({len(calls)}). Maximum is {MAX_PROVIDER_CALLS} per invocation.")
+
+            semaphore = asyncio.Semaphore(MAX_CONCURRENT_PROVIDER_CALLS)
+
+            async def run_call(call: Dict[str, Any]) -> Dict[str, Any]:
+                service_name = call.get("service_name") if isinstance(call, dict) else None
+                route = call.get("route") if isinstance(call, dict) else None
+                outcome = {"service_name": service_name, "route": route}
+                error = self._validate_call(service_name, route)
+                if error:
+                    return {**outcome, "success": False, "error": error}
+                payload = call.get("payload") or {}
+                if isinstance(payload, str):
+                    try:
+                        payload = json.loads(payload)
+                    except json.JSONDecodeError as e:
+                        return {**outcome, "success": False, "error": f"Invalid JSON payload: {str(e)}"}
+                try:
+                    async with semaphore:
+                        result = await self.register_data_providers[service_name].call_endpoint(route, payload)
+                    return {**outcome, "success": True, "result": result}
+                except Exception as e:
+                    return {**outcome, "success": False, "error": str(e)[:200]}
+
+            results = await asyncio.gather(*(run_call(call) for call in calls))
+            if not any(r["success"] for r in results):
+                return self.fail_response(json.dumps(results))
+            return self.success_response(results)
+
+        except Exception as e:
+            error_message = str(e)
+            simplified_message = f"Error executing data provider calls: {error_message[:200]}"
+            if len(error_message) > 200:
+                simplified_message += "..."
+            return self.fail_response(simplified_message)
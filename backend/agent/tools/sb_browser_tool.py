@@ -1,11 +1,19 @@
 import traceback
 import json
+import re
+import asyncio
 
-from agentpress.tool import ToolResult, openapi_schema, xml_schema
+from agentpress.tool import ToolResult, ToolAccess, openapi_schema, xml_schema
 from agentpress.thread_manager import ThreadManager
 from sandbox.tool_base import SandboxToolsBase
 from utils.logger import logger
 
+# Must match the context ID validation in the sandbox browser API
+BROWSER_CONTEXT_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+# Page-load profiles supported by the sandbox browser API
+NAVIGATION_PROFILES = ["full", "no-media", "no-third-party", "text-only"]
+
 
 class SandboxBrowserTool(SandboxToolsBase):
     """Tool for executing tasks in a Daytona sandbox with browser-use capabilities."""
@@ -14,30 +22,43 @@ class SandboxBrowserTool(SandboxToolsBase):
         super().__init__(project_id, thread_manager)
         self.thread_id = thread_id
 
-    async def _execute_browser_action(self, endpoint: str, params: dict = None, method: str = "POST") -> ToolResult:
+    def get_tool_access(self, method_name: str, arguments: dict) -> ToolAccess:
+        """Browser actions run in order within a browser context; different contexts are independent."""
+        context_id = arguments.get("context_id")
+        return ToolAccess.of(writes=[f"browser:{context_id}" if context_id else "browser"])
+
+    async def _execute_browser_action(self, endpoint: str, params: dict = None, method: str = "POST", context_id: str = None) -> ToolResult:
         """Execute a browser automation action through the API
         
         Args:
             endpoint (str): The API endpoint to call
             params (dict, optional): Parameters to send. Defaults to None.
             method (str, optional): HTTP method to use. Defaults to "POST".
+            context_id (str, optional): Isolated browser context to run the action in.
+                Defaults to None, which uses the sandbox's default context.
             
         Returns:
             ToolResult: Result of the execution
         """
         try:
+            if context_id and not BROWSER_CONTEXT_ID_PATTERN.match(context_id):
+                return self.fail_response(f"Invalid browser context ID '{context_id}': use up to 64 letters, digits, '-' or '_'")
+            
             # Ensure sandbox is initialized
             await self._ensure_sandbox()
             
             # Build the curl command
             url = f"http://localhost:8002/api/automation/{endpoint}"
+            headers = "-H 'Content-Type: application/json'"
+            if context_id:
+                headers += f" -H 'X-Browser-Context: {context_id}'"
             
             if method == "GET" and params:
                 query_params = "&".join([f"{k}={v}" for k, v in params.items()])
                 url = f"{url}?{query_params}"
-                curl_cmd = f"curl -s -X {method} '{url}' -H 'Content-Type: application/json'"
+                curl_cmd = f"curl -s -X {method} '{url}' {headers}"
             else:
-                curl_cmd = f"curl -s -X {method} '{url}' -H 'Content-Type: application/json'"
+                curl_cmd = f"curl -s -X {method} '{url}' {headers}"
                 if params:
                     json_data = json.dumps(params)
                     curl_cmd += f" -d '{json_data}'"
@@ -45,7 +66,9 @@ class SandboxBrowserTool(SandboxToolsBase):
             logger.debug("\033[95mExecuting curl command:\033[0m")
             logger.debug(f"{curl_cmd}")
             
-            response = self.sandbox.process.exec(curl_cmd, timeout=30)
+            # Run the blocking sandbox call off the event loop so actions in
+            # different browser contexts can execute concurrently
+            response = await asyncio.to_thread(self.sandbox.process.exec, curl_cmd, timeout=30)
             
             if response.exit_code == 0:
                 try:
@@ -78,6 +101,8 @@ class SandboxBrowserTool(SandboxToolsBase):
                         success_response['message_id'] = added_message['message_id']
 
                     # Add relevant browser-specific info
+                    if result.get("context_id"):
+                        success_response["context_id"] = result["context_id"]
                     if result.get("url"):
                         success_response["url"] = result["url"]
                     if result.get("title"):
@@ -115,6 +140,15 @@ class SandboxBrowserTool(SandboxToolsBase):
                     "url": {
                         "type": "string",
                         "description": "The url to navigate to"
+                    },
+                    "profile": {
+                        "type": "string",
+                        "enum": NAVIGATION_PROFILES,
+                        "description": "Page-load profile: 'full' (default) loads everything, 'no-media' blocks images, video and fonts, 'no-third-party' blocks requests to other sites, 'text-only' blocks media, fonts, stylesheets and third-party requests. Use 'text-only' or 'no-media' when you only need to read or extract content."
+                    },
+                    "context_id": {
+                        "type": "string",
+                        "description": "Optional ID of an isolated browser context to run the action in (e.g. 'research-1'). Use different IDs to browse pages in parallel; omit for the default context."
                     }
                 },
                 "required": ["url"]
@@ -124,24 +158,43 @@ class SandboxBrowserTool(SandboxToolsBase):
     @xml_schema(
         tag_name="browser-navigate-to",
         mappings=[
-            {"param_name": "url", "node_type": "content", "path": "."}
+            {"param_name": "url", "node_type": "content", "path": "."},
+            {"param_name": "profile", "node_type": "attribute", "path": ".", "required": False},
+            {"param_name": "context_id", "node_type": "attribute", "path": ".", "required": False}
         ],
         example='''
         <browser-navigate-to>
         https://example.com
         </browser-navigate-to>
+
+        <!-- Use separate contexts to browse several pages in parallel -->
+        <browser-navigate-to context_id="research-1">
+        https://example.org
+        </browser-navigate-to>
+
+        <!-- Skip images, fonts, styles and third-party requests when only reading -->
+        <browser-navigate-to profile="text-only">
+        https://example.com/article
+        </browser-navigate-to>
         '''
     )
-    async def browser_navigate_to(self, url: str) -> ToolResult:
+    async def browser_navigate_to(self, url: str, profile: str = None, context_id: str = None) -> ToolResult:
         """Navigate to a specific url
         
         Args:
             url (str): The url to navigate to
+            profile (str, optional): Page-load profile controlling which resources are blocked. Defaults to "full".
+            context_id (str, optional): Browser context to run the action in. Defaults to the shared context.
             
         Returns:
             dict: Result of the execution
         """
-        return await self._execute_browser_action("navigate_to", {"url": url})
+        params = {"url": url}
+        if profile:
+            if profile not in NAVIGATION_PROFILES:
+                return self.fail_response(f"Unknown page-load profile '{profile}'. Use one of: {', '.join(NAVIGATION_PROFILES)}")
+            params["profile"] = profile
+        return await self._execute_browser_action("navigate_to", params, context_id=context_id)
 
     # @openapi_schema({
     #     "type": "function",
@@ -190,25 +243,35 @@ class SandboxBrowserTool(SandboxToolsBase):
             "description": "Navigate back in browser history",
             "parameters": {
                 "type": "object",
-                "properties": {}
+                "properties": {
+                    "context_id": {
+                        "type": "string",
+                        "description": "Optional ID of an isolated browser context to run the action in (e.g. 'research-1'). Use different IDs to browse pages in parallel; omit for the default context."
+                    }
+                }
             }
         }
     })
     @xml_schema(
         tag_name="browser-go-back",
-        mappings=[],
+        mappings=[
+            {"param_name": "context_id", "node_type": "attribute", "path": ".", "required": False}
+        ],
         example='''
         <browser-go-back></browser-go-back>
         '''
     )
-    async def browser_go_back(self) -> ToolResult:
+    async def browser_go_back(self, context_id: str = None) -> ToolResult:
         """Navigate back in browser history
         
+        Args:
+            context_id (str, optional): Browser context to run the action in. Defaults to the shared context.
+            
         Returns:
             dict: Result of the execution
         """
         logger.debug(f"\033[95mNavigating back in browser history\033[0m")
-        return await self._execute_browser_action("go_back", {})
+        return await self._execute_browser_action("go_back", {}, context_id=context_id)
 
     @openapi_schema({
         "type": "function",
@@ -221,6 +284,10 @@ class SandboxBrowserTool(SandboxToolsBase):
                     "seconds": {
                         "type": "integer",
                         "description": "Number of seconds to wait (default: 3)"
+                    },
+                    "context_id": {
+                        "type": "string",
+                        "description": "Optional ID of an isolated browser context to run the action in (e.g. 'research-1'). Use different IDs to browse pages in parallel; omit for the default context."
                     }
                 }
             }
@@ -229,7 +296,8 @@ class SandboxBrowserTool(SandboxToolsBase):
     @xml_schema(
         tag_name="browser-wait",
         mappings=[
-            {"param_name": "seconds", "node_type": "content", "path": "."}
+            {"param_name": "seconds", "node_type": "content", "path": "."},
+            {"param_name": "context_id", "node_type": "attribute", "path": ".", "required": False}
         ],
         example='''
         <browser-wait>
@@ -237,17 +305,18 @@ class SandboxBrowserTool(SandboxToolsBase):
         </browser-wait>
         '''
     )
-    async def browser_wait(self, seconds: int = 3) -> ToolResult:
+    async def browser_wait(self, seconds: int = 3, context_id: str = None) -> ToolResult:
         """Wait for the specified number of seconds
         
         Args:
             seconds (int, optional): Number of seconds to wait. Defaults to 3.
+            context_id (str, optional): Browser context to run the action in. Defaults to the shared context.
             
         Returns:
             dict: Result of the execution
         """
         logger.debug(f"\033[95mWaiting for {seconds} seconds\033[0m")
-        return await self._execute_browser_action("wait", {"seconds": seconds})
+        return await self._execute_browser_action("wait", {"seconds": seconds}, context_id=context_id)
 
     @openapi_schema({
         "type": "function",
@@ -260,6 +329,10 @@ class SandboxBrowserTool(SandboxToolsBase):
                     "index": {
                         "type": "integer",
                         "description": "The index of the element to click"
+                    },
+                    "context_id": {
+                        "type": "string",
+                        "description": "Optional ID of an isolated browser context to run the action in (e.g. 'research-1'). Use different IDs to browse pages in parallel; omit for the default context."
                     }
                 },
                 "required": ["index"]
@@ -269,7 +342,8 @@ class SandboxBrowserTool(SandboxToolsBase):
     @xml_schema(
         tag_name="browser-click-element",
         mappings=[
-            {"param_name": "index", "node_type": "content", "path": "."}
+            {"param_name": "index", "node_type": "content", "path": "."},
+            {"param_name": "context_id", "node_type": "attribute", "path": ".", "required": False}
         ],
         example='''
         <browser-click-element>
@@ -277,17 +351,18 @@ class SandboxBrowserTool(SandboxToolsBase):
         </browser-click-element>
         '''
     )
-    async def browser_click_element(self, index: int) -> ToolResult:
+    async def browser_click_element(self, index: int, context_id: str = None) -> ToolResult:
         """Click on an element by index
         
         Args:
             index (int): The index of the element to click
+            context_id (str, optional): Browser context to run the action in. Defaults to the shared context.
             
         Returns:
             dict: Result of the execution
         """
         logger.debug(f"\033[95mClicking element with index: {index}\033[0m")
-        return await self._execute_browser_action("click_element", {"index": index})
+        return await self._execute_browser_action("click_element", {"index": index}, context_id=context_id)
 
     @openapi_schema({
         "type": "function",
@@ -304,6 +379,10 @@ class SandboxBrowserTool(SandboxToolsBase):
                     "text": {
                         "type": "string",
                         "description": "The text to input"
+                    },
+                    "context_id": {
+                        "type": "string",
+                        "description": "Optional ID of an isolated browser context to run the action in (e.g. 'research-1'). Use different IDs to browse pages in parallel; omit for the default context."
                     }
                 },
                 "required": ["index", "text"]
@@ -314,7 +393,8 @@ class SandboxBrowserTool(SandboxToolsBase):
         tag_name="browser-input-text",
         mappings=[
             {"param_name": "index", "node_type": "attribute", "path": "."},
-            {"param_name": "text", "node_type": "content", "path": "."}
+            {"param_name": "text", "node_type": "content", "path": "."},
+            {"param_name": "context_id", "node_type": "attribute", "path": ".", "required": False}
         ],
         example='''
         <browser-input-text index="2">
@@ -322,18 +402,19 @@ class SandboxBrowserTool(SandboxToolsBase):
         </browser-input-text>
         '''
     )
-    async def browser_input_text(self, index: int, text: str) -> ToolResult:
+    async def browser_input_text(self, index: int, text: str, context_id: str = None) -> ToolResult:
         """Input text into an element
         
         Args:
             index (int): The index of the element to input text into
             text (str): The text to input
+            context_id (str, optional): Browser context to run the action in. Defaults to the shared context.
             
         Returns:
             dict: Result of the execution
         """
         logger.debug(f"\033[95mInputting text into element {index}: {text}\033[0m")
-        return await self._execute_browser_action("input_text", {"index": index, "text": text})
+        return await self._execute_browser_action("input_text", {"index": index, "text": text}, context_id=context_id)
 
     @openapi_schema({
         "type": "function",
@@ -346,6 +427,10 @@ class SandboxBrowserTool(SandboxToolsBase):
                     "keys": {
                         "type": "string",
                         "description": "The keys to send (e.g., 'Enter', 'Escape', 'Control+a')"
+                    },
+                    "context_id": {
+                        "type": "string",
+                        "description": "Optional ID of an isolated browser context to run the action in (e.g. 'research-1'). Use different IDs to browse pages in parallel; omit for the default context."
                     }
                 },
                 "required": ["keys"]
@@ -355,7 +440,8 @@ class SandboxBrowserTool(SandboxToolsBase):
     @xml_schema(
         tag_name="browser-send-keys",
         mappings=[
-            {"param_name": "keys", "node_type": "content", "path": "."}
+            {"param_name": "keys", "node_type": "content", "path": "."},
+            {"param_name": "context_id", "node_type": "attribute", "path": ".", "required": False}
         ],
         example='''
         <browser-send-keys>
@@ -363,17 +449,18 @@ class SandboxBrowserTool(SandboxToolsBase):
         </browser-send-keys>
         '''
     )
-    async def browser_send_keys(self, keys: str) -> ToolResult:
+    async def browser_send_keys(self, keys: str, context_id: str = None) -> ToolResult:
         """Send keyboard keys
         
         Args:
             keys (str): The keys to send (e.g., 'Enter', 'Escape', 'Control+a')
+            context_id (str, optional): Browser context to run the action in. Defaults to the shared context.
             
         Returns:
             dict: Result of the execution
         """
         logger.debug(f"\033[95mSending keys: {keys}\033[0m")
-        return await self._execute_browser_action("send_keys", {"keys": keys})
+        return await self._execute_browser_action("send_keys", {"keys": keys}, context_id=context_id)
 
     @openapi_schema({
         "type": "function",
@@ -386,6 +473,10 @@ class SandboxBrowserTool(SandboxToolsBase):
                     "page_id": {
                         "type": "integer",
                         "description": "The ID of the tab to switch to"
+                    },
+                    "context_id": {
+                        "type": "string",
+                        "description": "Optional ID of an isolated browser context to run the action in (e.g. 'research-1'). Use different IDs to browse pages in parallel; omit for the default context."
                     }
                 },
                 "required": ["page_id"]
@@ -395,7 +486,8 @@ class SandboxBrowserTool(SandboxToolsBase):
     @xml_schema(
         tag_name="browser-switch-tab",
         mappings=[
-            {"param_name": "page_id", "node_type": "content", "path": "."}
+            {"param_name": "page_id", "node_type": "content", "path": "."},
+            {"param_name": "context_id", "node_type": "attribute", "path": ".", "required": False}
         ],
         example='''
         <browser-switch-tab>
@@ -403,17 +495,18 @@ class SandboxBrowserTool(SandboxToolsBase):
         </browser-switch-tab>
         '''
     )
-    async def browser_switch_tab(self, page_id: int) -> ToolResult:
+    async def browser_switch_tab(self, page_id: int, context_id: str = None) -> ToolResult:
         """Switch to a different browser tab
         
         Args:
             page_id (int): The ID of the tab to switch to
+            context_id (str, optional): Browser context to run the action in. Defaults to the shared context.
             
         Returns:
             dict: Result of the execution
         """
         logger.debug(f"\033[95mSwitching to tab: {page_id}\033[0m")
-        return await self._execute_browser_action("switch_tab", {"page_id": page_id})
+        return await self._execute_browser_action("switch_tab", {"page_id": page_id}, context_id=context_id)
 
     # @openapi_schema({
     #     "type": "function",
@@ -466,6 +559,10 @@ class SandboxBrowserTool(SandboxToolsBase):
                     "page_id": {
                         "type": "integer",
                         "description": "The ID of the tab to close"
+                    },
+                    "context_id": {
+                        "type": "string",
+                        "description": "Optional ID of an isolated browser context to run the action in (e.g. 'research-1'). Use different IDs to browse pages in parallel; omit for the default context."
                     }
                 },
                 "required": ["page_id"]
@@ -475,7 +572,8 @@ class SandboxBrowserTool(SandboxToolsBase):
     @xml_schema(
         tag_name="browser-close-tab",
         mappings=[
-            {"param_name": "page_id", "node_type": "content", "path": "."}
+            {"param_name": "page_id", "node_type": "content", "path": "."},
+            {"param_name": "context_id", "node_type": "attribute", "path": ".", "required": False}
         ],
         example='''
         <browser-close-tab>
@@ -483,17 +581,18 @@ class SandboxBrowserTool(SandboxToolsBase):
         </browser-close-tab>
         '''
     )
-    async def browser_close_tab(self, page_id: int) -> ToolResult:
+    async def browser_close_tab(self, page_id: int, context_id: str = None) -> ToolResult:
         """Close a browser tab
         
         Args:
             page_id (int): The ID of the tab to close
+            context_id (str, optional): Browser context to run the action in. Defaults to the shared context.
             
         Returns:
             dict: Result of the execution
         """
         logger.debug(f"\033[95mClosing tab: {page_id}\033[0m")
-        return await self._execute_browser_action("close_tab", {"page_id": page_id})
+        return await self._execute_browser_action("close_tab", {"page_id": page_id}, context_id=context_id)
 
     # @openapi_schema({
     #     "type": "function",
@@ -565,6 +664,10 @@ class SandboxBrowserTool(SandboxToolsBase):
                     "amount": {
                         "type": "integer",
                         "description": "Pixel amount to scroll (if not specified, scrolls one page)"
+                    },
+                    "context_id": {
+                        "type": "string",
+                        "description": "Optional ID of an isolated browser context to run the action in (e.g. 'research-1'). Use different IDs to browse pages in parallel; omit for the default context."
                     }
                 }
             }
@@ -573,7 +676,8 @@ class SandboxBrowserTool(SandboxToolsBase):
     @xml_schema(
         tag_name="browser-scroll-down",
         mappings=[
-            {"param_name": "amount", "node_type": "content", "path": "."}
+            {"param_name": "amount", "node_type": "content", "path": "."},
+            {"param_name": "context_id", "node_type": "attribute", "path": ".", "required": False}
         ],
         example='''
         <browser-scroll-down>
@@ -581,11 +685,12 @@ class SandboxBrowserTool(SandboxToolsBase):
         </browser-scroll-down>
         '''
     )
-    async def browser_scroll_down(self, amount: int = None) -> ToolResult:
+    async def browser_scroll_down(self, amount: int = None, context_id: str = None) -> ToolResult:
         """Scroll down the page
         
         Args:
             amount (int, optional): Pixel amount to scroll. If None, scrolls one page.
+            context_id (str, optional): Browser context to run the action in. Defaults to the shared context.
             
         Returns:
             dict: Result of the execution
@@ -597,7 +702,7 @@ class SandboxBrowserTool(SandboxToolsBase):
         else:
             logger.debug(f"\033[95mScrolling down one page\033[0m")
         
-        return await self._execute_browser_action("scroll_down", params)
+        return await self._execute_browser_action("scroll_down", params, context_id=context_id)
 
     @openapi_schema({
         "type": "function",
@@ -610,6 +715,10 @@ class SandboxBrowserTool(SandboxToolsBase):
                     "amount": {
                         "type": "integer",
                         "description": "Pixel amount to scroll (if not specified, scrolls one page)"
+                    },
+                    "context_id": {
+                        "type": "string",
+                        "description": "Optional ID of an isolated browser context to run the action in (e.g. 'research-1'). Use different IDs to browse pages in parallel; omit for the default context."
                     }
                 }
             }
@@ -618,7 +727,8 @@ class SandboxBrowserTool(SandboxToolsBase):
     @xml_schema(
         tag_name="browser-scroll-up",
         mappings=[
-            {"param_name": "amount", "node_type": "content", "path": "."}
+            {"param_name": "amount", "node_type": "content", "path": "."},
+            {"param_name": "context_id", "node_type": "attribute", "path": ".", "required": False}
         ],
         example='''
         <browser-scroll-up>
@@ -626,11 +736,12 @@ class SandboxBrowserTool(SandboxToolsBase):
         </browser-scroll-up>
         '''
     )
-    async def browser_scroll_up(self, amount: int = None) -> ToolResult:
+    async def browser_scroll_up(self, amount: int = None, context_id: str = None) -> ToolResult:
         """Scroll up the page
         
         Args:
             amount (int, optional): Pixel amount to scroll. If None, scrolls one page.
+            context_id (str, optional): Browser context to run the action in. Defaults to the shared context.
             
         Returns:
             dict: Result of the execution
@@ -642,7 +753,7 @@ class SandboxBrowserTool(SandboxToolsBase):
         else:
             logger.debug(f"\033[95mScrolling up one page\033[0m")
         
-        return await self._execute_browser_action("scroll_up", params)
+        return await self._execute_browser_action("scroll_up", params, context_id=context_id)
 
     @openapi_schema({
         "type": "function",
@@ -655,6 +766,10 @@ class SandboxBrowserTool(SandboxToolsBase):
                     "text": {
                         "type": "string",
                         "description": "The text to scroll to"
+                    },
+                    "context_id": {
+                        "type": "string",
+                        "description": "Optional ID of an isolated browser context to run the action in (e.g. 'research-1'). Use different IDs to browse pages in parallel; omit for the default context."
                     }
                 },
                 "required": ["text"]
@@ -664,7 +779,8 @@ class SandboxBrowserTool(SandboxToolsBase):
     @xml_schema(
         tag_name="browser-scroll-to-text",
         mappings=[
-            {"param_name": "text", "node_type": "content", "path": "."}
+            {"param_name": "text", "node_type": "content", "path": "."},
+            {"param_name": "context_id", "node_type": "attribute", "path": ".", "required": False}
         ],
         example='''
         <browser-scroll-to-text>
@@ -672,17 +788,18 @@ class SandboxBrowserTool(SandboxToolsBase):
         </browser-scroll-to-text>
         '''
     )
-    async def browser_scroll_to_text(self, text: str) -> ToolResult:
+    async def browser_scroll_to_text(self, text: str, context_id: str = None) -> ToolResult:
         """Scroll to specific text on the page
         
         Args:
             text (str): The text to scroll to
+            context_id (str, optional): Browser context to run the action in. Defaults to the shared context.
             
         Returns:
             dict: Result of the execution
         """
         logger.debug(f"\033[95mScrolling to text: {text}\033[0m")
-        return await self._execute_browser_action("scroll_to_text", {"text": text})
+        return await self._execute_browser_action("scroll_to_text", {"text": text}, context_id=context_id)
 
     @openapi_schema({
         "type": "function",
@@ -695,6 +812,10 @@ class SandboxBrowserTool(SandboxToolsBase):
                     "index": {
                         "type": "integer",
                         "description": "The index of the dropdown element"
+                    },
+                    "context_id": {
+                        "type": "string",
+                        "description": "Optional ID of an isolated browser context to run the action in (e.g. 'research-1'). Use different IDs to browse pages in parallel; omit for the default context."
                     }
                 },
                 "required": ["index"]
@@ -704,7 +825,8 @@ class SandboxBrowserTool(SandboxToolsBase):
     @xml_schema(
         tag_name="browser-get-dropdown-options",
         mappings=[
-            {"param_name": "index", "node_type": "content", "path": "."}
+            {"param_name": "index", "node_type": "content", "path": "."},
+            {"param_name": "context_id", "node_type": "attribute", "path": ".", "required": False}
         ],
         example='''
         <browser-get-dropdown-options>
@@ -712,17 +834,18 @@ class SandboxBrowserTool(SandboxToolsBase):
         </browser-get-dropdown-options>
         '''
     )
-    async def browser_get_dropdown_options(self, index: int) -> ToolResult:
+    async def browser_get_dropdown_options(self, index: int, context_id: str = None) -> ToolResult:
         """Get all options from a dropdown element
         
         Args:
             index (int): The index of the dropdown element
+            context_id (str, optional): Browser context to run the action in. Defaults to the shared context.
             
         Returns:
             dict: Result of the execution with the dropdown options
         """
         logger.debug(f"\033[95mGetting options from dropdown with index: {index}\033[0m")
-        return await self._execute_browser_action("get_dropdown_options", {"index": index})
+        return await self._execute_browser_action("get_dropdown_options", {"index": index}, context_id=context_id)
 
     @openapi_schema({
         "type": "function",
@@ -739,6 +862,10 @@ class SandboxBrowserTool(SandboxToolsBase):
                     "text": {
                         "type": "string",
                         "description": "The text of the option to select"
+                    },
+                    "context_id": {
+                        "type": "string",
+                        "description": "Optional ID of an isolated browser context to run the action in (e.g. 'research-1'). Use different IDs to browse pages in parallel; omit for the default context."
                     }
                 },
                 "required": ["index", "text"]
@@ -749,7 +876,8 @@ class SandboxBrowserTool(SandboxToolsBase):
         tag_name="browser-select-dropdown-option",
         mappings=[
             {"param_name": "index", "node_type": "attribute", "path": "."},
-            {"param_name": "text", "node_type": "content", "path": "."}
+            {"param_name": "text", "node_type": "content", "path": "."},
+            {"param_name": "context_id", "node_type": "attribute", "path": ".", "required": False}
         ],
         example='''
         <browser-select-dropdown-option index="2">
@@ -757,18 +885,19 @@ class SandboxBrowserTool(SandboxToolsBase):
         </browser-select-dropdown-option>
         '''
     )
-    async def browser_select_dropdown_option(self, index: int, text: str) -> ToolResult:
+    async def browser_select_dropdown_option(self, index: int, text: str, context_id: str = None) -> ToolResult:
         """Select an option from a dropdown by text
         
         Args:
             index (int): The index of the dropdown element
             text (str): The text of the option to select
+            context_id (str, optional): Browser context to run the action in. Defaults to the shared context.
             
         Returns:
             dict: Result of the execution
         """
         logger.debug(f"\033[95mSelecting option '{text}' from dropdown with index: {index}\033[0m")
-        return await self._execute_browser_action("select_dropdown_option", {"index": index, "text": text})
+        return await self._execute_browser_action("select_dropdown_option", {"index": index, "text": text}, context_id=context_id)
 
     @openapi_schema({
         "type": "function",
@@ -801,6 +930,10 @@ class SandboxBrowserTool(SandboxToolsBase):
                     "coord_target_y": {
                         "type": "integer",
                         "description": "The target Y coordinate"
+                    },
+                    "context_id": {
+                        "type": "string",
+                        "description": "Optional ID of an isolated browser context to run the action in (e.g. 'research-1'). Use different IDs to browse pages in parallel; omit for the default context."
                     }
                 }
             }
@@ -814,7 +947,8 @@ class SandboxBrowserTool(SandboxToolsBase):
             {"param_name": "coord_source_x", "node_type": "attribute", "path": "."},
             {"param_name": "coord_source_y", "node_type": "attribute", "path": "."},
             {"param_name": "coord_target_x", "node_type": "attribute", "path": "."},
-            {"param_name": "coord_target_y", "node_type": "attribute", "path": "."}
+            {"param_name": "coord_target_y", "node_type": "attribute", "path": "."},
+            {"param_name": "context_id", "node_type": "attribute", "path": ".", "required": False}
         ],
         example='''
         <browser-drag-drop element_source="#draggable" element_target="#droppable"></browser-drag-drop>
@@ -822,7 +956,7 @@ class SandboxBrowserTool(SandboxToolsBase):
     )
     async def browser_drag_drop(self, element_source: str = None, element_target: str = None, 
                                coord_source_x: int = None, coord_source_y: int = None,
-                               coord_target_x: int = None, coord_target_y: int = None) -> ToolResult:
+                               coord_target_x: int = None, coord_target_y: int = None, context_id: str = None) -> ToolResult:
         """Perform drag and drop operation between elements or coordinates
         
         Args:
@@ -832,6 +966,7 @@ class SandboxBrowserTool(SandboxToolsBase):
             coord_source_y (int, optional): The source Y coordinate
             coord_target_x (int, optional): The target X coordinate
             coord_target_y (int, optional): The target Y coordinate
+            context_id (str, optional): Browser context to run the action in. Defaults to the shared context.
             
         Returns:
             dict: Result of the execution
@@ -851,7 +986,7 @@ class SandboxBrowserTool(SandboxToolsBase):
         else:
             return self.fail_response("Must provide either element selectors or coordinates for drag and drop")
         
-        return await self._execute_browser_action("drag_drop", params)
+        return await self._execute_browser_action("drag_drop", params, context_id=context_id)
 
     @openapi_schema({
         "type": "function",
@@ -868,6 +1003,10 @@ class SandboxBrowserTool(SandboxToolsBase):
                     "y": {
                         "type": "integer",
                         "description": "The Y coordinate to click"
+                    },
+                    "context_id": {
+                        "type": "string",
+                        "description": "Optional ID of an isolated browser context to run the action in (e.g. 'research-1'). Use different IDs to browse pages in parallel; omit for the default context."
                     }
                 },
                 "required": ["x", "y"]
@@ -878,21 +1017,65 @@ class SandboxBrowserTool(SandboxToolsBase):
         tag_name="browser-click-coordinates",
         mappings=[
             {"param_name": "x", "node_type": "attribute", "path": "."},
-            {"param_name": "y", "node_type": "attribute", "path": "."}
+            {"param_name": "y", "node_type": "attribute", "path": "."},
+            {"param_name": "context_id", "node_type": "attribute", "path": ".", "required": False}
         ],
         example='''
         <browser-click-coordinates x="100" y="200"></browser-click-coordinates>
         '''
     )
-    async def browser_click_coordinates(self, x: int, y: int) -> ToolResult:
+    async def browser_click_coordinates(self, x: int, y: int, context_id: str = None) -> ToolResult:
         """Click at specific X,Y coordinates on the page
         
         Args:
             x (int): The X coordinate to click
             y (int): The Y coordinate to click
+            context_id (str, optional): Browser context to run the action in. Defaults to the shared context.
             
         Returns:
             dict: Result of the execution
         """
         logger.debug(f"\033[95mClicking at coordinates: ({x}, {y})\033[0m")
-        return await self._execute_browser_action("click_coordinates", {"x": x, "y": y})
\ No newline at end of file
+        return await self._execute_browser_action("click_coordinates", {"x": x, "y": y}, context_id=context_id)
+
+    @openapi_schema({
+        "type": "function",
+        "function": {
+            "name": "browser_close_context",
+            "description": "Close an isolated browser context and all of its tabs once you are done with it",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "context_id": {
+                        "type": "string",
+                        "description": "The ID of the browser context to close"
+                    }
+                },
+                "required": ["context_id"]
+            }
+        }
+    })
+    @xml_schema(
+        tag_name="browser-close-context",
+        mappings=[
+            {"param_name": "context_id", "node_type": "content", "path": "."}
+        ],
+        example='''
+        <browser-close-context>
+        research-1
+        </browser-close-context>
+        '''
+    )
+    async def browser_close_context(self, context_id: str) -> ToolResult:
+        """Close an isolated browser context and all of its tabs
+        
+        Args:
+            context_id (str): The ID of the browser context to close
+            
+        Returns:
+            dict: Result of the execution
+        """
+        if not BROWSER_CONTEXT_ID_PATTERN.match(context_id):
+            return self.fail_response(f"Invalid browser context ID '{context_id}'")
+        logger.debug(f"\033[95mClosing browser context: {context_id}\033[0m")
+        return await self._execute_browser_action("close_context", {"context_id": context_id})
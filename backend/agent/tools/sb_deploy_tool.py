@@ -1,18 +1,97 @@
 import os
+import re
+import json
+import shlex
+import asyncio
+from typing import Optional, Dict, Any
 from dotenv import load_dotenv
-from agentpress.tool import ToolResult, openapi_schema, xml_schema
+from agentpress.tool import ToolResult, ToolAccess, openapi_schema, xml_schema
 from sandbox.tool_base import SandboxToolsBase
 from utils.files_utils import clean_path
+from utils.logger import logger
 from agentpress.thread_manager import ThreadManager
 
 # Load environment variables
 load_dotenv()
 
+# Per-project deploy state in the sandbox: the manifest of the last successful
+# deploy, its URL, and the log and exit code of the current deploy
+DEPLOY_STATE_DIR = "$HOME/.cache/sandbox_deploy"
+DEPLOY_TIMEOUT = 300
+DEPLOY_POLL_INTERVAL = 2
+DEPLOY_OUTPUT_TAIL = 4000
+DEPLOY_STATUS_MARKER = "__DEPLOY_STATUS__:"
+DEPLOY_URL_PATTERN = re.compile(r"https://[^\s]+\.pages\.dev[^\s]*")
+
+# Hashes every file of the site and compares the result with the manifest of
+# the last successful deploy. The new manifest is kept as pending until the
+# deploy succeeds.
+SANDBOX_DEPLOY_MANIFEST_SCRIPT = """
+import hashlib, json, os, sys
+site_dir, state_dir, project = sys.argv[1], os.path.expanduser(sys.argv[2]), sys.argv[3]
+os.makedirs(state_dir, exist_ok=True)
+files = {}
+for root, dirs, names in os.walk(site_dir):
+    dirs[:] = [d for d in dirs if d not in ("node_modules", ".git")]
+    for name in names:
+        path = os.path.join(root, name)
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        files[os.path.relpath(path, site_dir)] = digest.hexdigest()
+try:
+    with open(os.path.join(state_dir, project + ".json")) as f:
+        previous = json.load(f)
+except (OSError, ValueError):
+    previous = None
+try:
+    with open(os.path.join(state_dir, project + ".url")) as f:
+        url = f.read().strip() or None
+except OSError:
+    url = None
+with open(os.path.join(state_dir, project + ".pending.json"), "w") as f:
+    json.dump(files, f)
+prev = previous or {}
+print(json.dumps({
+    "files": len(files),
+    "added": sum(1 for p in files if p not in prev),
+    "modified": sum(1 for p in files if p in prev and prev[p] != files[p]),
+    "removed": sum(1 for p in prev if p not in files),
+    "unchanged": previous == files,
+    "url": url
+}))
+"""
+
+# Runs detached in the sandbox. Uses the globally installed wrangler (installing
+# it once if missing) instead of resolving it through npx on every deploy, and
+# only creates the Pages project before the first successful deploy.
+SANDBOX_DEPLOY_SCRIPT = """
+STATE_DIR="$1"; PROJECT="$2"; SITE_DIR="$3"
+if command -v wrangler >/dev/null 2>&1; then
+    WRANGLER=wrangler
+else
+    echo "Installing wrangler..."
+    if npm install -g wrangler >/dev/null 2>&1; then WRANGLER=wrangler; else WRANGLER="npx --yes wrangler"; fi
+fi
+if [ ! -f "$STATE_DIR/$PROJECT.created" ]; then
+    $WRANGLER pages project create "$PROJECT" --production-branch production || true
+fi
+$WRANGLER pages deploy "$SITE_DIR" --project-name "$PROJECT"
+code=$?
+if [ $code -eq 0 ]; then
+    touch "$STATE_DIR/$PROJECT.created"
+    mv "$STATE_DIR/$PROJECT.pending.json" "$STATE_DIR/$PROJECT.json"
+    grep -o 'https://[^ ]*\.pages\.dev[^ ]*' "$STATE_DIR/$PROJECT.log" | tail -n 1 > "$STATE_DIR/$PROJECT.url"
+fi
+echo $code > "$STATE_DIR/$PROJECT.exit"
+"""
+
 class SandboxDeployTool(SandboxToolsBase):
     """Tool for deploying static websites from a Daytona sandbox to Cloudflare Pages."""
 
-    def __init__(self, project_id: str, thread_manager: ThreadManager):
-        super().__init__(project_id, thread_manager)
+    def __init__(self, project_id: str, thread_manager: ThreadManager, agent_run_id: Optional[str] = None):
+        super().__init__(project_id, thread_manager, agent_run_id)
         self.workspace_path = "/workspace"  # Ensure we're always operating in /workspace
         self.cloudflare_api_token = os.getenv("CLOUDFLARE_API_TOKEN")
 
@@ -20,6 +99,74 @@ class SandboxDeployTool(SandboxToolsBase):
         """Clean and normalize a path to be relative to /workspace"""
         return clean_path(path, self.workspace_path)
 
+    def get_tool_access(self, method_name: str, arguments: Dict[str, Any]) -> ToolAccess:
+        """Deploys wait for earlier writes to the site directory and for earlier deploys of the same site."""
+        return ToolAccess.of(
+            reads=[self.fs_resource(arguments.get("directory_path", ""))],
+            writes=[f"deploy:{arguments.get('name', '')}"]
+        )
+
+    async def _exec(self, command: str, timeout: int = 60):
+        """Run a command in the sandbox without blocking the event loop."""
+        return await asyncio.to_thread(self.sandbox.process.exec, command, timeout=timeout)
+
+    async def _compute_manifest(self, full_path: str, project_name: str) -> Optional[dict]:
+        """Diff the site against the last successful deploy of the project, or None if that fails."""
+        response = await self._exec(
+            f"python3 -c {shlex.quote(SANDBOX_DEPLOY_MANIFEST_SCRIPT)} {shlex.quote(full_path)} {DEPLOY_STATE_DIR} {project_name}"
+        )
+        if response.exit_code != 0:
+            logger.warning(f"Could not compute deploy manifest for {project_name}: {response.result}")
+            return None
+        return json.loads(response.result.strip().splitlines()[-1])
+
+    async def _run_deploy(self, full_path: str, project_name: str) -> tuple:
+        """Start the deploy detached in the sandbox and follow its log until it finishes.
+        
+        New log output is published as deploy_progress status events while waiting.
+        
+        Returns:
+            (exit code or None if it timed out, log output)
+        """
+        state = f'"{DEPLOY_STATE_DIR}"'
+        await self._exec(
+            f"mkdir -p {state} && rm -f {state}/{project_name}.exit && cd {self.workspace_path} && "
+            f"CLOUDFLARE_API_TOKEN={shlex.quote(self.cloudflare_api_token)} nohup sh -c {shlex.quote(SANDBOX_DEPLOY_SCRIPT)} "
+            f"deploy {state} {project_name} {shlex.quote(full_path)} > {state}/{project_name}.log 2>&1 &",
+            timeout=30
+        )
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + DEPLOY_TIMEOUT
+        offset = 0
+        output = ""
+        while True:
+            await asyncio.sleep(DEPLOY_POLL_INTERVAL)
+            # One call returns the exit code (once written), the log size and the new log bytes
+            response = await self._exec(
+                f"code=$(cat {state}/{project_name}.exit 2>/dev/null); "
+                f"size=$(stat -c %s {state}/{project_name}.log 2>/dev/null || echo 0); "
+                f'echo "{DEPLOY_STATUS_MARKER}$code:$size"; '
+                f"tail -c +{offset + 1} {state}/{project_name}.log | head -c $((size - {offset}))",
+                timeout=30
+            )
+            _, _, marked_output = (response.result or "").partition(DEPLOY_STATUS_MARKER)
+            header, _, new_output = marked_output.partition("\n")
+            code, _, size = header.strip().partition(":")
+            if size.isdigit():
+                offset = int(size)
+            if new_output.strip():
+                output += new_output
+                await self.publish_status_event({
+                    "status_type": "deploy_progress",
+                    "project_name": project_name,
+                    "output": new_output
+                })
+            if code.lstrip("-").isdigit():
+                return int(code), output
+            if loop.time() > deadline:
+                return None, output
+
     @openapi_schema({
         "type": "function",
         "function": {
@@ -95,25 +242,39 @@ class SandboxDeployTool(SandboxToolsBase):
                 if not self.cloudflare_api_token:
                     return self.fail_response("CLOUDFLARE_API_TOKEN environment variable not set")
                     
-                # Single command that creates the project if it doesn't exist and then deploys
                 project_name = f"{self.sandbox_id}-{name}"
-                deploy_cmd = f'''cd {self.workspace_path} && export CLOUDFLARE_API_TOKEN={self.cloudflare_api_token} && 
-                    (npx wrangler pages deploy {full_path} --project-name {project_name} || 
-                    (npx wrangler pages project create {project_name} --production-branch production && 
-                    npx wrangler pages deploy {full_path} --project-name {project_name}))'''
-
-                # Execute the command directly using the sandbox's process.exec method
-                response = self.sandbox.process.exec(deploy_cmd, timeout=300)
-                
-                print(f"Deployment command output: {response.result}")
-                
-                if response.exit_code == 0:
+
+                # Skip the upload entirely when nothing changed since the last successful deploy
+                changes = await self._compute_manifest(full_path, project_name)
+                if changes and changes["unchanged"] and changes["url"]:
+                    return self.success_response({
+                        "message": "No changes since the last deployment; the site is already up to date",
+                        "url": changes["url"],
+                        "changes": changes
+                    })
+
+                await self.publish_status_event({
+                    "status_type": "deploy_progress",
+                    "project_name": project_name,
+                    "output": f"Deploying {directory_path}" + (f" ({changes['added']} added, {changes['modified']} modified, {changes['removed']} removed files)" if changes else "") + "\n"
+                })
+
+                # wrangler uploads only assets whose content hash Cloudflare doesn't have yet
+                exit_code, output = await self._run_deploy(full_path, project_name)
+                output_tail = output[-DEPLOY_OUTPUT_TAIL:]
+
+                if exit_code is None:
+                    return self.fail_response(f"Deployment did not finish within {DEPLOY_TIMEOUT} seconds. Output so far: {output_tail}")
+                if exit_code == 0:
+                    urls = DEPLOY_URL_PATTERN.findall(output)
                     return self.success_response({
-                        "message": f"Website deployed successfully",
-                        "output": response.result
+                        "message": "Website deployed successfully",
+                        "url": urls[-1] if urls else None,
+                        "changes": changes,
+                        "output": output_tail
                     })
                 else:
-                    return self.fail_response(f"Deployment failed with exit code {response.exit_code}: {response.result}")
+                    return self.fail_response(f"Deployment failed with exit code {exit_code}: {output_tail}")
             except Exception as e:
                 return self.fail_response(f"Error during deployment: {str(e)}")
         except Exception as e:
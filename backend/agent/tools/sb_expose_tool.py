@@ -1,4 +1,5 @@
-from agentpress.tool import ToolResult, openapi_schema, xml_schema
+from typing import Dict, Any
+from agentpress.tool import ToolResult, ToolAccess, openapi_schema, xml_schema
 from sandbox.tool_base import SandboxToolsBase
 from agentpress.thread_manager import ThreadManager
 
@@ -8,6 +9,10 @@ class SandboxExposeTool(SandboxToolsBase):
     def __init__(self, project_id: str, thread_manager: ThreadManager):
         super().__init__(project_id, thread_manager)
 
+    def get_tool_access(self, method_name: str, arguments: Dict[str, Any]) -> ToolAccess:
+        """Wait for earlier shell commands, which usually start the server being exposed."""
+        return ToolAccess.of(reads=["shell"])
+
     @openapi_schema({
         "type": "function",
         "function": {
@@ -1,10 +1,98 @@
 
-from agentpress.tool import ToolResult, openapi_schema, xml_schema
+from agentpress.tool import ToolResult, ToolAccess, openapi_schema, xml_schema
 from sandbox.tool_base import SandboxToolsBase    
 from utils.files_utils import should_exclude_file, clean_path
 from agentpress.thread_manager import ThreadManager
 from utils.logger import logger
+from typing import Optional, List, Dict, Any, Union
 import os
+import json
+import base64
+import shlex
+import io
+import re
+import tarfile
+import uuid
+
+# File operations are applied inside the sandbox by this script so files never have
+# to be downloaded and re-uploaded. It takes either a base64-encoded JSON list of
+# operations or "@<path>" to a tar archive holding manifest.json plus the contents
+# of created files, applies the operations in order and prints a JSON list with
+# one result per operation.
+SANDBOX_FILE_OPS_SCRIPT = """
+import base64, json, os, sys, tarfile, tempfile
+
+def write_atomic(path, data, mode):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.chmod(tmp, mode)
+    os.replace(tmp, path)
+
+def create(op, data):
+    path = op["path"]
+    if os.path.exists(path):
+        return {"status": "exists"}
+    os.makedirs(os.path.dirname(path), mode=0o755, exist_ok=True)
+    write_atomic(path, data, int(op.get("permissions") or "644", 8))
+    return {"status": "ok"}
+
+def replace(op):
+    path, old, new, ctx = op["path"], op["old_str"], op["new_str"], op.get("snippet_lines", 4)
+    try:
+        with open(path, encoding="utf-8", newline="") as f:
+            content = f.read()
+    except FileNotFoundError:
+        return {"status": "missing"}
+    count = content.count(old)
+    if count != 1:
+        lines = [i + 1 for i, line in enumerate(content.split("\\n")) if old in line] if count else []
+        return {"status": "not_found" if count == 0 else "multiple", "lines": lines}
+    new_content = content.replace(old, new, 1)
+    write_atomic(path, new_content.encode("utf-8"), os.stat(path).st_mode & 0o7777)
+    line = content.split(old)[0].count("\\n")
+    start, end = max(0, line - ctx), line + ctx + new.count("\\n")
+    return {"status": "ok", "snippet": "\\n".join(new_content.split("\\n")[start:end + 1])}
+
+def delete(op):
+    if not os.path.lexists(op["path"]):
+        return {"status": "missing"}
+    os.remove(op["path"])
+    return {"status": "ok"}
+
+arg = sys.argv[1]
+archive = None
+try:
+    archive = tarfile.open(arg[1:]) if arg.startswith("@") else None
+    ops = json.load(archive.extractfile("manifest.json")) if archive else json.loads(base64.b64decode(arg))
+    results = []
+    for op in ops:
+        try:
+            if op["type"] == "create":
+                data = archive.extractfile(op["member"]).read() if archive else op["file_contents"].encode("utf-8")
+                results.append(create(op, data))
+            elif op["type"] == "edit":
+                results.append(replace(op))
+            elif op["type"] == "delete":
+                results.append(delete(op))
+            else:
+                results.append({"status": "error", "message": "unknown operation " + repr(op["type"])})
+        except Exception as e:
+            results.append({"status": "error", "message": str(e)})
+finally:
+    if archive:
+        archive.close()
+    if arg.startswith("@") and os.path.exists(arg[1:]):
+        os.remove(arg[1:])
+print(json.dumps(results))
+"""
+
+# Inline payloads above this size don't fit in a single command argument (Linux
+# caps one argv entry at 128KB), so larger edits fall back to download/upload.
+SERVER_SIDE_EDIT_MAX_PAYLOAD = 96 * 1024
+
+# Upper bound on operations accepted by one batch_file_operations call
+MAX_BATCH_OPERATIONS = 100
 
 class SandboxFilesTool(SandboxToolsBase):
     """Tool for executing file system operations in a Daytona sandbox. All operations are performed relative to the /workspace directory."""
@@ -18,6 +106,19 @@ class SandboxFilesTool(SandboxToolsBase):
         """Clean and normalize a path to be relative to /workspace"""
         return clean_path(path, self.workspace_path)
 
+    def get_tool_access(self, method_name: str, arguments: Dict[str, Any]) -> ToolAccess:
+        """File operations only conflict with calls that touch the same paths."""
+        if method_name == "batch_file_operations":
+            try:
+                paths = [op["file_path"] for op in self._parse_batch_operations(arguments.get("operations", []))]
+            except (ValueError, TypeError, AttributeError, json.JSONDecodeError):
+                return super().get_tool_access(method_name, arguments)
+        elif arguments.get("file_path"):
+            paths = [arguments["file_path"]]
+        else:
+            return super().get_tool_access(method_name, arguments)
+        return ToolAccess.of(writes=[self.fs_resource(path) for path in paths])
+
     def _should_exclude_file(self, rel_path: str) -> bool:
         """Check if a file should be excluded based on path, name, or extension"""
         return should_exclude_file(rel_path)
@@ -66,6 +167,51 @@ class SandboxFilesTool(SandboxToolsBase):
             return {}
 
 
+    def _run_file_ops(self, ops_arg: str, timeout: int = 60) -> Optional[List[dict]]:
+        """Run SANDBOX_FILE_OPS_SCRIPT in the sandbox.
+        
+        Args:
+            ops_arg: Base64-encoded JSON list of operations, or "@<path>" to an uploaded tar archive
+            timeout: Command timeout in seconds
+            
+        Returns:
+            One result dict per operation, or None if the script could not run.
+        """
+        try:
+            response = self.sandbox.process.exec(
+                f"python3 -c {shlex.quote(SANDBOX_FILE_OPS_SCRIPT)} {shlex.quote(ops_arg)}",
+                timeout=timeout
+            )
+            if response.exit_code != 0:
+                logger.warning(f"Sandbox file operations failed (exit code {response.exit_code}): {response.result}")
+                return None
+            return json.loads(response.result.strip().splitlines()[-1])
+        except Exception as e:
+            logger.warning(f"Sandbox file operations unavailable: {str(e)}")
+            return None
+
+    def _server_side_replace(self, full_path: str, old_str: str, new_str: str) -> Optional[dict]:
+        """Replace a unique string in a file inside the sandbox without transferring the file.
+        
+        Returns:
+            The helper's result, or None if the edit could not run in the
+            sandbox and should be done on a downloaded copy instead.
+        """
+        payload = base64.b64encode(json.dumps([{
+            "type": "edit",
+            "path": full_path,
+            "old_str": old_str,
+            "new_str": new_str,
+            "snippet_lines": self.SNIPPET_LINES
+        }]).encode()).decode()
+        if len(payload) > SERVER_SIDE_EDIT_MAX_PAYLOAD:
+            return None
+        
+        results = self._run_file_ops(payload)
+        if not results or results[0].get("status") == "error":
+            return None
+        return results[0]
+
     # def _get_preview_url(self, file_path: str) -> Optional[str]:
     #     """Get the preview URL for a file if it's an HTML file."""
     #     if file_path.lower().endswith('.html') and self._sandbox_url:
@@ -185,12 +331,26 @@ class SandboxFilesTool(SandboxToolsBase):
             
             file_path = self.clean_path(file_path)
             full_path = f"{self.workspace_path}/{file_path}"
+            
+            old_str = old_str.expandtabs()
+            new_str = new_str.expandtabs()
+            
+            result = self._server_side_replace(full_path, old_str, new_str)
+            if result is not None:
+                status = result.get("status")
+                if status == "missing":
+                    return self.fail_response(f"File '{file_path}' does not exist")
+                if status == "not_found":
+                    return self.fail_response(f"String '{old_str}' not found in file")
+                if status == "multiple":
+                    return self.fail_response(f"Multiple occurrences found in lines {result.get('lines', [])}. Please ensure string is unique")
+                return self.success_response("Replacement successful.")
+            
+            # Fall back to editing a downloaded copy
             if not self._file_exists(full_path):
                 return self.fail_response(f"File '{file_path}' does not exist")
             
             content = self.sandbox.fs.download_file(full_path).decode()
-            old_str = old_str.expandtabs()
-            new_str = new_str.expandtabs()
             
             occurrences = content.count(old_str)
             if occurrences == 0:
@@ -326,6 +486,216 @@ class SandboxFilesTool(SandboxToolsBase):
         except Exception as e:
             return self.fail_response(f"Error deleting file: {str(e)}")
 
+    @staticmethod
+    def _strip_tag_layout(text: str) -> str:
+        """Remove the newline after an opening tag and the one before its closing tag.
+        
+        Only the line breaks of the XML layout are removed; any other leading or
+        trailing whitespace belongs to the contents and is kept.
+        """
+        text = re.sub(r'\A\r?\n', '', text)
+        return re.sub(r'\r?\n[ \t]*\Z', '', text)
+
+    def _parse_batch_operations(self, operations: Union[str, List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Normalize batch operations given as a list, a JSON string or XML-style tags.
+        
+        Raises:
+            ValueError: If an operation is malformed
+        """
+        if isinstance(operations, str):
+            text = operations.strip()
+            if text.startswith('['):
+                operations = json.loads(text)
+            else:
+                operations = []
+                for match in re.finditer(r'<(create|edit|delete)\b([^>]*)>(.*?)</\1>', text, re.DOTALL):
+                    tag, attrs, body = match.groups()
+                    op = {"operation": tag}
+                    for name, value in re.findall(r'(\w+)="([^"]*)"', attrs):
+                        op[name] = value
+                    if tag == "create":
+                        op["file_contents"] = self._strip_tag_layout(body)
+                    elif tag == "edit":
+                        old_match = re.search(r'<old_str>(.*?)</old_str>', body, re.DOTALL)
+                        new_match = re.search(r'<new_str>(.*?)</new_str>', body, re.DOTALL)
+                        if old_match:
+                            op["old_str"] = self._strip_tag_layout(old_match.group(1))
+                        if new_match:
+                            op["new_str"] = self._strip_tag_layout(new_match.group(1))
+                    operations.append(op)
+        
+        parsed = []
+        for index, op in enumerate(operations):
+            operation = op.get("operation")
+            if operation not in ("create", "edit", "delete"):
+                raise ValueError(f"Operation {index}: unknown operation '{operation}' (expected create, edit or delete)")
+            if not op.get("file_path"):
+                raise ValueError(f"Operation {index}: file_path is required")
+            if operation == "create" and op.get("file_contents") is None:
+                raise ValueError(f"Operation {index}: file_contents is required for create")
+            if operation == "edit" and (op.get("old_str") is None or op.get("new_str") is None):
+                raise ValueError(f"Operation {index}: old_str and new_str are required for edit")
+            parsed.append(op)
+        return parsed
+
+    @openapi_schema({
+        "type": "function",
+        "function": {
+            "name": "batch_file_operations",
+            "description": "Create, edit and delete several files in a single call. Operations are applied in order and each one reports its own result, so a failed operation does not stop the rest. Use this instead of many separate create_file/str_replace/delete_file calls, e.g. when scaffolding a project. All paths are relative to /workspace.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "operations": {
+                        "type": "array",
+                        "description": "File operations to apply in order",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "operation": {
+                                    "type": "string",
+                                    "enum": ["create", "edit", "delete"],
+                                    "description": "create a new file, edit (replace a unique string in) an existing file, or delete a file"
+                                },
+                                "file_path": {
+                                    "type": "string",
+                                    "description": "Path to the file, relative to /workspace (e.g., 'src/main.py')"
+                                },
+                                "file_contents": {
+                                    "type": "string",
+                                    "description": "Contents of the new file (create only)"
+                                },
+                                "permissions": {
+                                    "type": "string",
+                                    "description": "File permissions in octal format (create only, default '644')"
+                                },
+                                "old_str": {
+                                    "type": "string",
+                                    "description": "Text to be replaced, must appear exactly once (edit only)"
+                                },
+                                "new_str": {
+                                    "type": "string",
+                                    "description": "Replacement text (edit only)"
+                                }
+                            },
+                            "required": ["operation", "file_path"]
+                        }
+                    }
+                },
+                "required": ["operations"]
+            }
+        }
+    })
+    @xml_schema(
+        tag_name="batch-file-operations",
+        mappings=[
+            {"param_name": "operations", "node_type": "content", "path": "."}
+        ],
+        example='''
+        <batch-file-operations>
+            <create file_path="src/index.html">
+            <!DOCTYPE html>
+            <html><body><script src="app.js"></script></body></html>
+            </create>
+            <create file_path="src/app.js">
+            console.log("hello");
+            </create>
+            <edit file_path="README.md">
+                <old_str>## Usage</old_str>
+                <new_str>## Usage
+                Open src/index.html in a browser.</new_str>
+            </edit>
+            <delete file_path="src/old.js"></delete>
+        </batch-file-operations>
+        '''
+    )
+    async def batch_file_operations(self, operations: Union[str, List[Dict[str, Any]]]) -> ToolResult:
+        try:
+            # Ensure sandbox is initialized
+            await self._ensure_sandbox()
+            
+            try:
+                parsed_operations = self._parse_batch_operations(operations)
+            except (ValueError, json.JSONDecodeError) as e:
+                return self.fail_response(f"Invalid batch operations: {str(e)}")
+            if not parsed_operations:
+                return self.fail_response("No file operations found. Use <create>, <edit> and <delete> tags inside <batch-file-operations>.")
+            if len(parsed_operations) > MAX_BATCH_OPERATIONS:
+                return self.fail_response(f"Too many operations ({len(parsed_operations)}). A batch can contain at most {MAX_BATCH_OPERATIONS}.")
+            
+            # Pack the manifest and the contents of all new files into one tar archive
+            manifest = []
+            archive_buffer = io.BytesIO()
+            with tarfile.open(fileobj=archive_buffer, mode="w") as archive:
+                for index, op in enumerate(parsed_operations):
+                    file_path = self.clean_path(op["file_path"])
+                    entry = {"type": op["operation"], "path": f"{self.workspace_path}/{file_path}"}
+                    if op["operation"] == "create":
+                        data = op["file_contents"].encode()
+                        member = tarfile.TarInfo(name=f"files/{index}")
+                        member.size = len(data)
+                        archive.addfile(member, io.BytesIO(data))
+                        entry["member"] = member.name
+                        entry["permissions"] = op.get("permissions") or "644"
+                    elif op["operation"] == "edit":
+                        entry["old_str"] = op["old_str"].expandtabs()
+                        entry["new_str"] = op["new_str"].expandtabs()
+                        entry["snippet_lines"] = self.SNIPPET_LINES
+                    manifest.append(entry)
+                
+                manifest_data = json.dumps(manifest).encode()
+                manifest_member = tarfile.TarInfo(name="manifest.json")
+                manifest_member.size = len(manifest_data)
+                archive.addfile(manifest_member, io.BytesIO(manifest_data))
+            
+            archive_path = f"/tmp/batch_file_ops_{uuid.uuid4().hex}.tar"
+            results = None
+            try:
+                self.sandbox.fs.upload_file(archive_path, archive_buffer.getvalue())
+                results = self._run_file_ops(f"@{archive_path}", timeout=120)
+            finally:
+                # The script removes the archive itself, unless it didn't get to run
+                if results is None:
+                    try:
+                        self.sandbox.fs.delete_file(archive_path)
+                    except Exception:
+                        pass
+            if results is None:
+                return self.fail_response("Error applying batch file operations in the sandbox")
+            
+            status_messages = {
+                "exists": "File already exists. Use an edit operation to modify existing files.",
+                "missing": "File does not exist",
+                "not_found": "String not found in file",
+            }
+            operation_results = []
+            for op, result in zip(parsed_operations, results):
+                status = result.get("status")
+                if status == "ok":
+                    message = {"create": "Created", "edit": "Replacement successful", "delete": "Deleted"}[op["operation"]]
+                elif status == "multiple":
+                    message = f"Multiple occurrences found in lines {result.get('lines', [])}. Please ensure string is unique"
+                else:
+                    message = status_messages.get(status, result.get("message", "Unknown error"))
+                operation_results.append({
+                    "operation": op["operation"],
+                    "file_path": self.clean_path(op["file_path"]),
+                    "success": status == "ok",
+                    "message": message
+                })
+            
+            failed = sum(1 for r in operation_results if not r["success"])
+            summary = {
+                "succeeded": len(operation_results) - failed,
+                "failed": failed,
+                "results": operation_results
+            }
+            if failed:
+                return self.fail_response(json.dumps(summary, indent=2))
+            return self.success_response(summary)
+        except Exception as e:
+            return self.fail_response(f"Error applying batch file operations: {str(e)}")
+
     # @openapi_schema({
     #     "type": "function",
     #     "function": {
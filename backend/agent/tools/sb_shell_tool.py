@@ -1,18 +1,144 @@
 from typing import Optional, Dict, Any
-import time
+import asyncio
+import re
 from uuid import uuid4
-from agentpress.tool import ToolResult, openapi_schema, xml_schema
+from agentpress.tool import ToolResult, ToolAccess, openapi_schema, xml_schema
 from sandbox.tool_base import SandboxToolsBase
 from agentpress.thread_manager import ThreadManager
+from utils.logger import logger
+
+# Prefixes the exit code line in the output of a fused blocking command
+EXIT_CODE_MARKER = "__TMUX_EXIT_CODE__:"
+# Prefixes the log size line when reading a session's output log
+OUTPUT_SIZE_MARKER = "__TMUX_LOG_SIZE__:"
+
+# Every tmux session pipes its output to a log here, so output can be read
+# incrementally by byte offset and isn't limited to what fits in the pane
+SESSION_LOG_DIR = "/tmp/tmux_logs"
+# Only the last MAX_OUTPUT_BYTES of new output are returned per read
+MAX_OUTPUT_BYTES = 20000
+
+# Live output streaming to the run's SSE channel
+STREAM_POLL_INTERVAL = 1.0
+STREAM_MAX_DURATION = 30 * 60
+
+# Terminal control sequences and carriage returns captured by pipe-pane
+ANSI_ESCAPE_PATTERN = re.compile(r'\x1b\[[0-?]*[ -/]*[@-~]|\x1b\][^\x07\x1b]*(?:\x07|\x1b\\)|\x1b[()][0-9A-Za-z]|\x1b[=>]|\r')
 
 class SandboxShellTool(SandboxToolsBase):
     """Tool for executing tasks in a Daytona sandbox with browser-use capabilities. 
     Uses sessions for maintaining state between commands and provides comprehensive process management."""
 
-    def __init__(self, project_id: str, thread_manager: ThreadManager):
-        super().__init__(project_id, thread_manager)
+    def __init__(self, project_id: str, thread_manager: ThreadManager, agent_run_id: Optional[str] = None):
+        super().__init__(project_id, thread_manager, agent_run_id)
         self._sessions: Dict[str, str] = {}  # Maps session names to session IDs
         self.workspace_path = "/workspace"  # Ensure we're always operating in /workspace
+        self._output_offsets: Dict[str, int] = {}  # Maps tmux session names to the log offset read so far
+        self._stream_tasks: Dict[str, asyncio.Task] = {}  # Maps tmux session names to live output streams
+
+    def get_tool_access(self, method_name: str, arguments: Dict[str, Any]) -> ToolAccess:
+        """Commands can touch any file, so they run in order with file operations.
+        
+        Reading or terminating a session only waits for earlier calls on that session.
+        """
+        session_name = arguments.get("session_name")
+        session = f"shell:{session_name}" if session_name else "shell"
+        if method_name == "execute_command":
+            return ToolAccess.of(writes=["fs", session])
+        if method_name == "list_commands":
+            return ToolAccess.of(reads=["shell"])
+        # Reading output advances the session's read offset
+        return ToolAccess.of(writes=[session])
+
+    def _session_log(self, session_name: str) -> str:
+        """Return the path of the output log for a tmux session."""
+        return f"{SESSION_LOG_DIR}/{session_name}.log"
+
+    def _ensure_tmux_session_command(self, session_name: str) -> str:
+        """Shell snippet that reuses a tmux session or creates it with its output piped to a log."""
+        log_file = self._session_log(session_name)
+        return (
+            f"tmux has-session -t {session_name} 2>/dev/null || {{ "
+            f"tmux new-session -d -s {session_name} && mkdir -p {SESSION_LOG_DIR} && : > {log_file} && "
+            f"tmux pipe-pane -t {session_name} -o 'cat >> {log_file}'; }}"
+        )
+
+    async def _read_session_output(self, session_name: str, from_start: bool = False, offset_key: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Read the output a tmux session produced since the last read.
+        
+        Args:
+            session_name: Name of the tmux session
+            from_start: Read the log from the beginning instead of the last offset
+            offset_key: Key the read offset is tracked under (defaults to the session name)
+        
+        Returns:
+            Dict with the new output, whether it was truncated to MAX_OUTPUT_BYTES
+            and whether the session is still running, or None if the session has no log.
+        """
+        log_file = self._session_log(session_name)
+        offset_key = offset_key or session_name
+        offset = 0 if from_start else self._output_offsets.get(offset_key, 0)
+        # A log smaller than our offset belongs to a recreated session, so read it from the start
+        result = await self._execute_raw_command(
+            f"tmux has-session -t {session_name} 2>/dev/null && state=running || state=ended; "
+            f"size=$(stat -c %s {log_file} 2>/dev/null || echo -1); off={offset}; "
+            f'[ "$size" -lt "$off" ] && off=0; '
+            f'echo "{OUTPUT_SIZE_MARKER}$state:$size:$off"; '
+            f'[ "$size" -gt "$off" ] && tail -c +$((off + 1)) {log_file} | head -c $((size - off)) | tail -c {MAX_OUTPUT_BYTES}'
+        )
+        _, _, marked_output = result.get("output", "").partition(OUTPUT_SIZE_MARKER)
+        header, _, output = marked_output.partition("\n")
+        try:
+            state, size, start = header.strip().split(":")
+            size, start = int(size), int(start)
+        except ValueError:
+            return None
+        if size < 0:
+            return None
+        
+        self._output_offsets[offset_key] = size
+        return {
+            "output": ANSI_ESCAPE_PATTERN.sub("", output),
+            "truncated": size - start > MAX_OUTPUT_BYTES,
+            "running": state == "running"
+        }
+
+    def _forget_session(self, session_name: str):
+        """Drop the read offset and any live output stream for a tmux session."""
+        self._output_offsets.pop(session_name, None)
+        stream_task = self._stream_tasks.pop(session_name, None)
+        if stream_task and stream_task is not asyncio.current_task():
+            stream_task.cancel()
+
+    async def _stream_session_output(self, session_name: str):
+        """Publish new output of a tmux session to the run's response channel as status events."""
+        # Streaming keeps its own offset so it doesn't consume output the agent hasn't checked
+        stream_key = f"{session_name}:stream"
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + STREAM_MAX_DURATION
+        try:
+            while loop.time() < deadline:
+                read = await self._read_session_output(session_name, offset_key=stream_key)
+                if read is None:
+                    break
+                if read["output"]:
+                    await self.publish_status_event({
+                        "status_type": "command_output",
+                        "session_name": session_name,
+                        "output": read["output"],
+                        "truncated": read["truncated"]
+                    })
+                if not read["running"]:
+                    break
+                await asyncio.sleep(STREAM_POLL_INTERVAL)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.warning(f"Stopped streaming output of tmux session {session_name}: {str(e)}")
+        finally:
+            self._output_offsets.pop(stream_key, None)
+            if self._stream_tasks.get(session_name) is asyncio.current_task():
+                del self._stream_tasks[session_name]
 
     async def _ensure_session(self, session_name: str = "default") -> str:
         """Ensure a session exists and return its ID."""
@@ -65,6 +191,11 @@ class SandboxShellTool(SandboxToolsBase):
                         "type": "integer",
                         "description": "Optional timeout in seconds for blocking commands. Defaults to 60. Ignored for non-blocking commands.",
                         "default": 60
+                    },
+                    "stream_output": {
+                        "type": "boolean",
+                        "description": "Whether to stream the output of a non-blocking command live to the user while it runs. Useful for builds and installs the user wants to watch. Defaults to false.",
+                        "default": False
                     }
                 },
                 "required": ["command"]
@@ -78,7 +209,8 @@ class SandboxShellTool(SandboxToolsBase):
             {"param_name": "folder", "node_type": "attribute", "path": ".", "required": False},
             {"param_name": "session_name", "node_type": "attribute", "path": ".", "required": False},
             {"param_name": "blocking", "node_type": "attribute", "path": ".", "required": False},
-            {"param_name": "timeout", "node_type": "attribute", "path": ".", "required": False}
+            {"param_name": "timeout", "node_type": "attribute", "path": ".", "required": False},
+            {"param_name": "stream_output", "node_type": "attribute", "path": ".", "required": False}
         ],
         example='''
         <!-- NON-BLOCKING COMMANDS (Default) -->
@@ -92,13 +224,18 @@ class SandboxShellTool(SandboxToolsBase):
         npm run build
         </execute-command>
 
+        <!-- Example 3: Stream a long build's output live to the user -->
+        <execute-command session_name="docker_build" stream_output="true">
+        docker build -t app .
+        </execute-command>
+
         <!-- BLOCKING COMMANDS (Wait for completion) -->
-        <!-- Example 3: Install dependencies and wait for completion -->
+        <!-- Example 4: Install dependencies and wait for completion -->
         <execute-command blocking="true" timeout="300">
         npm install
         </execute-command>
 
-        <!-- Example 4: Complex Command with Environment Variables -->
+        <!-- Example 5: Complex Command with Environment Variables -->
         <execute-command blocking="true">
         export NODE_ENV=production && npm run build
         </execute-command>
@@ -110,7 +247,8 @@ class SandboxShellTool(SandboxToolsBase):
         folder: Optional[str] = None,
         session_name: Optional[str] = None,
         blocking: bool = False,
-        timeout: int = 60
+        timeout: int = 60,
+        stream_output: bool = False
     ) -> ToolResult:
         try:
             # Ensure sandbox is initialized
@@ -126,76 +264,111 @@ class SandboxShellTool(SandboxToolsBase):
             if not session_name:
                 session_name = f"session_{str(uuid4())[:8]}"
             
-            # Check if tmux session already exists
-            check_session = await self._execute_raw_command(f"tmux has-session -t {session_name} 2>/dev/null || echo 'not_exists'")
-            session_exists = "not_exists" not in check_session.get("output", "")
-            
-            if not session_exists:
-                # Create a new tmux session
-                await self._execute_raw_command(f"tmux new-session -d -s {session_name}")
-                
             # Ensure we're in the correct directory and send command to tmux
             full_command = f"cd {cwd} && {command}"
+            if blocking:
+                # Have the command report its own completion: its exit code goes to a
+                # sentinel file and a tmux wait-for channel is signalled when it finishes
+                run_id = str(uuid4())[:8]
+                exit_file = f"/tmp/tmux_exit_{session_name}_{run_id}"
+                channel = f"done_{session_name}_{run_id}"
+                # ($ is escaped so the exit status is expanded inside tmux, not when sending keys)
+                full_command = f"{full_command}; echo \\$? > {exit_file}; tmux wait-for -S {channel}"
             wrapped_command = full_command.replace('"', '\\"')  # Escape double quotes
             
-            # Send command to tmux session
-            await self._execute_raw_command(f'tmux send-keys -t {session_name} "{wrapped_command}" Enter')
+            # Create-or-reuse the tmux session and send the command in a single sandbox call
+            log_file = self._session_log(session_name)
+            compound_command = (
+                f"{self._ensure_tmux_session_command(session_name)}; "
+                f"start=$(stat -c %s {log_file} 2>/dev/null || echo 0); "
+                f'tmux send-keys -t {session_name} "{wrapped_command}" Enter'
+            )
             
             if blocking:
-                # For blocking execution, wait and capture output
-                start_time = time.time()
-                while (time.time() - start_time) < timeout:
-                    # Wait a bit before checking
-                    time.sleep(2)
-                    
-                    # Check if session still exists (command might have exited)
-                    check_result = await self._execute_raw_command(f"tmux has-session -t {session_name} 2>/dev/null || echo 'ended'")
-                    if "ended" in check_result.get("output", ""):
-                        break
-                        
-                    # Get current output and check for common completion indicators
-                    output_result = await self._execute_raw_command(f"tmux capture-pane -t {session_name} -p")
-                    current_output = output_result.get("output", "")
-                    
-                    # Check for prompt indicators that suggest command completion
-                    last_lines = current_output.split('\n')[-3:]
-                    completion_indicators = ['$', '#', '>', 'Done', 'Completed', 'Finished', '✓']
-                    if any(indicator in line for indicator in completion_indicators for line in last_lines):
-                        break
+                timeout = int(timeout)
+                # Single long-poll in the same call: returns as soon as the channel is
+                # signalled (tmux remembers a signal sent before anyone waits) or the
+                # timeout expires, then reports the exit code and the command's output
+                # from the session log, and kills the session if the command finished
+                result = await self._execute_raw_command(
+                    f"{compound_command}; "
+                    f"timeout {timeout} sh -c 'test -f {exit_file} || tmux wait-for {channel}'; "
+                    f"code=$(cat {exit_file} 2>/dev/null); rm -f {exit_file}; "
+                    # Give pipe-pane a moment to flush the last output to the log
+                    f'[ -n "$code" ] && sleep 0.2; '
+                    f"size=$(stat -c %s {log_file} 2>/dev/null || echo 0); "
+                    f'echo "{EXIT_CODE_MARKER}$code:$start:$size"; '
+                    f"tail -c +$((start + 1)) {log_file} | head -c $((size - start)) | tail -c {MAX_OUTPUT_BYTES}; "
+                    f'[ -n "$code" ] && {{ tmux kill-session -t {session_name}; rm -f {log_file}; }}',
+                    timeout=timeout + 10
+                )
+                _, _, marked_output = result.get("output", "").partition(EXIT_CODE_MARKER)
+                header, _, final_output = marked_output.partition("\n")
+                exit_code_output, _, sizes = header.strip().partition(":")
+                exit_code = int(exit_code_output) if exit_code_output.lstrip('-').isdigit() else None
+                start, _, size = sizes.partition(":")
+                start = int(start) if start.isdigit() else 0
+                size = int(size) if size.isdigit() else 0
+                final_output = ANSI_ESCAPE_PATTERN.sub("", final_output)
                 
-                # Capture final output
-                output_result = await self._execute_raw_command(f"tmux capture-pane -t {session_name} -p")
-                final_output = output_result.get("output", "")
-                
-                # Kill the session after capture
-                await self._execute_raw_command(f"tmux kill-session -t {session_name}")
+                if exit_code is None:
+                    # Still running - leave the session alive so the agent can keep checking it
+                    self._output_offsets[session_name] = size
+                    return self.success_response({
+                        "output": final_output,
+                        "truncated": size - start > MAX_OUTPUT_BYTES,
+                        "session_name": session_name,
+                        "cwd": cwd,
+                        "message": f"Command did not finish within {timeout} seconds and is still running in tmux session '{session_name}'. Use check_command_output to view new output.",
+                        "completed": False
+                    })
                 
+                self._forget_session(session_name)
                 return self.success_response({
                     "output": final_output,
+                    "truncated": size - start > MAX_OUTPUT_BYTES,
                     "session_name": session_name,
                     "cwd": cwd,
+                    "exit_code": exit_code,
                     "completed": True
                 })
             else:
                 # For non-blocking, just return immediately
+                await self._execute_raw_command(compound_command)
+                
+                streaming = False
+                if stream_output and str(stream_output).lower() != "false":
+                    if self.agent_run_id:
+                        if session_name not in self._stream_tasks:
+                            self._stream_tasks[session_name] = asyncio.create_task(self._stream_session_output(session_name))
+                        streaming = True
+                    else:
+                        logger.warning(f"Cannot stream output of tmux session {session_name} without an agent run")
+                
                 return self.success_response({
                     "session_name": session_name,
                     "cwd": cwd,
-                    "message": f"Command sent to tmux session '{session_name}'. Use check_command_output to view results.",
+                    "message": f"Command sent to tmux session '{session_name}'." + (" Its output is streamed live to the user." if streaming else "") + " Use check_command_output to view results.",
+                    "streaming": streaming,
                     "completed": False
                 })
                 
         except Exception as e:
             # Attempt to clean up session in case of error
             if session_name:
+                self._forget_session(session_name)
                 try:
                     await self._execute_raw_command(f"tmux kill-session -t {session_name}")
                 except:
                     pass
             return self.fail_response(f"Error executing command: {str(e)}")
 
-    async def _execute_raw_command(self, command: str) -> Dict[str, Any]:
-        """Execute a raw command directly in the sandbox."""
+    async def _execute_raw_command(self, command: str, timeout: int = 30) -> Dict[str, Any]:
+        """Execute a raw command directly in the sandbox.
+        
+        The sandbox client is synchronous, so calls run in a worker thread to keep
+        long waits from stalling the event loop.
+        """
         # Ensure session exists for raw commands
         session_id = await self._ensure_session("raw_commands")
         
@@ -207,16 +380,22 @@ class SandboxShellTool(SandboxToolsBase):
             cwd=self.workspace_path
         )
         
-        response = self.sandbox.process.execute_session_command(
+        response = await asyncio.to_thread(
+            self.sandbox.process.execute_session_command,
             session_id=session_id,
             req=req,
-            timeout=30  # Short timeout for utility commands
+            timeout=timeout  # Short timeout for utility commands by default
         )
         
-        logs = self.sandbox.process.get_session_command_logs(
-            session_id=session_id,
-            command_id=response.cmd_id
-        )
+        # Synchronous session commands return their output directly; only fetch
+        # the logs separately when the response doesn't carry them
+        logs = getattr(response, "output", None)
+        if logs is None:
+            logs = await asyncio.to_thread(
+                self.sandbox.process.get_session_command_logs,
+                session_id=session_id,
+                command_id=response.cmd_id
+            )
         
         return {
             "output": logs,
@@ -227,7 +406,7 @@ class SandboxShellTool(SandboxToolsBase):
         "type": "function",
         "function": {
             "name": "check_command_output",
-            "description": "Check the output of a previously executed command in a tmux session. Use this to monitor the progress or results of non-blocking commands.",
+            "description": "Check the output of a previously executed command in a tmux session. Use this to monitor the progress or results of non-blocking commands. Only output produced since the last check is returned (up to the last 20000 bytes).",
             "parameters": {
                 "type": "object",
                 "properties": {
@@ -239,6 +418,11 @@ class SandboxShellTool(SandboxToolsBase):
                         "type": "boolean",
                         "description": "Whether to terminate the tmux session after checking. Set to true when you're done with the command.",
                         "default": False
+                    },
+                    "full_output": {
+                        "type": "boolean",
+                        "description": "Whether to return the session's output from the beginning instead of only what is new since the last check.",
+                        "default": False
                     }
                 },
                 "required": ["session_name"]
@@ -249,7 +433,8 @@ class SandboxShellTool(SandboxToolsBase):
         tag_name="check-command-output",
         mappings=[
             {"param_name": "session_name", "node_type": "attribute", "path": ".", "required": True},
-            {"param_name": "kill_session", "node_type": "attribute", "path": ".", "required": False}
+            {"param_name": "kill_session", "node_type": "attribute", "path": ".", "required": False},
+            {"param_name": "full_output", "node_type": "attribute", "path": ".", "required": False}
         ],
         example='''
         <!-- Example 1: Check output without killing session -->
@@ -257,35 +442,45 @@ class SandboxShellTool(SandboxToolsBase):
         
         <!-- Example 2: Check final output and kill session -->
         <check-command-output session_name="build_process" kill_session="true"/>
+        
+        <!-- Example 3: Re-read everything the session has printed so far -->
+        <check-command-output session_name="build_process" full_output="true"/>
         '''
     )
     async def check_command_output(
         self,
         session_name: str,
-        kill_session: bool = False
+        kill_session: bool = False,
+        full_output: bool = False
     ) -> ToolResult:
         try:
             # Ensure sandbox is initialized
             await self._ensure_sandbox()
             
-            # Check if session exists
-            check_result = await self._execute_raw_command(f"tmux has-session -t {session_name} 2>/dev/null || echo 'not_exists'")
-            if "not_exists" in check_result.get("output", ""):
-                return self.fail_response(f"Tmux session '{session_name}' does not exist.")
-            
-            # Get output from tmux pane
-            output_result = await self._execute_raw_command(f"tmux capture-pane -t {session_name} -p")
-            output = output_result.get("output", "")
+            # Read new output from the session log
+            read = await self._read_session_output(session_name, from_start=full_output and str(full_output).lower() != "false")
+            if read is None:
+                # Session wasn't started by this tool, so it has no log; fall back to the pane
+                check_result = await self._execute_raw_command(f"tmux has-session -t {session_name} 2>/dev/null || echo 'not_exists'")
+                if "not_exists" in check_result.get("output", ""):
+                    return self.fail_response(f"Tmux session '{session_name}' does not exist.")
+                
+                output_result = await self._execute_raw_command(f"tmux capture-pane -t {session_name} -p")
+                read = {"output": output_result.get("output", ""), "truncated": False, "running": True}
             
             # Kill session if requested
             if kill_session:
-                await self._execute_raw_command(f"tmux kill-session -t {session_name}")
+                await self._execute_raw_command(f"tmux kill-session -t {session_name} 2>/dev/null; rm -f {self._session_log(session_name)}")
+                self._forget_session(session_name)
                 termination_status = "Session terminated."
-            else:
+            elif read["running"]:
                 termination_status = "Session still running."
+            else:
+                termination_status = "Session has ended."
             
             return self.success_response({
-                "output": output,
+                "output": read["output"],
+                "truncated": read["truncated"],
                 "session_name": session_name,
                 "status": termination_status
             })
@@ -334,7 +529,8 @@ class SandboxShellTool(SandboxToolsBase):
                 return self.fail_response(f"Tmux session '{session_name}' does not exist.")
             
             # Kill the session
-            await self._execute_raw_command(f"tmux kill-session -t {session_name}")
+            await self._execute_raw_command(f"tmux kill-session -t {session_name}; rm -f {self._session_log(session_name)}")
+            self._forget_session(session_name)
             
             return self.success_response({
                 "message": f"Tmux session '{session_name}' terminated successfully."
@@ -394,14 +590,22 @@ class SandboxShellTool(SandboxToolsBase):
         except Exception as e:
             return self.fail_response(f"Error listing commands: {str(e)}")
 
+    async def close(self):
+        """Stop streaming command output when the agent run ends; the tmux sessions keep running."""
+        for session_name in list(self._stream_tasks.keys()):
+            self._forget_session(session_name)
+
     async def cleanup(self):
         """Clean up all sessions."""
         for session_name in list(self._sessions.keys()):
             await self._cleanup_session(session_name)
         
+        for session_name in list(self._stream_tasks.keys()):
+            self._forget_session(session_name)
+        
         # Also clean up any tmux sessions
         try:
             await self._ensure_sandbox()
-            await self._execute_raw_command("tmux kill-server 2>/dev/null || true")
+            await self._execute_raw_command(f"tmux kill-server 2>/dev/null || true; rm -rf {SESSION_LOG_DIR}")
         except:
             pass
\ No newline at end of file
@@ -1,12 +1,16 @@
 import os
 import base64
 import mimetypes
-from typing import Optional
+import shlex
+from typing import Optional, Dict, Any
 
-from agentpress.tool import ToolResult, openapi_schema, xml_schema
+from agentpress.tool import ToolResult, ToolAccess, openapi_schema, xml_schema
 from sandbox.tool_base import SandboxToolsBase
 from agentpress.thread_manager import ThreadManager
+from services import redis
+from utils.logger import logger
 import json
+from uuid import uuid4
 
 # Add common image MIME types if mimetypes module is limited
 mimetypes.add_type("image/webp", ".webp")
@@ -18,6 +22,52 @@ mimetypes.add_type("image/gif", ".gif")
 # Maximum file size in bytes (e.g., 5MB)
 MAX_IMAGE_SIZE = 10 * 1024 * 1024
 
+# Largest image the vision models use at full detail; anything bigger is
+# downscaled by the provider anyway, so we resize before sending it.
+MAX_IMAGE_DIMENSION = 1568
+MAX_IMAGE_PIXELS = 1_150_000
+JPEG_QUALITY = 85
+
+# Processed images are cached in Redis by content hash and referenced from the
+# image_context message instead of being stored inline in the messages table.
+IMAGE_CACHE_PREFIX = "image_cache:v1:"
+IMAGE_CACHE_TTL = redis.REDIS_KEY_TTL
+
+# Runs inside the sandbox (which ships Pillow): downscales the image to the
+# model's effective resolution and recompresses it. Prints a JSON summary.
+SANDBOX_IMAGE_PREPROCESS_SCRIPT = """
+import io, json, sys
+from PIL import Image
+
+src, dst, max_dim, max_pixels, quality = sys.argv[1], sys.argv[2], int(sys.argv[3]), int(sys.argv[4]), int(sys.argv[5])
+with open(src, "rb") as f:
+    original = f.read()
+img = Image.open(io.BytesIO(original))
+original_format = img.format
+img.seek(0)
+width, height = img.size
+scale = min(1.0, max_dim / max(width, height), (max_pixels / float(width * height)) ** 0.5)
+has_alpha = img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+img = img.convert("RGBA" if has_alpha else "RGB")
+if scale < 1.0:
+    img = img.resize((max(1, int(width * scale)), max(1, int(height * scale))), Image.LANCZOS)
+out = io.BytesIO()
+if has_alpha:
+    img.save(out, format="PNG", optimize=True)
+    mime_type = "image/png"
+else:
+    img.save(out, format="JPEG", quality=quality, optimize=True)
+    mime_type = "image/jpeg"
+data = out.getvalue()
+if scale >= 1.0 and len(original) <= len(data) and original_format in ("JPEG", "PNG", "WEBP"):
+    data = original
+    mime_type = "image/" + original_format.lower()
+with open(dst, "wb") as f:
+    f.write(data)
+print(json.dumps({"mime_type": mime_type, "width": img.size[0], "height": img.size[1],
+                  "original_width": width, "original_height": height, "size": len(data)}))
+"""
+
 class SandboxVisionTool(SandboxToolsBase):
     """Tool for allowing the agent to 'see' images within the sandbox."""
 
@@ -27,6 +77,57 @@ class SandboxVisionTool(SandboxToolsBase):
         # Make thread_manager accessible within the tool instance
         self.thread_manager = thread_manager
 
+    def get_tool_access(self, method_name: str, arguments: Dict[str, Any]) -> ToolAccess:
+        """Viewing an image only waits for earlier calls that write it."""
+        return ToolAccess.of(reads=[self.fs_resource(arguments.get("file_path", ""))])
+
+    def _hash_image(self, full_path: str) -> Optional[str]:
+        """Return the sha256 of a file in the sandbox, or None if it cannot be computed."""
+        try:
+            response = self.sandbox.process.exec(f"sha256sum {shlex.quote(full_path)}", timeout=30)
+            if response.exit_code != 0:
+                return None
+            digest = response.result.strip().split()[0]
+            return digest if len(digest) == 64 else None
+        except Exception as e:
+            logger.warning(f"Could not hash image {full_path}: {str(e)}")
+            return None
+
+    def _preprocess_image(self, full_path: str, name: str) -> Optional[dict]:
+        """Resize and recompress an image inside the sandbox and download the result.
+        
+        Returns:
+            Dict with mime_type, base64, width and height, or None if the image
+            could not be processed and should be sent unmodified.
+        """
+        output_path = f"/tmp/see_image_{name}"
+        try:
+            response = self.sandbox.process.exec(
+                f"python3 -c {shlex.quote(SANDBOX_IMAGE_PREPROCESS_SCRIPT)} {shlex.quote(full_path)} {output_path} "
+                f"{MAX_IMAGE_DIMENSION} {MAX_IMAGE_PIXELS} {JPEG_QUALITY}",
+                timeout=60
+            )
+            if response.exit_code != 0:
+                logger.warning(f"Image preprocessing failed for {full_path} (exit code {response.exit_code}): {response.result}")
+                return None
+            info = json.loads(response.result.strip().splitlines()[-1])
+            image_bytes = self.sandbox.fs.download_file(output_path)
+            logger.debug(f"Preprocessed {full_path}: {info['original_width']}x{info['original_height']} -> {info['width']}x{info['height']}, {info['size']} bytes")
+            return {
+                "mime_type": info["mime_type"],
+                "base64": base64.b64encode(image_bytes).decode('utf-8'),
+                "width": info["width"],
+                "height": info["height"]
+            }
+        except Exception as e:
+            logger.warning(f"Image preprocessing unavailable for {full_path}: {str(e)}")
+            return None
+        finally:
+            try:
+                self.sandbox.process.exec(f"rm -f {output_path}", timeout=10)
+            except Exception:
+                pass
+
     @openapi_schema({
         "type": "function",
         "function": {
@@ -55,7 +156,7 @@ class SandboxVisionTool(SandboxToolsBase):
         '''
     )
     async def see_image(self, file_path: str) -> ToolResult:
-        """Reads an image file, converts it to base64, and adds it as a temporary message."""
+        """Reads an image file, downscales and caches it, and adds a reference to it as a temporary message."""
         try:
             # Ensure sandbox is initialized
             await self._ensure_sandbox()
@@ -76,33 +177,68 @@ class SandboxVisionTool(SandboxToolsBase):
             if file_info.size > MAX_IMAGE_SIZE:
                 return self.fail_response(f"Image file '{cleaned_path}' is too large ({file_info.size / (1024*1024):.2f}MB). Maximum size is {MAX_IMAGE_SIZE / (1024*1024)}MB.")
 
-            # Read image file content
-            try:
-                image_bytes = self.sandbox.fs.download_file(full_path)
-            except Exception as e:
-                return self.fail_response(f"Could not read image file: {cleaned_path}")
-
-            # Convert to base64
-            base64_image = base64.b64encode(image_bytes).decode('utf-8')
-
-            # Determine MIME type
-            mime_type, _ = mimetypes.guess_type(full_path)
-            if not mime_type or not mime_type.startswith('image/'):
-                # Basic fallback based on extension if mimetypes fails
-                ext = os.path.splitext(cleaned_path)[1].lower()
-                if ext == '.jpg' or ext == '.jpeg': mime_type = 'image/jpeg'
-                elif ext == '.png': mime_type = 'image/png'
-                elif ext == '.gif': mime_type = 'image/gif'
-                elif ext == '.webp': mime_type = 'image/webp'
-                else:
-                    return self.fail_response(f"Unsupported or unknown image format for file: '{cleaned_path}'. Supported: JPG, PNG, GIF, WEBP.")
-
-            # Prepare the temporary message content
+            # Hash the file in place so a cached image needs no transfer at all
+            content_hash = self._hash_image(full_path)
+            cache_key = f"{IMAGE_CACHE_PREFIX}{content_hash}" if content_hash else None
+            image_data = None
+            cache_hit = False
+            if cache_key:
+                try:
+                    cached = await redis.get(cache_key)
+                    if cached:
+                        image_data = json.loads(cached)
+                        cache_hit = True
+                        logger.debug(f"Image cache hit for '{cleaned_path}' ({cache_key})")
+                except Exception as e:
+                    logger.warning(f"Could not read image cache for '{cleaned_path}': {str(e)}")
+
+            if image_data is None:
+                image_data = self._preprocess_image(full_path, content_hash or uuid4().hex)
+
+            if image_data is None:
+                # Pillow unavailable or the image could not be decoded; send it as-is
+                try:
+                    image_bytes = self.sandbox.fs.download_file(full_path)
+                except Exception as e:
+                    return self.fail_response(f"Could not read image file: {cleaned_path}")
+
+                # Determine MIME type
+                mime_type, _ = mimetypes.guess_type(full_path)
+                if not mime_type or not mime_type.startswith('image/'):
+                    # Basic fallback based on extension if mimetypes fails
+                    ext = os.path.splitext(cleaned_path)[1].lower()
+                    if ext == '.jpg' or ext == '.jpeg': mime_type = 'image/jpeg'
+                    elif ext == '.png': mime_type = 'image/png'
+                    elif ext == '.gif': mime_type = 'image/gif'
+                    elif ext == '.webp': mime_type = 'image/webp'
+                    else:
+                        return self.fail_response(f"Unsupported or unknown image format for file: '{cleaned_path}'. Supported: JPG, PNG, GIF, WEBP.")
+
+                image_data = {
+                    "mime_type": mime_type,
+                    "base64": base64.b64encode(image_bytes).decode('utf-8')
+                }
+
+            # Prepare the temporary message content. The image itself lives in
+            # the cache and is resolved by reference when the next turn is built.
             image_context_data = {
-                "mime_type": mime_type,
-                "base64": base64_image,
-                "file_path": cleaned_path # Include path for context
+                "mime_type": image_data["mime_type"],
+                "file_path": cleaned_path, # Include path for context
+                "width": image_data.get("width"),
+                "height": image_data.get("height")
             }
+            stored = False
+            if cache_key:
+                try:
+                    # On a hit only the TTL is refreshed; the key may have expired since the read
+                    if not (cache_hit and await redis.expire(cache_key, IMAGE_CACHE_TTL)):
+                        await redis.set(cache_key, json.dumps(image_data), ex=IMAGE_CACHE_TTL)
+                    image_context_data["image_ref"] = cache_key
+                    stored = True
+                except Exception as e:
+                    logger.warning(f"Could not cache image '{cleaned_path}': {str(e)}")
+            if not stored:
+                image_context_data["base64"] = image_data["base64"]
 
             # Add the temporary message using the thread_manager callback
             # Use a distinct type like 'image_context'
@@ -117,4 +253,21 @@ class SandboxVisionTool(SandboxToolsBase):
             return self.success_response(f"Successfully loaded the image '{cleaned_path}'.")
 
         except Exception as e:
-            return self.fail_response(f"An unexpected error occurred while trying to see the image: {str(e)}") 
\ No newline at end of file
+            return self.fail_response(f"An unexpected error occurred while trying to see the image: {str(e)}")
+
+
+async def load_image_context(image_context: dict) -> Optional[dict]:
+    """Resolve an image_context message into its mime type and base64 data.
+    
+    Handles both cached references and older messages that store the image inline.
+    """
+    if image_context.get("image_ref"):
+        cached = await redis.get(image_context["image_ref"])
+        if not cached:
+            logger.warning(f"Cached image {image_context['image_ref']} for '{image_context.get('file_path')}' has expired")
+            return None
+        image_data = json.loads(cached)
+        return {"mime_type": image_data["mime_type"], "base64": image_data["base64"]}
+    if image_context.get("base64") and image_context.get("mime_type"):
+        return {"mime_type": image_context["mime_type"], "base64": image_context["base64"]}
+    return None
@@ -1,10 +1,12 @@
-from tavily import AsyncTavilyClient
 import httpx
 from dotenv import load_dotenv
-from agentpress.tool import Tool, ToolResult, openapi_schema, xml_schema
+from agentpress.tool import Tool, ToolResult, ToolAccess, openapi_schema, xml_schema
 from utils.config import config
 from sandbox.tool_base import SandboxToolsBase
 from agentpress.thread_manager import ThreadManager
+from services import http_client, cache
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+import hashlib
 import json
 import os
 import datetime
@@ -13,6 +15,38 @@ import logging
 
 # TODO: add subpages, etc... in filters as sometimes its necessary 
 
+TAVILY_SEARCH_URL = "https://api.tavily.com/search"
+
+# Multi-URL scrapes fan out to Firecrawl with bounded concurrency; each
+# scraped site additionally gets its own, lower limit
+MAX_CONCURRENT_SCRAPES = 5
+MAX_CONCURRENT_SCRAPES_PER_SITE = 2
+
+# Search and scrape results are cached across runs (see services/cache)
+WEB_SEARCH_CACHE_NAMESPACE = "web_search"
+WEB_SEARCH_CACHE_TTL = 6 * 3600
+WEB_SEARCH_CACHE_MAX_BYTES = 64 * 1024 * 1024
+SCRAPE_CACHE_NAMESPACE = "scrape_webpage"
+SCRAPE_CACHE_TTL = 24 * 3600
+SCRAPE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a search query for cache lookups (case and whitespace insensitive)."""
+    return " ".join(query.lower().split())
+
+
+def normalize_url(url: str) -> str:
+    """Normalize a URL for cache lookups.
+    
+    Lowercases scheme and host, drops the fragment, a trailing slash and utm_*
+    tracking parameters, and sorts the remaining query parameters.
+    """
+    parsed = urlparse(url)
+    params = sorted((k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True) if not k.lower().startswith("utm_"))
+    path = parsed.path.rstrip("/") or "/"
+    return urlunparse((parsed.scheme.lower(), parsed.netloc.lower(), path, parsed.params, urlencode(params), ""))
+
 class SandboxWebSearchTool(SandboxToolsBase):
     """Tool for performing web searches using Tavily API and web scraping using Firecrawl."""
 
@@ -30,8 +64,27 @@ class SandboxWebSearchTool(SandboxToolsBase):
         if not self.firecrawl_api_key:
             raise ValueError("FIRECRAWL_API_KEY not found in configuration")
 
-        # Tavily asynchronous search client
-        self.tavily_client = AsyncTavilyClient(api_key=self.tavily_api_key)
+    def get_tool_access(self, method_name: str, arguments: dict) -> ToolAccess:
+        """Searches touch nothing in the sandbox; scrapes only write to the scrape directory."""
+        if method_name == "scrape_webpage":
+            return ToolAccess.of(writes=["fs:scrape"])
+        return ToolAccess()
+
+    async def _tavily_search(self, **params) -> dict:
+        """Run a Tavily search over the shared, pooled HTTP client.
+
+        Not wrapped in host_limit: all runs of the process share one API host,
+        and Tavily's own rate limit responses are the backpressure.
+        """
+        client = http_client.get_client()
+        response = await client.post(
+            TAVILY_SEARCH_URL,
+            json=params,
+            headers={"Authorization": f"Bearer {self.tavily_api_key}"},
+            timeout=60
+        )
+        response.raise_for_status()
+        return response.json()
 
     @openapi_schema({
         "type": "function",
@@ -87,7 +140,8 @@ class SandboxWebSearchTool(SandboxToolsBase):
             query="latest AI research on transformer models" 
             num_results="20">
         </web-search>
-        '''
+        ''',
+        speculative=True
     )
     async def web_search(
         self, 
@@ -115,15 +169,27 @@ class SandboxWebSearchTool(SandboxToolsBase):
             else:
                 num_results = 20
 
-            # Execute the search with Tavily
-            logging.info(f"Executing web search for query: '{query}' with {num_results} results")
-            search_response = await self.tavily_client.search(
-                query=query,
-                max_results=num_results,
-                include_images=True,
-                include_answer="advanced",
-                search_depth="advanced",
-            )
+            # Serve repeated searches from the shared cache
+            cache_key = cache.make_key(normalize_query(query), num_results)
+            cached = await cache.get(WEB_SEARCH_CACHE_NAMESPACE, cache_key)
+            if cached:
+                logging.info(f"Web search cache hit for query: '{query}'")
+                search_response = cached["value"]
+            else:
+                # Execute the search with Tavily
+                logging.info(f"Executing web search for query: '{query}' with {num_results} results")
+                search_response = await self._tavily_search(
+                    query=query,
+                    max_results=num_results,
+                    include_images=True,
+                    include_answer="advanced",
+                    search_depth="advanced",
+                )
+                await cache.put(WEB_SEARCH_CACHE_NAMESPACE, cache_key, search_response, ttl=WEB_SEARCH_CACHE_TTL, max_bytes=WEB_SEARCH_CACHE_MAX_BYTES)
+            
+            search_response["cache_hit"] = cached is not None
+            if cached:
+                search_response["cached_at"] = datetime.datetime.fromtimestamp(cached["cached_at"], datetime.timezone.utc).isoformat()
             
             # Return the complete Tavily response 
             # This includes the query, answer, results, images and more
@@ -247,26 +313,33 @@ class SandboxWebSearchTool(SandboxToolsBase):
             
             logging.info(f"Processing {len(url_list)} URLs: {url_list}")
             
-            # Process each URL and collect results
-            results = []
-            for url in url_list:
+            # Add protocol if missing
+            for i, url in enumerate(url_list):
+                if not (url.startswith('http://') or url.startswith('https://')):
+                    url_list[i] = 'https://' + url
+                    logging.info(f"Added https:// protocol to URL: {url_list[i]}")
+            
+            # Create the output folder once rather than per URL
+            scrape_dir = f"{self.workspace_path}/scrape"
+            await asyncio.to_thread(self.sandbox.fs.create_folder, scrape_dir, "755")
+            
+            # Scrape the URLs concurrently, bounded overall and per site
+            semaphore = asyncio.Semaphore(MAX_CONCURRENT_SCRAPES)
+            
+            async def scrape_bounded(url: str) -> dict:
                 try:
-                    # Add protocol if missing
-                    if not (url.startswith('http://') or url.startswith('https://')):
-                        url = 'https://' + url
-                        logging.info(f"Added https:// protocol to URL: {url}")
-                    
-                    # Scrape this URL
-                    result = await self._scrape_single_url(url)
-                    results.append(result)
-                    
+                    async with semaphore:
+                        async with http_client.host_limit(url, max_concurrent=MAX_CONCURRENT_SCRAPES_PER_SITE):
+                            return await self._scrape_single_url(url)
                 except Exception as e:
                     logging.error(f"Error processing URL {url}: {str(e)}")
-                    results.append({
+                    return {
                         "url": url,
                         "success": False,
                         "error": str(e)
-                    })
+                    }
+            
+            results = await asyncio.gather(*(scrape_bounded(url) for url in url_list))
             
             # Summarize results
             successful = sum(1 for r in results if r.get("success", False))
@@ -277,12 +350,12 @@ class SandboxWebSearchTool(SandboxToolsBase):
                 message = f"Successfully scraped all {len(results)} URLs. Results saved to:"
                 for r in results:
                     if r.get("file_path"):
-                        message += f"\n- {r.get('file_path')}"
+                        message += f"\n- {r.get('file_path')}" + (" (from cache)" if r.get("cached") else "")
             elif successful > 0:
                 message = f"Scraped {successful} URLs successfully and {failed} failed. Results saved to:"
                 for r in results:
                     if r.get("success", False) and r.get("file_path"):
-                        message += f"\n- {r.get('file_path')}"
+                        message += f"\n- {r.get('file_path')}" + (" (from cache)" if r.get("cached") else "")
                 message += "\n\nFailed URLs:"
                 for r in results:
                     if not r.get("success", False):
@@ -301,6 +374,55 @@ class SandboxWebSearchTool(SandboxToolsBase):
             logging.error(f"Error in scrape_webpage: {error_message}")
             return self.fail_response(f"Error processing scrape request: {error_message[:200]}")
     
+    async def _firecrawl_scrape(self, url: str) -> dict:
+        """
+        Scrape a URL with Firecrawl, retrying on timeouts, and return the raw response data.
+        """
+        # ---------- Firecrawl scrape endpoint ----------
+        logging.info(f"Sending request to Firecrawl for URL: {url}")
+        client = http_client.get_client()
+        headers = {
+            "Authorization": f"Bearer {self.firecrawl_api_key}",
+            "Content-Type": "application/json",
+        }
+        payload = {
+            "url": url,
+            "formats": ["markdown"]
+        }
+        
+        # Use longer timeout and retry logic for more reliability
+        max_retries = 3
+        timeout_seconds = 120
+        retry_count = 0
+        
+        while retry_count < max_retries:
+            try:
+                logging.info(f"Sending request to Firecrawl (attempt {retry_count + 1}/{max_retries})")
+                response = await client.post(
+                    f"{self.firecrawl_url}/v1/scrape",
+                    json=payload,
+                    headers=headers,
+                    timeout=timeout_seconds,
+                )
+                response.raise_for_status()
+                data = response.json()
+                logging.info(f"Successfully received response from Firecrawl for {url}")
+                break
+            except (httpx.ReadTimeout, httpx.ConnectTimeout, httpx.ReadError) as timeout_err:
+                retry_count += 1
+                logging.warning(f"Request timed out (attempt {retry_count}/{max_retries}): {str(timeout_err)}")
+                if retry_count >= max_retries:
+                    raise Exception(f"Request timed out after {max_retries} attempts with {timeout_seconds}s timeout")
+                # Exponential backoff
+                logging.info(f"Waiting {2 ** retry_count}s before retry")
+                await asyncio.sleep(2 ** retry_count)
+            except Exception as e:
+                # Don't retry on non-timeout errors
+                logging.error(f"Error during scraping: {str(e)}")
+                raise e
+        
+        return data
+
     async def _scrape_single_url(self, url: str) -> dict:
         """
         Helper function to scrape a single URL and return the result information.
@@ -308,48 +430,16 @@ class SandboxWebSearchTool(SandboxToolsBase):
         logging.info(f"Scraping single URL: {url}")
         
         try:
-            # ---------- Firecrawl scrape endpoint ----------
-            logging.info(f"Sending request to Firecrawl for URL: {url}")
-            async with httpx.AsyncClient() as client:
-                headers = {
-                    "Authorization": f"Bearer {self.firecrawl_api_key}",
-                    "Content-Type": "application/json",
-                }
-                payload = {
-                    "url": url,
-                    "formats": ["markdown"]
-                }
-                
-                # Use longer timeout and retry logic for more reliability
-                max_retries = 3
-                timeout_seconds = 120
-                retry_count = 0
-                
-                while retry_count < max_retries:
-                    try:
-                        logging.info(f"Sending request to Firecrawl (attempt {retry_count + 1}/{max_retries})")
-                        response = await client.post(
-                            f"{self.firecrawl_url}/v1/scrape",
-                            json=payload,
-                            headers=headers,
-                            timeout=timeout_seconds,
-                        )
-                        response.raise_for_status()
-                        data = response.json()
-                        logging.info(f"Successfully received response from Firecrawl for {url}")
-                        break
-                    except (httpx.ReadTimeout, httpx.ConnectTimeout, httpx.ReadError) as timeout_err:
-                        retry_count += 1
-                        logging.warning(f"Request timed out (attempt {retry_count}/{max_retries}): {str(timeout_err)}")
-                        if retry_count >= max_retries:
-                            raise Exception(f"Request timed out after {max_retries} attempts with {timeout_seconds}s timeout")
-                        # Exponential backoff
-                        logging.info(f"Waiting {2 ** retry_count}s before retry")
-                        await asyncio.sleep(2 ** retry_count)
-                    except Exception as e:
-                        # Don't retry on non-timeout errors
-                        logging.error(f"Error during scraping: {str(e)}")
-                        raise e
+            # Serve repeated URLs from the shared cache instead of paying for another scrape
+            cache_key = cache.make_key(normalize_url(url))
+            cached = await cache.get(SCRAPE_CACHE_NAMESPACE, cache_key)
+            if cached:
+                data = cached["value"]
+                logging.info(f"Scrape cache hit for {url}")
+            else:
+                data = await self._firecrawl_scrape(url)
+                if data.get("success", True) and data.get("data", {}).get("markdown"):
+                    await cache.put(SCRAPE_CACHE_NAMESPACE, cache_key, data, ttl=SCRAPE_CACHE_TTL, max_bytes=SCRAPE_CACHE_MAX_BYTES)
 
             # Format the response
             title = data.get("data", {}).get("metadata", {}).get("title", "")
@@ -371,25 +461,25 @@ class SandboxWebSearchTool(SandboxToolsBase):
             timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
             
             # Extract domain from URL for the filename
-            from urllib.parse import urlparse
             parsed_url = urlparse(url)
             domain = parsed_url.netloc.replace("www.", "")
             
-            # Clean up domain for filename
+            # Clean up domain for filename; the URL hash keeps pages of one site
+            # scraped in the same second from overwriting each other
             domain = "".join([c if c.isalnum() else "_" for c in domain])
-            safe_filename = f"{timestamp}_{domain}.json"
+            url_hash = hashlib.sha1(url.encode()).hexdigest()[:8]
+            safe_filename = f"{timestamp}_{domain}_{url_hash}.json"
             
             logging.info(f"Generated filename: {safe_filename}")
             
             # Save results to a file in the /workspace/scrape directory
             scrape_dir = f"{self.workspace_path}/scrape"
-            self.sandbox.fs.create_folder(scrape_dir, "755")
-            
             results_file_path = f"{scrape_dir}/{safe_filename}"
             json_content = json.dumps(formatted_result, ensure_ascii=False, indent=2)
             logging.info(f"Saving content to file: {results_file_path}, size: {len(json_content)} bytes")
             
-            self.sandbox.fs.upload_file(
+            await asyncio.to_thread(
+                self.sandbox.fs.upload_file,
                 results_file_path, 
                 json_content.encode()
             )
@@ -399,7 +489,8 @@ class SandboxWebSearchTool(SandboxToolsBase):
                 "success": True,
                 "title": title,
                 "file_path": results_file_path,
-                "content_length": len(markdown_content)
+                "content_length": len(markdown_content),
+                "cached": cached is not None
             }
         
         except Exception as e:
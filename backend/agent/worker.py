@@ -0,0 +1,61 @@
+"""
+Dedicated agent worker.
+
+Claims agent runs from the Redis run queue and executes them, so agent
+execution can be scaled separately from the API.
+
+Usage:
+    python -m agent.worker
+
+Set AGENT_WORKER_EMBEDDED=false on the API so its processes only queue runs.
+AGENT_WORKER_MAX_RUNS and AGENT_WORKER_MIN_FREE_MEMORY_MB set the capacity of
+each worker. On SIGTERM the worker interrupts its runs and puts them back on
+the queue for the other workers.
+"""
+
+import asyncio
+import signal
+import uuid
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from agentpress.thread_manager import ThreadManager
+from services.supabase import DBConnection
+from services import redis
+from agent import api as agent_api
+from utils.logger import logger
+
+
+async def main():
+    """Run an agent worker until it is told to stop."""
+    worker_id = f"worker-{str(uuid.uuid4())[:8]}"
+    db = DBConnection()
+    await db.initialize()
+    await redis.initialize_async()
+
+    agent_api.initialize(ThreadManager(), db, worker_id)
+    await agent_api.start_run_worker()
+
+    stop_requested = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_requested.set)
+
+    await stop_requested.wait()
+    logger.info(f"Stopping agent worker {worker_id}")
+
+    # Requeues the runs in progress and closes Redis
+    await agent_api.cleanup()
+
+    from services import http_client
+    try:
+        await http_client.close()
+    except Exception as e:
+        logger.error(f"Error closing shared HTTP client: {e}")
+
+    await db.disconnect()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
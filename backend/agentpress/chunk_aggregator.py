@@ -0,0 +1,148 @@
+"""
+Aggregation of streamed content chunks for AgentPress responses.
+
+LLM deltas are often only a few characters long. Publishing each of them as
+its own response costs a Redis list entry, a pub/sub message and an SSE frame
+per delta. This module merges consecutive assistant content chunks over a
+short time window or up to a size threshold. Any other response (tool status,
+saved messages, errors) flushes the buffered text first and passes through
+immediately.
+"""
+
+import asyncio
+import inspect
+from contextlib import suppress
+from typing import Any, AsyncGenerator, AsyncIterable, Dict, List, Optional
+
+from utils.json_utils import dumps, loads, EncodedMessage
+
+# Defaults for aggregating content chunks
+DEFAULT_WINDOW_MS = 40      # Longest time a chunk is held back
+DEFAULT_MAX_BYTES = 2048    # Buffered text size that triggers an immediate flush
+
+
+def is_content_chunk(response: Dict[str, Any]) -> bool:
+    """Check whether a response is a streamed (unsaved) assistant content chunk."""
+    return (
+        response.get('type') == 'assistant'
+        and response.get('message_id') is None
+        and isinstance(response.get('content'), str)
+    )
+
+
+class _ChunkBuffer:
+    """Consecutive content chunks waiting to be merged into one."""
+
+    def __init__(self):
+        self.first: Optional[Dict[str, Any]] = None
+        self.parts: List[str] = []
+        self.size = 0
+        self.deadline = 0.0
+
+    def add(self, response: Dict[str, Any], deadline: float) -> None:
+        if self.first is None:
+            self.first = response
+            self.deadline = deadline
+        text = loads(response['content']).get('content', '')
+        self.parts.append(text)
+        self.size += len(text.encode('utf-8'))
+
+    def flush(self) -> Optional[Dict[str, Any]]:
+        """Return the merged chunk and empty the buffer, or None if it was empty."""
+        if self.first is None:
+            return None
+        if len(self.parts) == 1:
+            merged = self.first
+        else:
+            # Keeps the metadata and timestamps of the first chunk
+            merged = EncodedMessage.encode({
+                **self.first,
+                "content": dumps({"role": "assistant", "content": "".join(self.parts)})
+            })
+        self.__init__()
+        return merged
+
+
+async def _close_source(responses: AsyncIterable[Dict[str, Any]]) -> None:
+    """Close the source generator so its cleanup (finally blocks) runs now."""
+    if inspect.isasyncgen(responses):
+        await responses.aclose()
+
+
+async def aggregate_content_chunks(
+    responses: AsyncIterable[Dict[str, Any]],
+    window_ms: int = DEFAULT_WINDOW_MS,
+    max_bytes: int = DEFAULT_MAX_BYTES
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """Merge consecutive content chunks of a response stream.
+
+    Buffered text is flushed when the first buffered chunk is window_ms old,
+    when it reaches max_bytes, or before any other response, so the order of
+    responses is kept. The next response is fetched while waiting, so a slow
+    consumer doesn't hold back the producer.
+
+    The source is closed when the aggregation ends, including when the
+    consumer closes this generator early (e.g. a stopped run).
+
+    Args:
+        responses: Responses yielded by the ResponseProcessor (via run_agent)
+        window_ms: Time window in milliseconds; 0 disables aggregation
+        max_bytes: Size of buffered text in bytes that is flushed immediately
+
+    Yields:
+        The responses, with runs of content chunks merged
+    """
+    if window_ms <= 0:
+        try:
+            async for response in responses:
+                yield response
+        finally:
+            await _close_source(responses)
+        return
+
+    loop = asyncio.get_running_loop()
+    window = window_ms / 1000
+    iterator = responses.__aiter__()
+    buffer = _ChunkBuffer()
+    next_response: Optional[asyncio.Future] = None
+
+    try:
+        while True:
+            if next_response is None:
+                next_response = asyncio.ensure_future(iterator.__anext__())
+
+            timeout = max(0.0, buffer.deadline - loop.time()) if buffer.first else None
+            done, _ = await asyncio.wait({next_response}, timeout=timeout)
+            if not done:
+                # Window elapsed while the LLM was still producing the next delta
+                yield buffer.flush()
+                continue
+
+            try:
+                response = next_response.result()
+            except StopAsyncIteration:
+                break
+            finally:
+                next_response = None
+
+            if is_content_chunk(response):
+                buffer.add(response, loop.time() + window)
+                if buffer.size >= max_bytes:
+                    yield buffer.flush()
+                continue
+
+            merged = buffer.flush()
+            if merged:
+                yield merged
+            yield response
+
+        merged = buffer.flush()
+        if merged:
+            yield merged
+    finally:
+        if next_response is not None:
+            next_response.cancel()
+            # Let the source handle the cancellation before closing it
+            with suppress(asyncio.CancelledError, StopAsyncIteration):
+                await next_response
+        await _close_source(responses)
@@ -18,9 +18,10 @@ from datetime import datetime, timezone
 
 from litellm import completion_cost
 
-from agentpress.tool import Tool, ToolResult
+from agentpress.tool import Tool, ToolResult, ToolAccess, EXCLUSIVE_ACCESS
 from agentpress.tool_registry import ToolRegistry
 from utils.logger import logger
+from utils.json_utils import dumps, EncodedMessage
 
 # Type alias for XML result adding strategy
 XmlAddingStrategy = Literal["user_message", "assistant_message", "inline_edit"]
@@ -52,8 +53,10 @@ class ProcessorConfig:
         xml_tool_calling: Enable XML-based tool call detection (<tool>...</tool>)
         native_tool_calling: Enable OpenAI-style function calling format
         execute_tools: Whether to automatically execute detected tool calls
-        execute_on_stream: For streaming, execute tools as they appear vs. at the end
-        tool_execution_strategy: How to execute multiple tools ("sequential" or "parallel")
+        execute_on_stream: For streaming, execute tools as they appear vs. at the end.
+            Speculative XML tools start as soon as their opening tag is complete.
+        tool_execution_strategy: How to execute multiple tools ("sequential" or "parallel").
+            With "parallel", calls that don't conflict (see ToolAccess) run concurrently.
         xml_adding_strategy: How to add XML tool results to the conversation
         max_xml_tool_calls: Maximum number of XML tool calls to process (0 = no limit)
     """
@@ -117,6 +120,8 @@ class ResponseProcessor:
         current_xml_content = ""
         xml_chunks_buffer = []
         pending_tool_executions = []
+        scheduled_tool_executions = [] # (ToolAccess, task) of tools started during the stream
+        speculative_executions = [] # Speculative tools started before their closing tag arrived
         yielded_tool_indices = set() # Stores indices of tools whose *status* has been yielded
         tool_index = 0
         xml_tool_call_count = 0
@@ -129,6 +134,9 @@ class ResponseProcessor:
                    f"Execute on stream={config.execute_on_stream}, Strategy={config.tool_execution_strategy}")
 
         thread_run_id = str(uuid.uuid4())
+        # Content chunks are yielded already serialized; their metadata is the same for the whole run
+        chunk_metadata = dumps({"stream_status": "chunk", "thread_run_id": thread_run_id})
+        tool_call_chunk_metadata = dumps({"thread_run_id": thread_run_id})
 
         try:
             # --- Save and Yield Start Events ---
@@ -174,13 +182,13 @@ class ResponseProcessor:
                         if not (config.max_xml_tool_calls > 0 and xml_tool_call_count >= config.max_xml_tool_calls):
                             # Yield ONLY content chunk (don't save)
                             now_chunk = datetime.now(timezone.utc).isoformat()
-                            yield {
+                            yield EncodedMessage.encode({
                                 "message_id": None, "thread_id": thread_id, "type": "assistant",
                                 "is_llm_message": True,
-                                "content": json.dumps({"role": "assistant", "content": chunk_content}),
-                                "metadata": json.dumps({"stream_status": "chunk", "thread_run_id": thread_run_id}),
+                                "content": dumps({"role": "assistant", "content": chunk_content}),
+                                "metadata": chunk_metadata,
                                 "created_at": now_chunk, "updated_at": now_chunk
-                            }
+                            })
                         else:
                             logger.info("XML tool call limit reached - not yielding more content chunks")
 
@@ -191,6 +199,9 @@ class ResponseProcessor:
                                 current_xml_content = current_xml_content.replace(xml_chunk, "", 1)
                                 xml_chunks_buffer.append(xml_chunk)
                                 result = self._parse_xml_tool_call(xml_chunk)
+                                speculative_task = self._claim_speculative_execution(
+                                    xml_chunk, result[0] if result else None, speculative_executions
+                                )
                                 if result:
                                     tool_call, parsing_details = result
                                     xml_tool_call_count += 1
@@ -205,7 +216,9 @@ class ResponseProcessor:
                                         if started_msg_obj: yield started_msg_obj
                                         yielded_tool_indices.add(tool_index) # Mark status as yielded
 
-                                        execution_task = asyncio.create_task(self._execute_tool(tool_call))
+                                        execution_task = speculative_task or self._schedule_tool_execution(
+                                            tool_call, scheduled_tool_executions, config.tool_execution_strategy
+                                        )
                                         pending_tool_executions.append({
                                             "task": execution_task, "tool_call": tool_call,
                                             "tool_index": tool_index, "context": context
@@ -217,6 +230,13 @@ class ResponseProcessor:
                                         finish_reason = "xml_tool_limit_reached"
                                         break # Stop processing more XML chunks in this delta
 
+                            # Start read-only tools whose closing tag hasn't arrived yet
+                            if config.execute_tools and config.execute_on_stream and finish_reason != "xml_tool_limit_reached":
+                                self._start_speculative_executions(
+                                    current_xml_content, speculative_executions,
+                                    scheduled_tool_executions, config.tool_execution_strategy
+                                )
+
                     # --- Process Native Tool Call Chunks ---
                     if config.native_tool_calling and delta and hasattr(delta, 'tool_calls') and delta.tool_calls:
                         for tool_call_chunk in delta.tool_calls:
@@ -235,12 +255,12 @@ class ResponseProcessor:
 
 
                             now_tool_chunk = datetime.now(timezone.utc).isoformat()
-                            yield {
+                            yield EncodedMessage.encode({
                                 "message_id": None, "thread_id": thread_id, "type": "status", "is_llm_message": True,
-                                "content": json.dumps({"role": "assistant", "status_type": "tool_call_chunk", "tool_call_chunk": tool_call_data_chunk}),
-                                "metadata": json.dumps({"thread_run_id": thread_run_id}),
+                                "content": dumps({"role": "assistant", "status_type": "tool_call_chunk", "tool_call_chunk": tool_call_data_chunk}),
+                                "metadata": tool_call_chunk_metadata,
                                 "created_at": now_tool_chunk, "updated_at": now_tool_chunk
-                            }
+                            })
 
                             # --- Buffer and Execute Complete Native Tool Calls ---
                             if not hasattr(tool_call_chunk, 'function'): continue
@@ -275,7 +295,9 @@ class ResponseProcessor:
                                 if started_msg_obj: yield started_msg_obj
                                 yielded_tool_indices.add(tool_index) # Mark status as yielded
 
-                                execution_task = asyncio.create_task(self._execute_tool(tool_call_data))
+                                execution_task = self._schedule_tool_execution(
+                                    tool_call_data, scheduled_tool_executions, config.tool_execution_strategy
+                                )
                                 pending_tool_executions.append({
                                     "task": execution_task, "tool_call": tool_call_data,
                                     "tool_index": tool_index, "context": context
@@ -290,6 +312,9 @@ class ResponseProcessor:
 
             # --- After Streaming Loop ---
 
+            # Speculative tools whose call never completed are not needed
+            self._cancel_speculative_executions(speculative_executions)
+
             # Wait for pending tool executions from streaming phase
             tool_results_buffer = [] # Stores (tool_call, result, tool_index, context)
             if pending_tool_executions:
@@ -566,6 +591,12 @@ class ResponseProcessor:
             raise # Use bare 'raise' to preserve the original exception with its traceback
 
         finally:
+            self._cancel_speculative_executions(speculative_executions)
+            # Tools still running here were interrupted, e.g. because the run was stopped
+            for execution in pending_tool_executions:
+                if not execution["task"].done():
+                    execution["task"].cancel()
+
             # Save and Yield the final thread_run_end status
             try:
                 end_content = {"status_type": "thread_run_end"}
@@ -1084,6 +1115,116 @@ class ResponseProcessor:
             logger.error(f"Error executing tool {tool_call['function_name']}: {str(e)}", exc_info=True)
             return ToolResult(success=False, output=f"Error executing tool: {str(e)}")
 
+    def _get_tool_access(self, tool_call: Dict[str, Any]) -> ToolAccess:
+        """Get the resources a tool call touches, falling back to exclusive access."""
+        function_name = tool_call.get("function_name")
+        arguments = tool_call.get("arguments", {})
+        if isinstance(arguments, str):
+            try:
+                arguments = json.loads(arguments)
+            except json.JSONDecodeError:
+                arguments = {"text": arguments}
+
+        tool_fn = self.tool_registry.get_available_functions().get(function_name)
+        tool_instance = getattr(tool_fn, "__self__", None)
+        if not isinstance(tool_instance, Tool) or not isinstance(arguments, dict):
+            return EXCLUSIVE_ACCESS
+        try:
+            return tool_instance.get_tool_access(function_name, arguments)
+        except Exception as e:
+            logger.warning(f"Could not classify tool call {function_name}, running it exclusively: {str(e)}")
+            return EXCLUSIVE_ACCESS
+
+    async def _execute_tool_after(self, tool_call: Dict[str, Any], dependencies: List[asyncio.Task]) -> ToolResult:
+        """Execute a tool call once the calls it conflicts with have finished."""
+        if dependencies:
+            await asyncio.wait(dependencies)
+        return await self._execute_tool(tool_call)
+
+    def _schedule_tool_execution(
+        self,
+        tool_call: Dict[str, Any],
+        scheduled: List[Tuple[ToolAccess, asyncio.Task]],
+        execution_strategy: ToolExecutionStrategy = "parallel"
+    ) -> asyncio.Task:
+        """Start a tool call as a task that waits for the earlier calls it conflicts with.
+        
+        Args:
+            tool_call: The tool call to start
+            scheduled: (access, task) of the calls already started in this turn; the new call is appended
+            execution_strategy: With "sequential" every call waits for all earlier ones
+            
+        Returns:
+            The task executing the tool call
+        """
+        access = EXCLUSIVE_ACCESS if execution_strategy == "sequential" else self._get_tool_access(tool_call)
+        dependencies = [task for other, task in scheduled if access.conflicts_with(other)]
+        if dependencies:
+            logger.debug(f"Tool {tool_call.get('function_name')} waits for {len(dependencies)} conflicting tool calls")
+        task = asyncio.create_task(self._execute_tool_after(tool_call, dependencies))
+        scheduled.append((access, task))
+        return task
+
+    def _start_speculative_executions(
+        self,
+        content: str,
+        speculative_executions: List[Dict[str, Any]],
+        scheduled: List[Tuple[ToolAccess, asyncio.Task]],
+        execution_strategy: ToolExecutionStrategy = "parallel"
+    ) -> None:
+        """Start speculative tools whose opening tag is complete but whose closing tag is still streaming.
+        
+        Only tools with speculative XML schemas and attribute-only parameters qualify, since
+        their arguments are final once the opening tag is. The task is claimed when the
+        complete tag arrives (see _claim_speculative_execution).
+        """
+        for tag_name, tool_info in self.tool_registry.xml_tools.items():
+            schema = tool_info['schema'].xml_schema
+            if not schema or not schema.speculative or any(mapping.node_type != "attribute" for mapping in schema.mappings):
+                continue
+            for match in re.finditer(rf'<{re.escape(tag_name)}(?=[\s>])[^>]*>', content):
+                opening_tag = match.group(0)
+                if opening_tag.endswith('/>') or any(e["opening_tag"] == opening_tag for e in speculative_executions):
+                    continue
+                parsed = self._parse_xml_tool_call(f"{opening_tag}</{tag_name}>")
+                if not parsed:
+                    continue
+                tool_call, _ = parsed
+                logger.info(f"Speculatively starting {tool_call['function_name']} before its closing tag")
+                speculative_executions.append({
+                    "opening_tag": opening_tag, "tool_call": tool_call,
+                    "task": self._schedule_tool_execution(tool_call, scheduled, execution_strategy)
+                })
+
+    def _claim_speculative_execution(
+        self,
+        xml_chunk: str,
+        tool_call: Optional[Dict[str, Any]],
+        speculative_executions: List[Dict[str, Any]]
+    ) -> Optional[asyncio.Task]:
+        """Take the speculative task started for a completed XML chunk.
+        
+        Returns:
+            The task if it was started for exactly this tool call. If the complete
+            call differs or failed to parse, the task is cancelled and None is returned.
+        """
+        for execution in speculative_executions:
+            if xml_chunk.startswith(execution["opening_tag"]):
+                speculative_executions.remove(execution)
+                if tool_call is not None and execution["tool_call"] == tool_call:
+                    return execution["task"]
+                logger.info(f"Cancelling speculative {execution['tool_call']['function_name']}: the complete call differs")
+                execution["task"].cancel()
+                return None
+        return None
+
+    def _cancel_speculative_executions(self, speculative_executions: List[Dict[str, Any]]) -> None:
+        """Cancel speculative tools that were never claimed by a completed call."""
+        for execution in speculative_executions:
+            logger.info(f"Cancelling unclaimed speculative {execution['tool_call']['function_name']}")
+            execution["task"].cancel()
+        speculative_executions.clear()
+
     async def _execute_tools(
         self, 
         tool_calls: List[Dict[str, Any]], 
@@ -1098,7 +1239,7 @@ class ResponseProcessor:
             tool_calls: List of tool calls to execute
             execution_strategy: Strategy for executing tools:
                 - "sequential": Execute tools one after another, waiting for each to complete
-                - "parallel": Execute all tools simultaneously for better performance 
+                - "parallel": Execute tools concurrently, except calls that conflict with an earlier one
                 
         Returns:
             List of tuples containing the original tool call and its result
@@ -1164,8 +1305,10 @@ class ResponseProcessor:
     async def _execute_tools_in_parallel(self, tool_calls: List[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], ToolResult]]:
         """Execute tool calls in parallel and return results.
         
-        This method executes all tool calls simultaneously using asyncio.gather, which
+        This method executes tool calls concurrently using asyncio.gather, which
         can significantly improve performance when executing multiple independent tools.
+        A call that conflicts with an earlier one (e.g. writes a file the earlier call
+        reads) waits for it to finish first.
         
         Args:
             tool_calls: List of tool calls to execute
@@ -1180,8 +1323,9 @@ class ResponseProcessor:
             tool_names = [t.get('function_name', 'unknown') for t in tool_calls]
             logger.info(f"Executing {len(tool_calls)} tools in parallel: {tool_names}")
             
-            # Create tasks for all tool calls
-            tasks = [self._execute_tool(tool_call) for tool_call in tool_calls]
+            # Create tasks for all tool calls, ordered only where they conflict
+            scheduled = []
+            tasks = [self._schedule_tool_execution(tool_call, scheduled) for tool_call in tool_calls]
             
             # Execute all tasks concurrently with error handling
             results = await asyncio.gather(*tasks, return_exceptions=True)
@@ -26,6 +26,9 @@ from utils.logger import logger
 # Type alias for tool choice
 ToolChoice = Literal["auto", "required", "none"]
 
+# Page size used when reading a whole thread history page by page
+MESSAGE_PAGE_SIZE = 500
+
 class ThreadManager:
     """Manages conversation threads with LLM models and tool execution.
 
@@ -96,11 +99,65 @@ class ThreadManager:
             logger.error(f"Failed to add message to thread {thread_id}: {str(e)}", exc_info=True)
             raise
 
+    async def get_messages_page(
+        self,
+        thread_id: str,
+        limit: int = 100,
+        cursor: Optional[Dict[str, str]] = None,
+        ascending: bool = True,
+        types: Optional[List[str]] = None,
+        exclude_types: Optional[List[str]] = None,
+        llm_only: bool = False,
+        since_latest_summary: bool = False,
+        include_heavy_fields: bool = True
+    ) -> Dict[str, Any]:
+        """Get one page of a thread's messages, ordered by (created_at, message_id).
+
+        Uses keyset pagination through the get_thread_messages SQL function, so
+        every page costs the same no matter how long the thread is.
+
+        Args:
+            thread_id: The ID of the thread to get messages for.
+            limit: Maximum number of messages in the page (at most 1000).
+            cursor: The next_cursor of the previous page, or None for the first page.
+            ascending: Oldest first if True, newest first otherwise.
+            types: Only include messages of these types.
+            exclude_types: Leave out messages of these types.
+            llm_only: Only include messages sent to the LLM.
+            since_latest_summary: Start at the latest summary message, like the LLM context does.
+            include_heavy_fields: Include the base64 screenshots and images of
+                browser_state and image_context messages.
+
+        Returns:
+            Dict with the page's 'messages' and the 'next_cursor' to pass for the
+            following page, which is None after the last page.
+        """
+        client = await self.db.client
+        result = await client.rpc('get_thread_messages', {
+            'p_thread_id': thread_id,
+            'p_limit': limit,
+            'p_cursor_created_at': cursor['created_at'] if cursor else None,
+            'p_cursor_message_id': cursor['message_id'] if cursor else None,
+            'p_ascending': ascending,
+            'p_types': types,
+            'p_exclude_types': exclude_types,
+            'p_llm_only': llm_only,
+            'p_since_latest_summary': since_latest_summary,
+            'p_include_heavy_fields': include_heavy_fields
+        }).execute()
+
+        messages = result.data or []
+        next_cursor = None
+        if len(messages) >= limit:
+            last_message = messages[-1]
+            next_cursor = {'created_at': last_message['created_at'], 'message_id': last_message['message_id']}
+        return {'messages': messages, 'next_cursor': next_cursor}
+
     async def get_llm_messages(self, thread_id: str) -> List[Dict[str, Any]]:
         """Get all messages for a thread.
 
-        This method uses the SQL function which handles context truncation
-        by considering summary messages.
+        Reads the LLM messages from the latest summary onwards page by page,
+        which handles context truncation by considering summary messages.
 
         Args:
             thread_id: The ID of the thread to get messages for.
@@ -109,26 +166,29 @@ class ThreadManager:
             List of message objects.
         """
         logger.debug(f"Getting messages for thread {thread_id}")
-        client = await self.db.client
 
         try:
-            result = await client.rpc('get_llm_formatted_messages', {'p_thread_id': thread_id}).execute()
-
-            # Parse the returned data which might be stringified JSON
-            if not result.data:
-                return []
-
             # Return properly parsed JSON objects
             messages = []
-            for item in result.data:
-                if isinstance(item, str):
-                    try:
-                        parsed_item = json.loads(item)
-                        messages.append(parsed_item)
-                    except json.JSONDecodeError:
-                        logger.error(f"Failed to parse message: {item}")
-                else:
-                    messages.append(item)
+            cursor = None
+            while True:
+                page = await self.get_messages_page(
+                    thread_id, limit=MESSAGE_PAGE_SIZE, cursor=cursor,
+                    llm_only=True, since_latest_summary=True
+                )
+                for row in page['messages']:
+                    item = row['content']
+                    if isinstance(item, str):
+                        try:
+                            parsed_item = json.loads(item)
+                            messages.append(parsed_item)
+                        except json.JSONDecodeError:
+                            logger.error(f"Failed to parse message: {item}")
+                    else:
+                        messages.append(item)
+                cursor = page['next_cursor']
+                if not cursor:
+                    break
 
             # Ensure tool_calls have properly formatted function arguments
             for message in messages:
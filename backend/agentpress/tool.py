@@ -5,9 +5,10 @@ This module defines the base classes and decorators for creating tools in AgentP
 - Tool base class for implementing tool functionality
 - Schema decorators for OpenAPI and XML tool definitions
 - Result containers for standardized tool outputs
+- Access declarations used to decide which tool calls can run concurrently
 """
 
-from typing import Dict, Any, Union, Optional, List
+from typing import Dict, Any, Union, Optional, List, FrozenSet, Iterable
 from dataclasses import dataclass, field
 from abc import ABC
 import json
@@ -44,6 +45,8 @@ class XMLTagSchema:
         tag_name (str): Root tag name for the tool
         mappings (List[XMLNodeMapping]): Parameter mappings for the tag
         example (str, optional): Example showing tag usage
+        speculative (bool): The tool is read-only and idempotent, so a streamed call
+            may be started as soon as its opening tag is complete
         
     Methods:
         add_mapping: Add a new parameter mapping to the schema
@@ -51,6 +54,7 @@ class XMLTagSchema:
     tag_name: str
     mappings: List[XMLNodeMapping] = field(default_factory=list)
     example: Optional[str] = None
+    speculative: bool = False
     
     def add_mapping(self, param_name: str, node_type: str = "element", path: str = ".", required: bool = True) -> None:
         """Add a new node mapping to the schema.
@@ -93,6 +97,49 @@ class ToolResult:
     success: bool
     output: str
 
+@dataclass(frozen=True)
+class ToolAccess:
+    """Resources a tool call reads and writes.
+    
+    Two calls conflict, and must run in the order they were made, when one of
+    them writes a resource the other reads or writes. Resources are names such
+    as "fs:src/app.py" or "browser". A resource covers everything nested below
+    it, so "fs" covers "fs:src/app.py" and "fs:src" covers "fs:src/app.py".
+    "*" covers every resource.
+    
+    Attributes:
+        reads (FrozenSet[str]): Resources the call only reads
+        writes (FrozenSet[str]): Resources the call modifies
+    """
+    reads: FrozenSet[str] = frozenset()
+    writes: FrozenSet[str] = frozenset()
+
+    @classmethod
+    def of(cls, reads: Iterable[str] = (), writes: Iterable[str] = ()) -> 'ToolAccess':
+        """Create an access declaration from any iterables of resource names."""
+        return cls(reads=frozenset(reads), writes=frozenset(writes))
+
+    @staticmethod
+    def _overlaps(first: str, second: str) -> bool:
+        if first == "*" or second == "*" or first == second:
+            return True
+        shorter, longer = sorted((first, second), key=len)
+        return longer.startswith(shorter) and longer[len(shorter)] in ":/"
+
+    def conflicts_with(self, other: 'ToolAccess') -> bool:
+        """Check whether this call and another must not run concurrently."""
+        if "*" in self.writes or "*" in other.writes:
+            return True
+        return any(
+            self._overlaps(first, second)
+            for writes, touched in ((self.writes, other.reads | other.writes), (other.writes, self.reads))
+            for first in writes
+            for second in touched
+        )
+
+# Conflicts with every other call, so the call runs on its own
+EXCLUSIVE_ACCESS = ToolAccess(writes=frozenset({"*"}))
+
 class Tool(ABC):
     """Abstract base class for all tools.
     
@@ -104,6 +151,8 @@ class Tool(ABC):
         
     Methods:
         get_schemas: Get all registered tool schemas
+        get_tool_access: Get the resources a call to a tool method touches
+        close: Release what the tool holds for the run when the run ends
         success_response: Create a successful result
         fail_response: Create a failed result
     """
@@ -129,6 +178,29 @@ class Tool(ABC):
         """
         return self._schemas
 
+    def get_tool_access(self, method_name: str, arguments: Dict[str, Any]) -> ToolAccess:
+        """Get the resources a call to one of this tool's methods touches.
+        
+        Tools override this so independent calls from the same assistant turn can
+        run concurrently. The default is exclusive access, which runs the call
+        after every earlier call and before every later one.
+        
+        Args:
+            method_name: Name of the tool method being called
+            arguments: Arguments of the call
+            
+        Returns:
+            ToolAccess describing the resources the call reads and writes
+        """
+        return EXCLUSIVE_ACCESS
+
+    async def close(self) -> None:
+        """Release what the tool holds for its agent run, such as background tasks.
+        
+        Called once when the run ends, however it ends. The default does nothing.
+        """
+        pass
+
     def success_response(self, data: Union[Dict[str, Any], str]) -> ToolResult:
         """Create a successful tool result.
         
@@ -178,7 +250,8 @@ def openapi_schema(schema: Dict[str, Any]):
 def xml_schema(
     tag_name: str,
     mappings: List[Dict[str, Any]] = None,
-    example: str = None
+    example: str = None,
+    speculative: bool = False
 ):
     """
     Decorator for XML schema tools with improved node mapping.
@@ -191,6 +264,10 @@ def xml_schema(
             - path: Path to the node (default "." for root)
             - required: Whether the parameter is required (default True)
         example: Optional example showing how to use the XML tag
+        speculative: Whether a streamed call may start before its closing tag arrives.
+            Only for read-only, idempotent tools whose parameters are all attributes;
+            the call is cancelled if the complete tag turns out different. Has no effect
+            on self-closing tags, which are complete as soon as they are parsed.
     
     Example:
         @xml_schema(
@@ -210,7 +287,7 @@ def xml_schema(
     """
     def decorator(func):
         logger.debug(f"Applying XML schema with tag '{tag_name}' to function {func.__name__}")
-        xml_schema = XMLTagSchema(tag_name=tag_name, example=example)
+        xml_schema = XMLTagSchema(tag_name=tag_name, example=example, speculative=speculative)
         
         # Add mappings
         if mappings:
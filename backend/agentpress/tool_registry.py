@@ -70,6 +70,15 @@ class ToolRegistry:
         
         logger.debug(f"Tool registration complete for {tool_class.__name__}: {registered_openapi} OpenAPI functions, {registered_xml} XML tags")
 
+    async def close_tools(self):
+        """Call close() on every registered tool instance, logging failures."""
+        instances = {id(info['instance']): info['instance'] for info in [*self.tools.values(), *self.xml_tools.values()]}
+        for tool_instance in instances.values():
+            try:
+                await tool_instance.close()
+            except Exception as e:
+                logger.error(f"Error closing tool {tool_instance.__class__.__name__}: {str(e)}")
+
     def get_available_functions(self) -> Dict[str, Callable]:
         """Get all available tool functions.
         
@@ -24,7 +24,7 @@ load_dotenv()
 # Initialize managers
 db = DBConnection()
 thread_manager = None
-instance_id = "single"
+instance_id = None # Set per worker process at startup
 
 # Rate limiter state
 ip_tracker = OrderedDict()
@@ -33,7 +33,9 @@ MAX_CONCURRENT_IPS = 25
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    global thread_manager
+    global thread_manager, instance_id
+    # Generated here rather than at import, so every (pre-forked) worker process gets its own
+    instance_id = str(uuid.uuid4())[:8]
     logger.info(f"Starting up FastAPI application with instance ID: {instance_id} in {config.ENV_MODE.value} mode")
     
     try:
@@ -62,6 +64,13 @@ async def lifespan(app: FastAPI):
         
         # Start background tasks
         asyncio.create_task(agent_api.restore_running_agent_runs())
+
+        # Execute queued agent runs in this process unless dedicated workers do it
+        if config.AGENT_WORKER_EMBEDDED:
+            try:
+                await agent_api.start_run_worker()
+            except Exception as e:
+                logger.error(f"Failed to start agent worker: {e}")
         
         yield
         
@@ -77,6 +86,13 @@ async def lifespan(app: FastAPI):
         except Exception as e:
             logger.error(f"Error closing Redis connection: {e}")
         
+        # Clean up shared HTTP client
+        from services import http_client
+        try:
+            await http_client.close()
+        except Exception as e:
+            logger.error(f"Error closing shared HTTP client: {e}")
+        
         # Clean up database connection
         logger.info("Disconnecting from database")
         await db.disconnect()
@@ -1,15 +1,22 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Body
-from playwright.async_api import async_playwright, Browser, Page
+from fastapi import FastAPI, APIRouter, HTTPException, Body, Header, Depends
+from playwright.async_api import async_playwright, Browser, BrowserContext, Page
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 import asyncio
 import json
 import logging
 import base64
+from contextvars import ContextVar
 from dataclasses import dataclass, field
 from datetime import datetime
 import os
 import random
+import re
+import time
+import hashlib
+import ipaddress
+from urllib.parse import urlparse
+from email.utils import parsedate_to_datetime
 from functools import cached_property
 import traceback
 import pytesseract
@@ -33,6 +40,7 @@ class ClickCoordinatesAction(BaseModel):
 
 class GoToUrlAction(BaseModel):
     url: str
+    profile: Optional[str] = None  # Page-load profile, see NAVIGATION_PROFILES
 
 class InputTextAction(BaseModel):
     index: int
@@ -75,6 +83,9 @@ class DoneAction(BaseModel):
     success: bool = True
     text: str = ""
 
+class ContextAction(BaseModel):
+    context_id: str
+
 #######################################################
 # DOM Structure Models
 #######################################################
@@ -246,6 +257,184 @@ class DOMState:
     pixels_above: int = 0
     pixels_below: int = 0
 
+#######################################################
+# Page-Load Profiles and Shared HTTP Cache
+#######################################################
+
+@dataclass(frozen=True)
+class NavigationProfile:
+    """Which requests to block while loading pages in a browser context"""
+    name: str
+    blocked_resource_types: frozenset = frozenset()
+    block_third_party: bool = False
+
+DEFAULT_NAVIGATION_PROFILE = "full"
+NAVIGATION_PROFILES: Dict[str, NavigationProfile] = {
+    "full": NavigationProfile("full"),
+    "no-media": NavigationProfile("no-media", frozenset({"image", "media", "font"})),
+    "no-third-party": NavigationProfile("no-third-party", block_third_party=True),
+    "text-only": NavigationProfile("text-only", frozenset({"image", "media", "font", "stylesheet"}), block_third_party=True),
+}
+
+# Static assets that are safe to share between contexts through the disk cache
+CACHEABLE_RESOURCE_TYPES = {"stylesheet", "script", "font", "image"}
+HTTP_CACHE_DIR = os.getenv("BROWSER_HTTP_CACHE_DIR", "/tmp/browser_http_cache")
+HTTP_CACHE_MAX_BYTES = int(os.getenv("BROWSER_HTTP_CACHE_MAX_MB", "512")) * 1024 * 1024
+HTTP_CACHE_MAX_ENTRY_BYTES = 5 * 1024 * 1024
+
+# Second-level labels that belong to the public suffix under country-code TLDs (e.g. co.uk)
+_COUNTRY_SECOND_LEVEL_LABELS = {"co", "com", "net", "org", "gov", "edu", "ac"}
+
+def get_site(host: str) -> str:
+    """Approximate the registrable domain of a host for first/third-party checks"""
+    host = (host or "").lower().strip(".")
+    try:
+        ipaddress.ip_address(host)
+        return host
+    except ValueError:
+        pass
+    labels = host.split(".")
+    if len(labels) <= 2:
+        return host
+    if len(labels[-1]) == 2 and labels[-2] in _COUNTRY_SECOND_LEVEL_LABELS:
+        return ".".join(labels[-3:])
+    return ".".join(labels[-2:])
+
+class SharedHttpCache:
+    """Disk cache for static assets shared by every browser context.
+    
+    Off-the-record browser contexts keep Chromium's HTTP cache in memory, so
+    nothing survives a closed context. Assets fetched through request routing
+    are stored here instead and replayed with route.fulfill.
+    
+    Entries are keyed by URL only, so only responses with an explicit lifetime
+    (s-maxage, max-age or Expires) that don't vary on request headers other
+    than Accept-Encoding are stored. The methods do blocking file I/O; call
+    them through asyncio.to_thread.
+    """
+    
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.puts_since_prune = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+    
+    def _paths(self, url: str) -> tuple:
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.body"), os.path.join(self.cache_dir, f"{key}.json")
+    
+    @staticmethod
+    def _ttl(headers: Dict[str, str]) -> Optional[int]:
+        """Get the cache lifetime of a response, or None if it must not be stored"""
+        cache_control = headers.get("cache-control", "").lower()
+        if "no-store" in cache_control or "private" in cache_control or "no-cache" in cache_control:
+            return None
+        vary = {v.strip().lower() for v in headers.get("vary", "").split(",") if v.strip()}
+        if vary - {"accept-encoding"}:
+            return None
+        
+        # Shared caches prefer s-maxage over max-age
+        match = re.search(r"s-maxage=(\d+)", cache_control) or re.search(r"max-age=(\d+)", cache_control)
+        if match:
+            ttl = int(match.group(1))
+        elif headers.get("expires"):
+            try:
+                expires = parsedate_to_datetime(headers["expires"])
+                date = parsedate_to_datetime(headers["date"]) if headers.get("date") else None
+                ttl = int(expires.timestamp() - (date.timestamp() if date else time.time()))
+            except (TypeError, ValueError):
+                return None
+        else:
+            # No explicit lifetime; heuristic freshness would serve stale dynamic content
+            return None
+        return ttl if ttl > 0 else None
+    
+    def get(self, url: str) -> Optional[tuple]:
+        """Get (status, headers, body) for a fresh cached response"""
+        body_path, meta_path = self._paths(url)
+        try:
+            with open(meta_path, "r") as f:
+                meta = json.load(f)
+            if meta["expires_at"] < time.time():
+                return None
+            with open(body_path, "rb") as f:
+                body = f.read()
+            return meta["status"], meta["headers"], body
+        except (OSError, ValueError, KeyError):
+            return None
+    
+    def put(self, url: str, status: int, headers: Dict[str, str], body: bytes):
+        """Store a response if it is cacheable"""
+        if status != 200 or len(body) > HTTP_CACHE_MAX_ENTRY_BYTES:
+            return
+        ttl = self._ttl(headers)
+        if ttl is None:
+            return
+        body_path, meta_path = self._paths(url)
+        try:
+            with open(body_path, "wb") as f:
+                f.write(body)
+            # Drop hop-specific headers; the body is replayed decoded
+            stored_headers = {k: v for k, v in headers.items()
+                              if k.lower() not in ("content-length", "content-encoding", "transfer-encoding", "set-cookie")}
+            with open(meta_path, "w") as f:
+                json.dump({"url": url, "status": status, "headers": stored_headers, "expires_at": time.time() + ttl}, f)
+        except OSError as e:
+            print(f"Error writing HTTP cache entry for {url}: {e}")
+            return
+        self.puts_since_prune += 1
+        if self.puts_since_prune >= 100:
+            self.puts_since_prune = 0
+            self.prune()
+    
+    def prune(self):
+        """Evict the least recently written entries until the cache fits its size budget"""
+        try:
+            entries = []
+            total = 0
+            for entry in os.scandir(self.cache_dir):
+                if entry.name.endswith(".body"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+            if total <= self.max_bytes:
+                return
+            for _, size, body_path in sorted(entries):
+                for path in (body_path, body_path[:-len(".body")] + ".json"):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                total -= size
+                if total <= self.max_bytes:
+                    break
+        except OSError as e:
+            print(f"Error pruning HTTP cache: {e}")
+
+#######################################################
+# Browser Context Pool
+#######################################################
+
+DEFAULT_CONTEXT_ID = "default"
+MAX_BROWSER_CONTEXTS = int(os.getenv("BROWSER_MAX_CONTEXTS", "8"))
+CONTEXT_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+# Context ID bound to the request currently being handled. Every request runs in
+# its own task, so concurrent requests for different contexts don't interfere.
+active_context_id: ContextVar[str] = ContextVar("active_context_id", default=DEFAULT_CONTEXT_ID)
+
+@dataclass
+class BrowserContextState:
+    """An isolated browser context (cookies, storage, cache) with its own pages"""
+    context_id: str
+    context: BrowserContext
+    pages: List[Page] = field(default_factory=list)
+    current_page_index: int = 0
+    navigation_profile: str = DEFAULT_NAVIGATION_PROFILE
+    first_party_site: Optional[str] = None
+    created_at: datetime = field(default_factory=datetime.now)
+    last_used_at: datetime = field(default_factory=datetime.now)
+
 #######################################################
 # Browser Action Result Model
 #######################################################
@@ -266,6 +455,7 @@ class BrowserActionResult(BaseModel):
     ocr_text: Optional[str] = None  # Added field for OCR text
     
     # Additional metadata
+    context_id: str = DEFAULT_CONTEXT_ID  # Browser context the action ran in
     element_count: int = 0  # Number of interactive elements found
     interactive_elements: Optional[List[Dict[str, Any]]] = None  # Simplified list of interactive elements
     viewport_width: Optional[int] = None
@@ -280,10 +470,12 @@ class BrowserActionResult(BaseModel):
 
 class BrowserAutomation:
     def __init__(self):
-        self.router = APIRouter()
+        # Every automation route resolves its browser context from the X-Browser-Context header
+        self.router = APIRouter(dependencies=[Depends(self.bind_context)])
         self.browser: Browser = None
-        self.pages: List[Page] = []
-        self.current_page_index: int = 0
+        self.contexts: Dict[str, BrowserContextState] = {}
+        self.contexts_lock = asyncio.Lock()
+        self.http_cache = SharedHttpCache(HTTP_CACHE_DIR, HTTP_CACHE_MAX_BYTES) if HTTP_CACHE_DIR else None
         self.logger = logging.getLogger("browser_automation")
         self.include_attributes = ["id", "href", "src", "alt", "aria-label", "placeholder", "name", "role", "title", "value"]
         self.screenshot_dir = os.path.join(os.getcwd(), "screenshots")
@@ -325,6 +517,11 @@ class BrowserAutomation:
         
         # Drag and drop
         self.router.post("/automation/drag_drop")(self.drag_drop)
+        
+        # Context management
+        self.router.get("/automation/contexts")(self.list_contexts)
+        self.router.post("/automation/create_context")(self.create_context)
+        self.router.post("/automation/close_context")(self.close_context)
 
     async def startup(self):
         """Initialize the browser instance on startup"""
@@ -350,21 +547,9 @@ class BrowserAutomation:
                 self.browser = await playwright.chromium.launch(**launch_options)
                 print("Browser launched with minimal options")
 
-            try:
-                await self.get_current_page()
-                print("Found existing page, using it")
-                self.current_page_index = 0
-            except Exception as page_error:
-                print(f"Error finding existing page, creating new one. ( {page_error})")
-                page = await self.browser.new_page()
-                print("New page created successfully")
-                self.pages.append(page)
-                self.current_page_index = 0
-                # Navigate to about:blank to ensure page is ready
-                # await page.goto("google.com", timeout=30000)
-                print("Navigated to google.com")
-                
-                print("Browser initialization completed successfully")
+            await self.get_context_state(DEFAULT_CONTEXT_ID)
+            print("Default browser context created successfully")
+            print("Browser initialization completed successfully")
         except Exception as e:
             print(f"Browser startup error: {str(e)}")
             traceback.print_exc()
@@ -372,14 +557,89 @@ class BrowserAutomation:
             
     async def shutdown(self):
         """Clean up browser instance on shutdown"""
+        for state in list(self.contexts.values()):
+            try:
+                await state.context.close()
+            except Exception as e:
+                print(f"Error closing context {state.context_id}: {e}")
+        self.contexts.clear()
         if self.browser:
             await self.browser.close()
     
+    async def bind_context(self, x_browser_context: Optional[str] = Header(None)):
+        """Bind the browser context requested by the caller to the current request"""
+        context_id = x_browser_context or DEFAULT_CONTEXT_ID
+        if not CONTEXT_ID_PATTERN.match(context_id):
+            raise HTTPException(status_code=400, detail=f"Invalid browser context ID: {context_id}")
+        active_context_id.set(context_id)
+    
+    async def get_context_state(self, context_id: Optional[str] = None) -> BrowserContextState:
+        """Get a browser context from the pool, creating it with a blank page on first use"""
+        context_id = context_id or active_context_id.get()
+        state = self.contexts.get(context_id)
+        if state is None:
+            async with self.contexts_lock:
+                state = self.contexts.get(context_id)
+                if state is None:
+                    if len(self.contexts) >= MAX_BROWSER_CONTEXTS:
+                        raise HTTPException(
+                            status_code=503,
+                            detail=f"Browser context pool is full ({MAX_BROWSER_CONTEXTS} contexts). Close an unused context first."
+                        )
+                    context = await self.browser.new_context()
+                    state = BrowserContextState(context_id=context_id, context=context)
+                    await context.route("**/*", lambda route, state=state: self.route_request(state, route))
+                    state.pages.append(await context.new_page())
+                    self.contexts[context_id] = state
+                    print(f"Created browser context '{context_id}' ({len(self.contexts)}/{MAX_BROWSER_CONTEXTS})")
+        state.last_used_at = datetime.now()
+        return state
+    
+    async def route_request(self, state: BrowserContextState, route):
+        """Apply the context's page-load profile and the shared HTTP cache to a request"""
+        request = route.request
+        try:
+            host = urlparse(request.url).hostname or ""
+            if request.is_navigation_request():
+                if request.frame.parent_frame is None:
+                    state.first_party_site = get_site(host)
+                await route.continue_()
+                return
+            
+            profile = NAVIGATION_PROFILES[state.navigation_profile]
+            if request.resource_type in profile.blocked_resource_types:
+                await route.abort("blockedbyclient")
+                return
+            if profile.block_third_party and host and state.first_party_site and get_site(host) != state.first_party_site:
+                await route.abort("blockedbyclient")
+                return
+            
+            if self.http_cache and request.method == "GET" and request.resource_type in CACHEABLE_RESOURCE_TYPES:
+                cached = await asyncio.to_thread(self.http_cache.get, request.url)
+                if cached:
+                    status, headers, body = cached
+                    await route.fulfill(status=status, headers=headers, body=body)
+                    return
+                response = await route.fetch()
+                body = await response.body()
+                await asyncio.to_thread(self.http_cache.put, request.url, response.status, response.headers, body)
+                await route.fulfill(response=response, body=body)
+                return
+            
+            await route.continue_()
+        except Exception as e:
+            print(f"Error routing request {request.url}: {e}")
+            try:
+                await route.continue_()
+            except Exception:
+                pass
+    
     async def get_current_page(self) -> Page:
-        """Get the current active page"""
-        if not self.pages:
+        """Get the current active page of the request's browser context"""
+        state = await self.get_context_state()
+        if not state.pages:
             raise HTTPException(status_code=500, detail="No browser pages available")
-        return self.pages[self.current_page_index]
+        return state.pages[state.current_page_index]
     
     async def get_selector_map(self) -> Dict[int, DOMElementNode]:
         """Get a map of selectable elements on the page"""
@@ -750,6 +1010,7 @@ class BrowserAutomation:
             pixels_below=dom_state.pixels_below if dom_state else 0,
             content=content,
             ocr_text=metadata.get('ocr_text', ""),
+            context_id=active_context_id.get(),
             element_count=metadata.get('element_count', 0),
             interactive_elements=metadata.get('interactive_elements', []),
             viewport_width=metadata.get('viewport_width', 0),
@@ -761,6 +1022,13 @@ class BrowserAutomation:
     async def navigate_to(self, action: GoToUrlAction = Body(...)):
         """Navigate to a specified URL"""
         try:
+            if action.profile and action.profile not in NAVIGATION_PROFILES:
+                raise ValueError(f"Unknown page-load profile '{action.profile}'. Use one of: {', '.join(NAVIGATION_PROFILES)}")
+            
+            # The profile stays in effect for the context until the next navigation changes it
+            state = await self.get_context_state()
+            state.navigation_profile = action.profile or DEFAULT_NAVIGATION_PROFILE
+            
             page = await self.get_current_page()
             await page.goto(action.url, wait_until="domcontentloaded")
             await page.wait_for_load_state("networkidle", timeout=10000)
@@ -770,7 +1038,7 @@ class BrowserAutomation:
             
             result = self.build_action_result(
                 True,
-                f"Navigated to {action.url}",
+                f"Navigated to {action.url} (profile: {state.navigation_profile})",
                 dom_state,
                 screenshot,
                 elements,
@@ -1197,8 +1465,9 @@ class BrowserAutomation:
     async def switch_tab(self, action: SwitchTabAction = Body(...)):
         """Switch to a different tab by index"""
         try:
-            if 0 <= action.page_id < len(self.pages):
-                self.current_page_index = action.page_id
+            state = await self.get_context_state()
+            if 0 <= action.page_id < len(state.pages):
+                state.current_page_index = action.page_id
                 page = await self.get_current_page()
                 await page.wait_for_load_state()
                 
@@ -1241,8 +1510,9 @@ class BrowserAutomation:
         """Open a new tab with the specified URL"""
         try:
             print(f"Attempting to open new tab with URL: {action.url}")
-            # Create new page in same browser instance
-            new_page = await self.browser.new_page()
+            # Create new page in the request's browser context
+            state = await self.get_context_state()
+            new_page = await state.context.new_page()
             print(f"New page created successfully")
             
             # Navigate to the URL
@@ -1251,9 +1521,9 @@ class BrowserAutomation:
             print(f"Navigated to URL in new tab: {action.url}")
             
             # Add to page list and make it current
-            self.pages.append(new_page)
-            self.current_page_index = len(self.pages) - 1
-            print(f"New tab added as index {self.current_page_index}")
+            state.pages.append(new_page)
+            state.current_page_index = len(state.pages) - 1
+            print(f"New tab added as index {state.current_page_index} in context '{state.context_id}'")
             
             # Get updated state after action
             dom_state, screenshot, elements, metadata = await self.get_updated_browser_state(f"open_tab({action.url})")
@@ -1287,17 +1557,22 @@ class BrowserAutomation:
     async def close_tab(self, action: CloseTabAction = Body(...)):
         """Close a tab by index"""
         try:
-            if 0 <= action.page_id < len(self.pages):
-                page = self.pages[action.page_id]
+            state = await self.get_context_state()
+            if 0 <= action.page_id < len(state.pages):
+                page = state.pages[action.page_id]
                 url = page.url
                 await page.close()
-                self.pages.pop(action.page_id)
+                state.pages.pop(action.page_id)
+                
+                # Keep at least one page open in the context
+                if not state.pages:
+                    state.pages.append(await state.context.new_page())
                 
                 # Adjust current index if needed
-                if self.current_page_index >= len(self.pages):
-                    self.current_page_index = max(0, len(self.pages) - 1)
-                elif self.current_page_index >= action.page_id:
-                    self.current_page_index = max(0, self.current_page_index - 1)
+                if state.current_page_index >= len(state.pages):
+                    state.current_page_index = max(0, len(state.pages) - 1)
+                elif state.current_page_index >= action.page_id:
+                    state.current_page_index = max(0, state.current_page_index - 1)
                 
                 # Get updated state after action
                 page = await self.get_current_page()
@@ -1789,6 +2064,113 @@ class BrowserAutomation:
                 error=str(e),
                 content=None
             )
+    
+    # Context Management Actions
+    
+    async def list_contexts(self):
+        """List the browser contexts in the pool and their open pages"""
+        contexts = []
+        for state in self.contexts.values():
+            contexts.append({
+                "context_id": state.context_id,
+                "pages": [page.url for page in state.pages],
+                "current_page_index": state.current_page_index,
+                "navigation_profile": state.navigation_profile,
+                "created_at": state.created_at.isoformat(),
+                "last_used_at": state.last_used_at.isoformat()
+            })
+        return {
+            "success": True,
+            "message": f"{len(contexts)} of {MAX_BROWSER_CONTEXTS} browser contexts in use",
+            "contexts": contexts
+        }
+    
+    async def create_context(self, action: ContextAction = Body(...)):
+        """Create an isolated browser context (or reuse it if it already exists)"""
+        try:
+            if not CONTEXT_ID_PATTERN.match(action.context_id):
+                raise HTTPException(status_code=400, detail=f"Invalid browser context ID: {action.context_id}")
+            active_context_id.set(action.context_id)
+            await self.get_context_state(action.context_id)
+            
+            # Get state of the context's current page
+            dom_state, screenshot, elements, metadata = await self.get_updated_browser_state(f"create_context({action.context_id})")
+            
+            return self.build_action_result(
+                True,
+                f"Browser context '{action.context_id}' is ready",
+                dom_state,
+                screenshot,
+                elements,
+                metadata,
+                error="",
+                content=None
+            )
+        except HTTPException:
+            raise
+        except Exception as e:
+            return self.build_action_result(
+                False,
+                str(e),
+                None,
+                "",
+                "",
+                {},
+                error=str(e),
+                content=None
+            )
+    
+    async def close_context(self, action: ContextAction = Body(...)):
+        """Close a browser context and all of its pages"""
+        try:
+            if action.context_id == DEFAULT_CONTEXT_ID:
+                return self.build_action_result(
+                    False,
+                    "The default browser context cannot be closed",
+                    None,
+                    "",
+                    "",
+                    {},
+                    error="The default browser context cannot be closed"
+                )
+            
+            async with self.contexts_lock:
+                state = self.contexts.pop(action.context_id, None)
+            if state is None:
+                return self.build_action_result(
+                    False,
+                    f"Browser context '{action.context_id}' not found",
+                    None,
+                    "",
+                    "",
+                    {},
+                    error=f"Browser context '{action.context_id}' not found"
+                )
+            
+            await state.context.close()
+            print(f"Closed browser context '{action.context_id}' ({len(self.contexts)}/{MAX_BROWSER_CONTEXTS})")
+            
+            return self.build_action_result(
+                True,
+                f"Closed browser context '{action.context_id}' with {len(state.pages)} page(s)",
+                None,
+                "",
+                "",
+                {},
+                error="",
+                content=None
+            )
+        except Exception as e:
+            return self.build_action_result(
+                False,
+                str(e),
+                None,
+                "",
+                "",
+                {},
+                error=str(e),
+                content=None
+            )
 
 # Create singleton instance
 automation_service = BrowserAutomation()
@@ -1,10 +1,13 @@
 
+import json
+from datetime import datetime, timezone
 from typing import Optional
 
 from agentpress.thread_manager import ThreadManager
 from agentpress.tool import Tool
 from daytona_sdk import Sandbox
 from sandbox.sandbox import get_or_start_sandbox
+from services import redis
 from utils.logger import logger
 from utils.files_utils import clean_path
 
@@ -14,10 +17,11 @@ class SandboxToolsBase(Tool):
     # Class variable to track if sandbox URLs have been printed
     _urls_printed = False
     
-    def __init__(self, project_id: str, thread_manager: Optional[ThreadManager] = None):
+    def __init__(self, project_id: str, thread_manager: Optional[ThreadManager] = None, agent_run_id: Optional[str] = None):
         super().__init__()
         self.project_id = project_id
         self.thread_manager = thread_manager
+        self.agent_run_id = agent_run_id  # Lets long-running tools report progress to the run's stream
         self.workspace_path = "/workspace"
         self._sandbox = None
         self._sandbox_id = None
@@ -86,4 +90,31 @@ class SandboxToolsBase(Tool):
         """Clean and normalize a path to be relative to /workspace."""
         cleaned_path = clean_path(path, self.workspace_path)
         logger.debug(f"Cleaned path: {path} -> {cleaned_path}")
-        return cleaned_path
\ No newline at end of file
+        return cleaned_path
+
+    def fs_resource(self, path: str) -> str:
+        """Name of the ToolAccess resource for a path in the workspace."""
+        cleaned_path = self.clean_path(path).strip("/")
+        return f"fs:{cleaned_path}" if cleaned_path else "fs"
+
+    async def publish_status_event(self, content: dict) -> bool:
+        """Push a status event to the agent run's response stream.
+        
+        The event is appended to the run's Redis response list and announced on its
+        channel, the same way agent responses are, so connected clients receive it live.
+        Does nothing when the tool isn't running as part of an agent run.
+        """
+        if not self.agent_run_id:
+            return False
+        try:
+            await redis.rpush(f"agent_run:{self.agent_run_id}:responses", json.dumps({
+                "type": "status",
+                "content": json.dumps(content),
+                "metadata": json.dumps({}),
+                "created_at": datetime.now(timezone.utc).isoformat()
+            }))
+            await redis.publish(f"agent_run:{self.agent_run_id}:new_response", "new")
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to publish status event for agent run {self.agent_run_id}: {str(e)}")
+            return False
@@ -198,6 +198,30 @@ async def calculate_monthly_usage(client, user_id: str) -> float:
     
     return total_seconds / 60  # Convert to minutes
 
+def get_subscription_tier(subscription: Optional[Dict]) -> Dict:
+    """
+    Get the tier info (name and minutes) of a subscription.
+    
+    Returns:
+        Dict: The matching entry of SUBSCRIPTION_TIERS, the free tier if there is no subscription or the tier is unknown
+    """
+    if not subscription:
+        return SUBSCRIPTION_TIERS[config.STRIPE_FREE_TIER_ID]
+    
+    # Extract price ID from subscription items
+    price_id = None
+    if subscription.get('items') and subscription['items'].get('data') and len(subscription['items']['data']) > 0:
+        price_id = subscription['items']['data'][0]['price']['id']
+    else:
+        price_id = subscription.get('price_id', config.STRIPE_FREE_TIER_ID)
+    
+    # Get tier info - default to free tier if not found
+    tier_info = SUBSCRIPTION_TIERS.get(price_id)
+    if not tier_info:
+        logger.warning(f"Unknown subscription tier: {price_id}, defaulting to free tier")
+        tier_info = SUBSCRIPTION_TIERS[config.STRIPE_FREE_TIER_ID]
+    return tier_info
+
 async def check_billing_status(client, user_id: str) -> Tuple[bool, str, Optional[Dict]]:
     """
     Check if a user can run agents based on their subscription and usage.
@@ -224,18 +248,7 @@ async def check_billing_status(client, user_id: str) -> Tuple[bool, str, Optiona
             'plan_name': 'free'
         }
     
-    # Extract price ID from subscription items
-    price_id = None
-    if subscription.get('items') and subscription['items'].get('data') and len(subscription['items']['data']) > 0:
-        price_id = subscription['items']['data'][0]['price']['id']
-    else:
-        price_id = subscription.get('price_id', config.STRIPE_FREE_TIER_ID)
-    
-    # Get tier info - default to free tier if not found
-    tier_info = SUBSCRIPTION_TIERS.get(price_id)
-    if not tier_info:
-        logger.warning(f"Unknown subscription tier: {price_id}, defaulting to free tier")
-        tier_info = SUBSCRIPTION_TIERS[config.STRIPE_FREE_TIER_ID]
+    tier_info = get_subscription_tier(subscription)
     
     # Calculate current month's usage
     current_usage = await calculate_monthly_usage(client, user_id)
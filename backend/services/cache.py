@@ -0,0 +1,94 @@
+"""
+Shared content cache backed by Redis.
+
+Entries live in namespaces (e.g. "web_search"). Each namespace keeps an index
+of its entries ordered by write time plus a running byte total, and evicts the
+oldest entries once the total exceeds the namespace's size budget. Entries also
+expire on their own TTL. An expired entry keeps counting towards the budget
+until eviction reaches it, which only makes eviction slightly eager.
+
+Cache errors are logged and treated as misses so callers never fail because of
+the cache.
+"""
+
+import hashlib
+import json
+import time
+from typing import Any, Optional
+
+from services import redis
+from utils.logger import logger
+
+CACHE_PREFIX = "content_cache"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Stores an entry, updates the namespace's index, sizes and byte total, and evicts
+# the oldest entries while the total is over budget, all atomically so concurrent
+# writers can't skew the total.
+# KEYS: entry, index, sizes, total. ARGV: data, ttl, size, written_at, max_bytes.
+PUT_SCRIPT = """
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+local size = tonumber(ARGV[3])
+local previous_size = tonumber(redis.call('HGET', KEYS[3], KEYS[1]) or '0')
+redis.call('HSET', KEYS[3], KEYS[1], size)
+redis.call('ZADD', KEYS[2], ARGV[4], KEYS[1])
+local total = redis.call('INCRBY', KEYS[4], size - previous_size)
+local max_bytes = tonumber(ARGV[5])
+local evicted = 0
+while total > max_bytes do
+    local oldest = redis.call('ZPOPMIN', KEYS[2])
+    if #oldest == 0 then
+        break
+    end
+    local evicted_size = tonumber(redis.call('HGET', KEYS[3], oldest[1]) or '0')
+    redis.call('HDEL', KEYS[3], oldest[1])
+    redis.call('DEL', oldest[1])
+    total = redis.call('INCRBY', KEYS[4], -evicted_size)
+    evicted = evicted + 1
+end
+return evicted
+"""
+
+
+def make_key(*parts: Any) -> str:
+    """Build a fixed-length cache key from already-normalized parts."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _entry_key(namespace: str, key: str) -> str:
+    return f"{CACHE_PREFIX}:{namespace}:entry:{key}"
+
+
+async def get(namespace: str, key: str) -> Optional[dict]:
+    """Return the cached entry as {"value", "cached_at"}, or None on a miss."""
+    try:
+        data = await redis.get(_entry_key(namespace, key))
+        return json.loads(data) if data else None
+    except Exception as e:
+        logger.warning(f"Cache lookup failed in {namespace}: {str(e)}")
+        return None
+
+
+async def put(namespace: str, key: str, value: Any, ttl: int, max_bytes: int = DEFAULT_MAX_BYTES) -> bool:
+    """Store a JSON-serializable value and evict old entries if the namespace is over budget."""
+    entry_key = _entry_key(namespace, key)
+    index_key = f"{CACHE_PREFIX}:{namespace}:index"
+    sizes_key = f"{CACHE_PREFIX}:{namespace}:sizes"
+    total_key = f"{CACHE_PREFIX}:{namespace}:bytes"
+    try:
+        data = json.dumps({"value": value, "cached_at": time.time()}, ensure_ascii=False)
+        size = len(data.encode())
+        if size > max_bytes:
+            return False
+
+        evicted = await redis.eval_script(
+            PUT_SCRIPT,
+            [entry_key, index_key, sizes_key, total_key],
+            [data, ttl, size, time.time(), max_bytes]
+        )
+        if evicted:
+            logger.debug(f"Evicted {evicted} entries from cache namespace {namespace}")
+        return True
+    except Exception as e:
+        logger.warning(f"Cache write failed in {namespace}: {str(e)}")
+        return False
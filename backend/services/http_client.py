@@ -0,0 +1,120 @@
+import asyncio
+import importlib.util
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Optional
+from urllib.parse import urlparse
+
+import httpx
+from utils.logger import logger
+
+# Shared HTTP client
+client: Optional[httpx.AsyncClient] = None
+
+# Constants
+MAX_CONNECTIONS = 100
+MAX_KEEPALIVE_CONNECTIONS = 20
+KEEPALIVE_EXPIRY = 60.0  # Keep idle connections around long enough to reuse across tool calls
+DEFAULT_TIMEOUT = httpx.Timeout(30.0, connect=10.0)
+
+# Per-host limits enforced by host_limit()
+MAX_CONCURRENT_PER_HOST = 4
+MIN_REQUEST_INTERVAL_PER_HOST = 0.1  # Seconds between request starts to the same host
+MAX_HOST_LIMITERS = 1024  # Hosts whose limiter is kept; least recently used idle ones are dropped
+
+
+def initialize():
+    """Create the shared, connection-pooled HTTP client."""
+    global client
+
+    # HTTP/2 needs the optional h2 package; fall back to HTTP/1.1 keep-alive without it
+    http2 = importlib.util.find_spec("h2") is not None
+    logger.info(f"Initializing shared HTTP client (http2: {http2})")
+
+    client = httpx.AsyncClient(
+        http2=http2,
+        timeout=DEFAULT_TIMEOUT,
+        limits=httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY
+        ),
+        follow_redirects=True
+    )
+
+    return client
+
+
+def get_client() -> httpx.AsyncClient:
+    """Get the shared HTTP client, initializing if necessary."""
+    if client is None or client.is_closed:
+        initialize()
+    return client
+
+
+async def close():
+    """Close the shared HTTP client."""
+    global client
+    if client:
+        logger.info("Closing shared HTTP client")
+        await client.aclose()
+        client = None
+
+
+class _HostLimiter:
+    """Bounds concurrency and spaces out request starts for a single host."""
+
+    def __init__(self, max_concurrent: int, min_interval: float):
+        self.semaphore = asyncio.Semaphore(max_concurrent)
+        self.min_interval = min_interval
+        self.next_start = 0.0
+        self.lock = asyncio.Lock()
+        self.users = 0  # Requests holding or waiting for the limiter
+
+    async def wait_turn(self):
+        async with self.lock:
+            now = time.monotonic()
+            delay = self.next_start - now
+            self.next_start = max(now, self.next_start) + self.min_interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+_host_limiters: "OrderedDict[str, _HostLimiter]" = OrderedDict()
+
+
+def _evict_idle_limiters():
+    """Drop the least recently used limiters that no request holds until MAX_HOST_LIMITERS are left."""
+    for host in list(_host_limiters):
+        if len(_host_limiters) <= MAX_HOST_LIMITERS:
+            break
+        if _host_limiters[host].users == 0:
+            del _host_limiters[host]
+
+
+@asynccontextmanager
+async def host_limit(url: str, max_concurrent: int = MAX_CONCURRENT_PER_HOST, min_interval: float = MIN_REQUEST_INTERVAL_PER_HOST):
+    """Rate limit a request to the host of the given URL.
+
+    Meant for sites the agent scrapes, to stay polite to them. The limits apply
+    to the whole process, so don't use it for provider APIs that every run
+    calls; those signal backpressure with 429s instead.
+
+    The limits of a host are fixed by the first caller that uses it.
+    """
+    host = (urlparse(url).hostname or url).lower()
+    limiter = _host_limiters.get(host)
+    if limiter is None:
+        limiter = _host_limiters[host] = _HostLimiter(max_concurrent, min_interval)
+        _evict_idle_limiters()
+    else:
+        _host_limiters.move_to_end(host)
+
+    limiter.users += 1
+    try:
+        async with limiter.semaphore:
+            await limiter.wait_turn()
+            yield
+    finally:
+        limiter.users -= 1
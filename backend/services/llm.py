@@ -5,7 +5,8 @@ This module provides a unified interface for making API calls to different LLM p
 (OpenAI, Anthropic, Groq, etc.) using LiteLLM. It includes support for:
 - Streaming responses
 - Tool calls and function calling
-- Retry logic with exponential backoff
+- Retry logic with jittered exponential backoff
+- Cluster-wide rate limiting per provider and model (see services.llm_rate_limiter)
 - Model-specific configurations
 - Comprehensive error handling and logging
 """
@@ -14,8 +15,10 @@ from typing import Union, Dict, Any, Optional, AsyncGenerator, List
 import os
 import json
 import asyncio
+import random
 from openai import OpenAIError
 import litellm
+from services import llm_rate_limiter
 from utils.logger import logger
 from utils.config import config
 
@@ -23,9 +26,9 @@ from utils.config import config
 litellm.modify_params=True
 
 # Constants
-MAX_RETRIES = 2
-RATE_LIMIT_DELAY = 30
-RETRY_DELAY = 0.1
+MAX_RETRIES = 4
+RETRY_DELAY = 1  # Base of the exponential backoff between attempts
+MAX_RETRY_DELAY = 30
 
 class LLMError(Exception):
     """Base exception for LLM-related errors."""
@@ -64,12 +67,28 @@ def setup_api_keys() -> None:
     else:
         logger.warning(f"Missing AWS credentials for Bedrock integration - access_key: {bool(aws_access_key)}, secret_key: {bool(aws_secret_key)}, region: {aws_region}")
 
-async def handle_error(error: Exception, attempt: int, max_attempts: int) -> None:
-    """Handle API errors with appropriate delays and logging."""
-    delay = RATE_LIMIT_DELAY if isinstance(error, litellm.exceptions.RateLimitError) else RETRY_DELAY
+async def handle_error(error: Exception, attempt: int, max_attempts: int, model_name: str) -> Optional[float]:
+    """Handle API errors with appropriate delays and logging.
+
+    Returns:
+        Cooldown of a rate limit error that is left to the rate limiter, else None
+    """
     logger.warning(f"Error on attempt {attempt + 1}/{max_attempts}: {str(error)}")
-    logger.debug(f"Waiting {delay} seconds before retry...")
+    if attempt + 1 >= max_attempts:
+        return None
+
+    if isinstance(error, litellm.exceptions.RateLimitError):
+        cooldown = await llm_rate_limiter.record_rate_limit_error(model_name, error)
+        if config.LLM_RATE_LIMIT_MAX_WAIT > 0:
+            # The next attempt waits out the cooldown in the rate limiter, along with every other call to the model
+            return cooldown
+        delay = cooldown * random.uniform(1, 1.25)
+    else:
+        # Full jitter, so calls that failed together don't retry together
+        delay = random.uniform(0, min(MAX_RETRY_DELAY, RETRY_DELAY * 2 ** attempt))
+    logger.debug(f"Waiting {delay:.1f} seconds before retry...")
     await asyncio.sleep(delay)
+    return None
 
 def prepare_params(
     messages: List[Dict[str, Any]],
@@ -297,20 +316,28 @@ async def make_llm_api_call(
         enable_thinking=enable_thinking,
         reasoning_effort=reasoning_effort
     )
+    estimated_tokens = llm_rate_limiter.estimate_tokens(messages, tools)
     last_error = None
+    cooldown = None
     for attempt in range(MAX_RETRIES):
         try:
             logger.debug(f"Attempt {attempt + 1}/{MAX_RETRIES}")
             # logger.debug(f"API request parameters: {json.dumps(params, indent=2)}")
 
+            if not await llm_rate_limiter.acquire(model_name, estimated_tokens) and cooldown:
+                # The limiter didn't hold the retry back (Redis unavailable or cooldown too long), so back off here
+                delay = min(cooldown, config.LLM_RATE_LIMIT_MAX_WAIT) * random.uniform(1, 1.25)
+                logger.debug(f"Waiting {delay:.1f} seconds before retry...")
+                await asyncio.sleep(delay)
             response = await litellm.acompletion(**params)
             logger.debug(f"Successfully received API response from {model_name}")
             logger.debug(f"Response: {response}")
+            await llm_rate_limiter.record_response(model_name, response)
             return response
 
         except (litellm.exceptions.RateLimitError, OpenAIError, json.JSONDecodeError) as e:
             last_error = e
-            await handle_error(e, attempt, MAX_RETRIES)
+            cooldown = await handle_error(e, attempt, MAX_RETRIES, model_name)
 
         except Exception as e:
             logger.error(f"Unexpected error during API call: {str(e)}", exc_info=True)
@@ -0,0 +1,216 @@
+"""
+Cluster-wide rate limiting of LLM API calls.
+
+Every provider+model pair gets two token buckets in Redis, one for requests
+and one for tokens per minute, shared by all processes. Their sizes are
+learned from the rate limit headers of the provider's responses, so nothing
+has to be configured per account tier. Before each call, make_llm_api_call
+takes a request and its estimated input tokens from the buckets, waiting
+(with jitter, so waiters don't wake up in lockstep) until they are available.
+
+When a provider still answers with a rate limit error, its Retry-After is
+stored as a cooldown that every caller of that model waits out, instead of
+each run retrying on its own schedule.
+
+Redis keys:
+    llm_rate_limit:{provider}:{model}:bucket     Bucket levels and time of the last update
+    llm_rate_limit:{provider}:{model}:limits     Requests and tokens per minute, from response headers
+    llm_rate_limit:{provider}:{model}:cooldown   Time until which the model is rate limited
+"""
+
+import asyncio
+import random
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import litellm
+
+from services import redis
+from utils.config import config
+from utils.json_utils import dumps
+from utils.logger import logger
+
+LIMITS_TTL = 3600          # Seconds learned limits are kept without being confirmed by a response
+DEFAULT_COOLDOWN = 30      # Seconds to pause a model after a rate limit error without Retry-After
+WAIT_JITTER = 0.25         # Fraction of the wait added at random
+MIN_WAIT = 0.05            # Seconds; shortest sleep between attempts to acquire
+CHARS_PER_TOKEN = 4        # For estimating the input tokens of a call
+
+# Rate limit headers by provider convention, without litellm's "llm_provider-" prefix
+REQUEST_LIMIT_HEADERS = ["x-ratelimit-limit-requests", "anthropic-ratelimit-requests-limit"]
+TOKEN_LIMIT_HEADERS = [
+    "x-ratelimit-limit-tokens",
+    "anthropic-ratelimit-input-tokens-limit",
+    "anthropic-ratelimit-tokens-limit",
+]
+
+# Refills both buckets for the time since the last call and takes one request
+# and ARGV[2] tokens if both have enough; otherwise returns the seconds to wait.
+# A limit of 0 (not learned yet) means that bucket doesn't limit.
+ACQUIRE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local cost = tonumber(ARGV[2])
+local cooldown = tonumber(redis.call('GET', KEYS[3]) or '0')
+if cooldown > now then
+    return tostring(cooldown - now)
+end
+
+local rpm = tonumber(redis.call('HGET', KEYS[2], 'rpm') or '0')
+local tpm = tonumber(redis.call('HGET', KEYS[2], 'tpm') or '0')
+if rpm <= 0 and tpm <= 0 then
+    return '0'
+end
+
+local state = redis.call('HMGET', KEYS[1], 'requests', 'tokens', 'updated_at')
+local elapsed = math.max(0, now - (tonumber(state[3]) or now))
+local requests = 0
+local tokens = 0
+local wait = 0
+if rpm > 0 then
+    requests = math.min(rpm, (tonumber(state[1]) or rpm) + elapsed * rpm / 60)
+    if requests < 1 then
+        wait = math.max(wait, (1 - requests) * 60 / rpm)
+    end
+end
+if tpm > 0 then
+    -- A call larger than the whole bucket would never fit; let it drain the bucket instead
+    cost = math.min(cost, tpm)
+    tokens = math.min(tpm, (tonumber(state[2]) or tpm) + elapsed * tpm / 60)
+    if tokens < cost then
+        wait = math.max(wait, (cost - tokens) * 60 / tpm)
+    end
+end
+if wait == 0 then
+    requests = requests - 1
+    tokens = tokens - cost
+end
+
+redis.call('HSET', KEYS[1], 'requests', tostring(requests), 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('EXPIRE', KEYS[1], 120)
+return tostring(wait)
+"""
+
+# Limits this process last stored, so unchanged headers don't cause writes
+_known_limits: Dict[str, Tuple[int, int]] = {}
+
+
+def get_rate_limit_key(model_name: str) -> str:
+    """Key prefix of the buckets of a model, e.g. "llm_rate_limit:anthropic:claude-3-7-sonnet-latest"."""
+    try:
+        model, provider, _, _ = litellm.get_llm_provider(model_name)
+    except Exception:
+        provider, _, model = model_name.rpartition("/")
+        provider = provider or "unknown"
+    return f"llm_rate_limit:{provider}:{model}"
+
+
+def estimate_tokens(messages: List[Dict[str, Any]], tools: Optional[List[Dict[str, Any]]] = None) -> int:
+    """Rough count of the input tokens of a call; precise counting costs more than it saves here."""
+    size = len(dumps(messages))
+    if tools:
+        size += len(dumps(tools))
+    return size // CHARS_PER_TOKEN
+
+
+def _jittered(delay: float) -> float:
+    return max(MIN_WAIT, delay) * (1 + random.uniform(0, WAIT_JITTER))
+
+
+async def acquire(model_name: str, tokens: int) -> bool:
+    """Wait until the model's rate limits allow a call with `tokens` input tokens.
+
+    Waits at most LLM_RATE_LIMIT_MAX_WAIT seconds; after that, or if Redis isn't
+    reachable, the call goes ahead and the provider's own limit applies.
+
+    Returns:
+        True if the limits (and any cooldown) allow the call, False if it goes
+        ahead without them: limiter disabled, Redis unavailable or wait too long
+    """
+    max_wait = config.LLM_RATE_LIMIT_MAX_WAIT
+    if max_wait <= 0:
+        return False
+
+    key = get_rate_limit_key(model_name)
+    keys = [f"{key}:bucket", f"{key}:limits", f"{key}:cooldown"]
+    started_at = time.monotonic()
+    while True:
+        try:
+            wait = float(await redis.eval_script(ACQUIRE_SCRIPT, keys, [time.time(), tokens]))
+        except Exception as e:
+            logger.warning(f"LLM rate limiter unavailable for {model_name}, not waiting: {e}")
+            return False
+
+        waited = time.monotonic() - started_at
+        if wait <= 0:
+            if waited > 0:
+                logger.info(f"Waited {waited:.1f}s for the rate limit of {model_name}")
+            return True
+        if waited + wait > max_wait:
+            logger.warning(f"Rate limit of {model_name} needs another {wait:.1f}s after {waited:.1f}s, sending the call anyway")
+            return False
+        await asyncio.sleep(_jittered(wait))
+
+
+def _response_headers(response: Any) -> Dict[str, str]:
+    """Provider response headers that litellm attached to a response, lowercased and unprefixed."""
+    hidden_params = getattr(response, "_hidden_params", None) or {}
+    headers = hidden_params.get("additional_headers") or {}
+    return {name.lower().removeprefix("llm_provider-"): value for name, value in headers.items()}
+
+
+def _first_int(headers: Dict[str, str], names: List[str]) -> int:
+    for name in names:
+        try:
+            return int(float(headers[name]))
+        except (KeyError, TypeError, ValueError):
+            continue
+    return 0
+
+
+async def record_response(model_name: str, response: Any) -> None:
+    """Learn the model's rate limits from the headers of a response."""
+    headers = _response_headers(response)
+    limits = (_first_int(headers, REQUEST_LIMIT_HEADERS), _first_int(headers, TOKEN_LIMIT_HEADERS))
+    if limits == (0, 0):
+        return
+
+    key = get_rate_limit_key(model_name)
+    if _known_limits.get(key) == limits:
+        return
+    try:
+        await redis.hset_mapping(f"{key}:limits", {"rpm": limits[0], "tpm": limits[1]})
+        await redis.expire(f"{key}:limits", LIMITS_TTL)
+        _known_limits[key] = limits
+        logger.info(f"Rate limits of {model_name}: {limits[0]} requests/min, {limits[1]} tokens/min")
+    except Exception as e:
+        logger.warning(f"Failed to store rate limits of {model_name}: {e}")
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Seconds from the Retry-After header of a rate limit error, if there is one."""
+    headers = getattr(error, "litellm_response_headers", None)
+    if headers is None:
+        headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    for name in ("retry-after", "llm_provider-retry-after"):
+        try:
+            return float(headers.get(name))
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+async def record_rate_limit_error(model_name: str, error: Exception) -> float:
+    """Pause all calls to the model until the provider's Retry-After has passed.
+
+    Returns:
+        Seconds of the cooldown
+    """
+    cooldown = _retry_after(error) or DEFAULT_COOLDOWN
+    key = get_rate_limit_key(model_name)
+    try:
+        await redis.set(f"{key}:cooldown", str(time.time() + cooldown), ex=int(cooldown) + 1)
+    except Exception as e:
+        logger.warning(f"Failed to store rate limit cooldown of {model_name}: {e}")
+    return cooldown
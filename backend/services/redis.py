@@ -3,7 +3,7 @@ import os
 from dotenv import load_dotenv
 import asyncio
 from utils.logger import logger
-from typing import List, Any
+from typing import List, Any, Dict, Optional, AsyncIterator
 
 # Redis client
 client = None
@@ -12,6 +12,8 @@ _init_lock = asyncio.Lock()
 
 # Constants
 REDIS_KEY_TTL = 3600 * 24  # 24 hour TTL as safety mechanism
+PUBSUB_READ_TIMEOUT = 1.0  # Seconds; below the client's socket timeout
+PUBSUB_RETRY_DELAY = 1.0  # Seconds to wait before reading again after a connection error
 
 
 def initialize():
@@ -71,6 +73,7 @@ async def initialize_async():
 async def close():
     """Close Redis connection."""
     global client, _initialized
+    await _multiplexer.close()
     if client:
         logger.info("Closing Redis connection")
         await client.aclose()
@@ -119,6 +122,125 @@ async def create_pubsub():
     return redis_client.pubsub()
 
 
+class Subscription:
+    """Messages published to a set of channels, received through the shared pubsub connection.
+
+    Messages are dicts with "channel" and "data" keys, in the order they arrived.
+    Create with subscribe() and close when done.
+    """
+
+    def __init__(self, multiplexer: 'PubSubMultiplexer', channels: List[str]):
+        self.channels = channels
+        self._multiplexer = multiplexer
+        self._queue: asyncio.Queue = asyncio.Queue()
+
+    def deliver(self, message: Dict[str, Any]) -> None:
+        self._queue.put_nowait(message)
+
+    async def get(self) -> Dict[str, Any]:
+        """Wait for the next message."""
+        return await self._queue.get()
+
+    async def listen(self) -> AsyncIterator[Dict[str, Any]]:
+        """Iterate over messages as they arrive."""
+        while True:
+            yield await self._queue.get()
+
+    async def close(self) -> None:
+        """Stop receiving messages, unsubscribing channels nobody else listens to."""
+        await self._multiplexer.unsubscribe(self)
+
+
+class PubSubMultiplexer:
+    """One pubsub connection per process, shared by all subscriptions.
+
+    Channels are subscribed on Redis while at least one subscription needs them,
+    and a single reader task dispatches each message to the queues of the
+    subscriptions of its channel. This keeps the number of pubsub connections
+    at one per worker, however many runs and stream viewers it serves.
+    """
+
+    def __init__(self):
+        self._pubsub = None
+        self._reader: Optional[asyncio.Task] = None
+        self._subscriptions: Dict[str, List[Subscription]] = {}  # Channel -> its subscriptions
+        self._lock = asyncio.Lock()
+
+    async def subscribe(self, *channels: str) -> Subscription:
+        subscription = Subscription(self, list(channels))
+        async with self._lock:
+            if self._pubsub is None:
+                redis_client = await get_client()
+                self._pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+
+            new_channels = [channel for channel in channels if channel not in self._subscriptions]
+            for channel in channels:
+                self._subscriptions.setdefault(channel, []).append(subscription)
+            if new_channels:
+                await self._pubsub.subscribe(*new_channels)
+
+            if self._reader is None or self._reader.done():
+                self._reader = asyncio.create_task(self._read_messages())
+        return subscription
+
+    async def unsubscribe(self, subscription: Subscription) -> None:
+        async with self._lock:
+            unused_channels = []
+            for channel in subscription.channels:
+                subscriptions = self._subscriptions.get(channel)
+                if subscriptions is None or subscription not in subscriptions:
+                    continue
+                subscriptions.remove(subscription)
+                if not subscriptions:
+                    del self._subscriptions[channel]
+                    unused_channels.append(channel)
+            if unused_channels and self._pubsub is not None:
+                try:
+                    await self._pubsub.unsubscribe(*unused_channels)
+                except Exception as e:
+                    logger.warning(f"Failed to unsubscribe from {unused_channels}: {e}")
+
+    async def _read_messages(self) -> None:
+        """Dispatch incoming messages to the subscriptions of their channel."""
+        while True:
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=PUBSUB_READ_TIMEOUT)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # redis-py reconnects and subscribes to the channels again on the next read
+                logger.warning(f"Error reading from shared pubsub connection: {e}")
+                await asyncio.sleep(PUBSUB_RETRY_DELAY)
+                continue
+
+            if not message or message.get("type") != "message":
+                continue
+            for subscription in list(self._subscriptions.get(message["channel"], ())):
+                subscription.deliver(message)
+
+    async def close(self) -> None:
+        if self._reader:
+            self._reader.cancel()
+            try: await self._reader
+            except asyncio.CancelledError: pass
+            self._reader = None
+        if self._pubsub is not None:
+            try:
+                await self._pubsub.aclose()
+            except Exception as e:
+                logger.warning(f"Error closing shared pubsub connection: {e}")
+            self._pubsub = None
+        self._subscriptions.clear()
+
+
+_multiplexer = PubSubMultiplexer()
+
+
+async def subscribe(*channels: str) -> Subscription:
+    """Subscribe to channels through the process-wide pubsub connection."""
+    return await _multiplexer.subscribe(*channels)
+
+
 # List operations
 async def rpush(key: str, *values: Any):
     """Append one or more values to a list."""
@@ -138,6 +260,42 @@ async def llen(key: str) -> int:
     return await redis_client.llen(key)
 
 
+async def lpush(key: str, *values: Any):
+    """Prepend one or more values to a list."""
+    redis_client = await get_client()
+    return await redis_client.lpush(key, *values)
+
+
+async def ltrim(key: str, start: int, end: int):
+    """Trim a list to the given range."""
+    redis_client = await get_client()
+    return await redis_client.ltrim(key, start, end)
+
+
+async def blpop(keys: List[str], timeout: float):
+    """Remove and return the first element of the first non-empty list, waiting up to timeout seconds."""
+    redis_client = await get_client()
+    return await redis_client.blpop(keys, timeout)
+
+
+async def lrem(key: str, count: int, value: Any) -> int:
+    """Remove occurrences of a value from a list."""
+    redis_client = await get_client()
+    return await redis_client.lrem(key, count, value)
+
+
+async def lmove(source: str, destination: str, src: str = "RIGHT", dest: str = "LEFT"):
+    """Atomically move an element from one list to another."""
+    redis_client = await get_client()
+    return await redis_client.lmove(source, destination, src, dest)
+
+
+async def blmove(source: str, destination: str, timeout: float, src: str = "RIGHT", dest: str = "LEFT"):
+    """Like lmove, but wait up to timeout seconds for an element (keep it below the socket timeout)."""
+    redis_client = await get_client()
+    return await redis_client.blmove(source, destination, timeout, src, dest)
+
+
 # Key management
 async def expire(key: str, time: int):
     """Set a key's time to live in seconds."""
@@ -148,4 +306,73 @@ async def expire(key: str, time: int):
 async def keys(pattern: str) -> List[str]:
     """Get keys matching a pattern."""
     redis_client = await get_client()
-    return await redis_client.keys(pattern)
\ No newline at end of file
+    return await redis_client.keys(pattern)
+
+
+async def exists(*keys: str) -> int:
+    """Count how many of the keys exist."""
+    redis_client = await get_client()
+    return await redis_client.exists(*keys)
+
+# Hash operations
+async def hget(key: str, field: str):
+    """Get the value of a hash field."""
+    redis_client = await get_client()
+    return await redis_client.hget(key, field)
+
+
+async def hset(key: str, field: str, value: Any):
+    """Set the value of a hash field."""
+    redis_client = await get_client()
+    return await redis_client.hset(key, field, value)
+
+
+async def hdel(key: str, *fields: str):
+    """Delete one or more hash fields."""
+    redis_client = await get_client()
+    return await redis_client.hdel(key, *fields)
+
+
+async def hgetall(key: str) -> dict:
+    """Get all fields and values of a hash."""
+    redis_client = await get_client()
+    return await redis_client.hgetall(key)
+
+
+async def hset_mapping(key: str, mapping: dict):
+    """Set multiple hash fields."""
+    redis_client = await get_client()
+    return await redis_client.hset(key, mapping=mapping)
+
+
+# Set operations
+async def sadd(key: str, *members: Any):
+    """Add one or more members to a set."""
+    redis_client = await get_client()
+    return await redis_client.sadd(key, *members)
+
+
+async def srem(key: str, *members: Any):
+    """Remove one or more members from a set."""
+    redis_client = await get_client()
+    return await redis_client.srem(key, *members)
+
+
+async def smembers(key: str):
+    """Get all members of a set."""
+    redis_client = await get_client()
+    return await redis_client.smembers(key)
+
+
+# Counters
+async def incrby(key: str, amount: int = 1) -> int:
+    """Increment the integer value of a key."""
+    redis_client = await get_client()
+    return await redis_client.incrby(key, amount)
+
+
+# Scripting
+async def eval_script(script: str, keys: List[str], args: List[Any]):
+    """Run a Lua script atomically (cached server-side by its SHA)."""
+    redis_client = await get_client()
+    return await redis_client.register_script(script)(keys=keys, args=args)
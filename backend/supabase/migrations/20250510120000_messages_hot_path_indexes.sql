@@ -0,0 +1,125 @@
+-- Indexes for the hot message queries, which filter by thread and type or
+-- is_llm_message and order by created_at. With only single-column indexes on
+-- thread_id and created_at, every lookup read and sorted the whole thread.
+--
+-- The indexes are built without CONCURRENTLY because migrations run inside a
+-- transaction. On a large production table, create them CONCURRENTLY by hand
+-- first; the IF NOT EXISTS clauses then make this migration a no-op.
+
+-- Listing a thread's messages in order, with message_id as the tiebreaker for
+-- keyset pagination. Also covers lookups by thread_id alone, so it replaces
+-- idx_messages_thread_id.
+CREATE INDEX IF NOT EXISTS idx_messages_thread_id_created_at_message_id
+    ON messages(thread_id, created_at, message_id);
+
+DROP INDEX IF EXISTS idx_messages_thread_id;
+
+-- "Latest message of type X in a thread" (browser_state, image_context, summary)
+CREATE INDEX IF NOT EXISTS idx_messages_thread_id_type_created_at
+    ON messages(thread_id, type, created_at DESC);
+
+-- "Latest conversation message in a thread", checked before every agent iteration
+CREATE INDEX IF NOT EXISTS idx_messages_thread_id_conversation_created_at
+    ON messages(thread_id, created_at DESC)
+    WHERE type IN ('assistant', 'tool', 'user');
+
+-- LLM messages of a thread after its latest summary (get_llm_formatted_messages
+-- and the context manager's summarization)
+CREATE INDEX IF NOT EXISTS idx_messages_thread_id_llm_created_at
+    ON messages(thread_id, created_at)
+    WHERE is_llm_message = TRUE;
+
+-- Same behavior as before, but the messages after the latest summary are
+-- selected with a created_at range the index above can serve. Previously the
+-- condition was only an OR, so every LLM message of the thread had to be read.
+CREATE OR REPLACE FUNCTION get_llm_formatted_messages(p_thread_id UUID)
+RETURNS JSONB
+SECURITY DEFINER -- Changed to SECURITY DEFINER to allow service role access
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    messages_array JSONB := '[]'::JSONB;
+    has_access BOOLEAN;
+    current_role TEXT;
+    latest_summary_id UUID;
+    latest_summary_time TIMESTAMP WITH TIME ZONE;
+    is_project_public BOOLEAN;
+BEGIN
+    -- Get current role
+    SELECT current_user INTO current_role;
+
+    -- Check if associated project is public
+    SELECT p.is_public INTO is_project_public
+    FROM threads t
+    LEFT JOIN projects p ON t.project_id = p.project_id
+    WHERE t.thread_id = p_thread_id;
+
+    -- Skip access check for service_role or public projects
+    IF current_role = 'authenticated' AND NOT is_project_public THEN
+        -- Check if thread exists and user has access
+        SELECT EXISTS (
+            SELECT 1 FROM threads t
+            LEFT JOIN projects p ON t.project_id = p.project_id
+            WHERE t.thread_id = p_thread_id
+            AND (
+                basejump.has_role_on_account(t.account_id) = true OR
+                basejump.has_role_on_account(p.account_id) = true
+            )
+        ) INTO has_access;
+
+        IF NOT has_access THEN
+            RAISE EXCEPTION 'Thread not found or access denied';
+        END IF;
+    END IF;
+
+    -- Find the latest summary message if it exists
+    SELECT message_id, created_at
+    INTO latest_summary_id, latest_summary_time
+    FROM messages
+    WHERE thread_id = p_thread_id
+    AND type = 'summary'
+    AND is_llm_message = TRUE
+    ORDER BY created_at DESC
+    LIMIT 1;
+
+    -- Parse content if it's stored as a string and return proper JSON objects
+    WITH parsed_messages AS (
+        SELECT
+            message_id,
+            CASE
+                WHEN jsonb_typeof(content) = 'string' THEN content::text::jsonb
+                ELSE content
+            END AS parsed_content,
+            created_at,
+            type
+        FROM messages
+        WHERE thread_id = p_thread_id
+        AND is_llm_message = TRUE
+        -- Range on the index; the summary itself is at latest_summary_time
+        AND created_at >= COALESCE(latest_summary_time, '-infinity'::TIMESTAMP WITH TIME ZONE)
+        AND (
+            -- Include the latest summary and all messages after it,
+            -- or all messages if no summary exists
+            latest_summary_id IS NULL
+            OR message_id = latest_summary_id
+            OR created_at > latest_summary_time
+        )
+        ORDER BY created_at
+    )
+    SELECT JSONB_AGG(parsed_content ORDER BY created_at)
+    INTO messages_array
+    FROM parsed_messages;
+
+    -- Handle the case when no messages are found
+    IF messages_array IS NULL THEN
+        RETURN '[]'::JSONB;
+    END IF;
+
+    RETURN messages_array;
+END;
+$$;
+
+-- Grant execute permissions
+GRANT EXECUTE ON FUNCTION get_llm_formatted_messages TO authenticated, anon, service_role;
+
+ANALYZE messages;
@@ -0,0 +1,116 @@
+-- Keyset-paginated message retrieval for threads.
+--
+-- get_thread_messages returns one page of a thread's messages ordered by
+-- (created_at, message_id). The next page starts after the last row of the
+-- previous one (p_cursor_created_at, p_cursor_message_id), so every page is an
+-- index range scan no matter how deep into the thread it is. Filtering by type
+-- happens on the server, and the large base64 payloads of browser_state and
+-- image_context messages can be left out.
+--
+-- The function runs with the caller's privileges, so the messages RLS
+-- policies decide which threads can be read. The keyset order is served by
+-- idx_messages_thread_id_created_at_message_id.
+
+-- Removes the base64 payloads from browser_state and image_context content,
+-- keeping the content's representation (JSON object or JSON-encoded string)
+CREATE OR REPLACE FUNCTION strip_heavy_message_fields(p_type TEXT, p_content JSONB)
+RETURNS JSONB
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT CASE
+        WHEN p_type NOT IN ('browser_state', 'image_context') THEN p_content
+        WHEN jsonb_typeof(p_content) = 'object' THEN
+            p_content - 'screenshot_base64' - 'base64' || '{"heavy_fields_omitted": true}'::jsonb
+        WHEN jsonb_typeof(p_content) = 'string' AND left(p_content #>> '{}', 1) = '{' THEN
+            to_jsonb((((p_content #>> '{}')::jsonb - 'screenshot_base64' - 'base64') || '{"heavy_fields_omitted": true}'::jsonb)::text)
+        ELSE p_content
+    END;
+$$;
+
+CREATE OR REPLACE FUNCTION get_thread_messages(
+    p_thread_id UUID,
+    p_limit INTEGER DEFAULT 100,
+    p_cursor_created_at TIMESTAMP WITH TIME ZONE DEFAULT NULL,
+    p_cursor_message_id UUID DEFAULT NULL,
+    p_ascending BOOLEAN DEFAULT TRUE,
+    p_types TEXT[] DEFAULT NULL,
+    p_exclude_types TEXT[] DEFAULT NULL,
+    p_llm_only BOOLEAN DEFAULT FALSE,
+    p_since_latest_summary BOOLEAN DEFAULT FALSE,
+    p_include_heavy_fields BOOLEAN DEFAULT TRUE
+)
+RETURNS TABLE (
+    message_id UUID,
+    thread_id UUID,
+    type TEXT,
+    is_llm_message BOOLEAN,
+    content JSONB,
+    metadata JSONB,
+    created_at TIMESTAMP WITH TIME ZONE,
+    updated_at TIMESTAMP WITH TIME ZONE
+)
+LANGUAGE plpgsql
+STABLE
+AS $$
+DECLARE
+    page_size INTEGER := LEAST(GREATEST(COALESCE(p_limit, 100), 1), 1000);
+    latest_summary_id UUID;
+    latest_summary_time TIMESTAMP WITH TIME ZONE;
+BEGIN
+    -- Like get_llm_formatted_messages: the latest summary and everything after it
+    IF p_since_latest_summary THEN
+        SELECT m.message_id, m.created_at
+        INTO latest_summary_id, latest_summary_time
+        FROM messages m
+        WHERE m.thread_id = p_thread_id
+        AND m.type = 'summary'
+        AND m.is_llm_message = TRUE
+        ORDER BY m.created_at DESC
+        LIMIT 1;
+    END IF;
+
+    -- Without a cursor start from either end, so the keyset condition is
+    -- always a plain range on the index
+    IF p_ascending THEN
+        RETURN QUERY
+        SELECT m.message_id, m.thread_id, m.type, m.is_llm_message,
+            CASE WHEN p_include_heavy_fields THEN m.content ELSE strip_heavy_message_fields(m.type, m.content) END,
+            m.metadata, m.created_at, m.updated_at
+        FROM messages m
+        WHERE m.thread_id = p_thread_id
+        AND (m.created_at, m.message_id) > (
+            COALESCE(p_cursor_created_at, '-infinity'::TIMESTAMP WITH TIME ZONE),
+            COALESCE(p_cursor_message_id, '00000000-0000-0000-0000-000000000000'::UUID)
+        )
+        AND m.created_at >= COALESCE(latest_summary_time, '-infinity'::TIMESTAMP WITH TIME ZONE)
+        AND (latest_summary_id IS NULL OR m.message_id = latest_summary_id OR m.created_at > latest_summary_time)
+        AND (p_types IS NULL OR m.type = ANY(p_types))
+        AND (p_exclude_types IS NULL OR m.type <> ALL(p_exclude_types))
+        AND (NOT p_llm_only OR m.is_llm_message = TRUE)
+        ORDER BY m.created_at, m.message_id
+        LIMIT page_size;
+    ELSE
+        RETURN QUERY
+        SELECT m.message_id, m.thread_id, m.type, m.is_llm_message,
+            CASE WHEN p_include_heavy_fields THEN m.content ELSE strip_heavy_message_fields(m.type, m.content) END,
+            m.metadata, m.created_at, m.updated_at
+        FROM messages m
+        WHERE m.thread_id = p_thread_id
+        AND (m.created_at, m.message_id) < (
+            COALESCE(p_cursor_created_at, 'infinity'::TIMESTAMP WITH TIME ZONE),
+            COALESCE(p_cursor_message_id, 'ffffffff-ffff-ffff-ffff-ffffffffffff'::UUID)
+        )
+        AND m.created_at >= COALESCE(latest_summary_time, '-infinity'::TIMESTAMP WITH TIME ZONE)
+        AND (latest_summary_id IS NULL OR m.message_id = latest_summary_id OR m.created_at > latest_summary_time)
+        AND (p_types IS NULL OR m.type = ANY(p_types))
+        AND (p_exclude_types IS NULL OR m.type <> ALL(p_exclude_types))
+        AND (NOT p_llm_only OR m.is_llm_message = TRUE)
+        ORDER BY m.created_at DESC, m.message_id DESC
+        LIMIT page_size;
+    END IF;
+END;
+$$;
+
+GRANT EXECUTE ON FUNCTION strip_heavy_message_fields TO authenticated, anon, service_role;
+GRANT EXECUTE ON FUNCTION get_thread_messages TO authenticated, anon, service_role;
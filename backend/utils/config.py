@@ -125,6 +125,23 @@ class Configuration:
     # Model configuration
     MODEL_TO_USE: Optional[str] = "anthropic/claude-3-7-sonnet-latest"
     
+    # Agent configuration
+    # XML tool calls executed per assistant turn; independent calls run concurrently
+    AGENT_MAX_XML_TOOL_CALLS: int = 8
+    # Streamed content chunks are merged over this window (0 disables) or up to this size
+    AGENT_STREAM_AGGREGATION_WINDOW_MS: int = 40
+    AGENT_STREAM_AGGREGATION_MAX_BYTES: int = 2048
+    # Agent runs are queued in Redis and executed by agent workers. API processes run an
+    # embedded worker unless disabled, e.g. when dedicated workers (python -m agent.worker) are deployed
+    AGENT_WORKER_EMBEDDED: bool = True
+    AGENT_WORKER_MAX_RUNS: int = 10
+    AGENT_WORKER_MIN_FREE_MEMORY_MB: int = 512
+    # Runs waiting for a worker beyond which new runs are turned away with a 503
+    AGENT_MAX_QUEUED_RUNS: int = 500
+    # LLM calls wait for the provider's request/token rate limits, learned from response headers,
+    # up to this many seconds before being sent anyway (0 disables the limiter)
+    LLM_RATE_LIMIT_MAX_WAIT: int = 120
+    
     # Supabase configuration
     SUPABASE_URL: str
     SUPABASE_ANON_KEY: str
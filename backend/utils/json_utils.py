@@ -0,0 +1,65 @@
+"""
+JSON encoding for the agent response stream.
+
+Responses are serialized once where they are produced and the encoded string
+is passed on through Redis to the SSE writer unchanged. Uses orjson when it is
+installed and falls back to the standard library.
+
+Usage:
+    from utils.json_utils import dumps, loads, EncodedMessage, encode_message
+
+    chunk = EncodedMessage.encode({"type": "assistant", ...})
+    await redis.rpush(key, encode_message(chunk))  # No second serialization
+"""
+
+import json
+from typing import Any, Dict, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(obj: Any) -> str:
+    """Serialize an object to a JSON string."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+        except TypeError:
+            # Types orjson doesn't support (e.g. ints beyond 64 bits) still work below
+            pass
+    return json.dumps(obj)
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """Deserialize a JSON string."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class EncodedMessage(dict):
+    """A message that carries its JSON encoding, so it is only serialized once.
+
+    Behaves like the plain message dict for code that inspects it. The message
+    must not be modified after encoding.
+
+    Attributes:
+        encoded (str): The JSON encoding of the message
+    """
+    __slots__ = ("encoded",)
+
+    @classmethod
+    def encode(cls, message: Dict[str, Any]) -> 'EncodedMessage':
+        """Wrap a message dict and serialize it."""
+        encoded_message = cls(message)
+        encoded_message.encoded = dumps(message)
+        return encoded_message
+
+
+def encode_message(message: Dict[str, Any]) -> str:
+    """Return the JSON encoding of a message, reusing it if it was already encoded."""
+    if isinstance(message, EncodedMessage):
+        return message.encoded
+    return dumps(message)
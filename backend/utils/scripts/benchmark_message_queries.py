@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+"""
+Script to benchmark the hot message queries against large threads.
+
+Usage:
+    python benchmark_message_queries.py <account_id> [--threads N] [--messages N] [--runs N] [--keep]
+
+This script:
+1. Creates a project for the account with N threads of M messages each, mixing message
+   types like real agent threads (conversation, status, browser state, image context, summaries)
+2. Runs the message queries made on every agent iteration against each thread
+3. Reports p50/p95/max latency per query
+4. Deletes the seeded project, which cascades to its threads and messages, unless --keep is given
+
+Run it before and after applying an index migration (e.g.
+20250510120000_messages_hot_path_indexes.sql) against the same database to compare.
+
+Make sure your environment variables are properly set:
+- SUPABASE_URL
+- SUPABASE_SERVICE_ROLE_KEY
+"""
+
+import asyncio
+import sys
+import time
+import argparse
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Any, Callable, Awaitable, Tuple
+from dotenv import load_dotenv
+
+# Load script-specific environment variables
+load_dotenv(".env")
+
+from services.supabase import DBConnection
+from utils.logger import logger
+
+INSERT_BATCH_SIZE = 500
+
+
+def seed_message(thread_id: str, index: int, created_at: datetime) -> Dict[str, Any]:
+    """Build the index-th message of a seeded thread."""
+    if index % 1000 == 999:
+        message_type, is_llm_message = "summary", True
+    elif index % 200 == 199:
+        message_type, is_llm_message = "image_context", False
+    elif index % 50 == 49:
+        message_type, is_llm_message = "browser_state", False
+    elif index % 5 == 4:
+        message_type, is_llm_message = "status", False
+    else:
+        message_type, is_llm_message = ("user", "assistant", "tool", "assistant")[index % 5], True
+
+    return {
+        "thread_id": thread_id,
+        "type": message_type,
+        "is_llm_message": is_llm_message,
+        "content": {"role": "assistant" if message_type != "user" else "user", "content": f"Seeded message {index} " + "x" * 200},
+        "metadata": {},
+        "created_at": created_at.isoformat()
+    }
+
+
+async def seed_threads(client, account_id: str, thread_count: int, message_count: int) -> Tuple[str, List[str]]:
+    """Create a project with thread_count threads of message_count messages each.
+
+    Returns:
+        Tuple of the project ID and the thread IDs
+    """
+    project = await client.table('projects').insert({
+        "name": "Message query benchmark",
+        "account_id": account_id
+    }).execute()
+    project_id = project.data[0]['project_id']
+
+    thread_ids = []
+    start = datetime.now(timezone.utc) - timedelta(days=1)
+    for thread_index in range(thread_count):
+        thread = await client.table('threads').insert({
+            "account_id": account_id,
+            "project_id": project_id
+        }).execute()
+        thread_id = thread.data[0]['thread_id']
+        thread_ids.append(thread_id)
+
+        for batch_start in range(0, message_count, INSERT_BATCH_SIZE):
+            batch = [
+                seed_message(thread_id, index, start + timedelta(milliseconds=index))
+                for index in range(batch_start, min(batch_start + INSERT_BATCH_SIZE, message_count))
+            ]
+            await client.table('messages').insert(batch).execute()
+
+        logger.info(f"Seeded thread {thread_index + 1}/{thread_count} ({thread_id}) with {message_count} messages")
+
+    return project_id, thread_ids
+
+
+def hot_queries(client) -> Dict[str, Callable[[str], Awaitable[Any]]]:
+    """The message queries made by the agent loop, keyed by a short name."""
+
+    async def latest_summary(thread_id: str):
+        return await client.table('messages').select('created_at') \
+            .eq('thread_id', thread_id) \
+            .eq('type', 'summary') \
+            .eq('is_llm_message', True) \
+            .order('created_at', desc=True) \
+            .limit(1) \
+            .execute()
+
+    async def messages_since_summary(thread_id: str):
+        summary = await latest_summary(thread_id)
+        query = client.table('messages').select('*').eq('thread_id', thread_id).eq('is_llm_message', True)
+        if summary.data:
+            query = query.gt('created_at', summary.data[0]['created_at'])
+        return await query.order('created_at').execute()
+
+    return {
+        "latest conversation message": lambda thread_id: client.table('messages').select('*')
+            .eq('thread_id', thread_id).in_('type', ['assistant', 'tool', 'user'])
+            .order('created_at', desc=True).limit(1).execute(),
+        "latest browser_state": lambda thread_id: client.table('messages').select('*')
+            .eq('thread_id', thread_id).eq('type', 'browser_state')
+            .order('created_at', desc=True).limit(1).execute(),
+        "latest image_context": lambda thread_id: client.table('messages').select('*')
+            .eq('thread_id', thread_id).eq('type', 'image_context')
+            .order('created_at', desc=True).limit(1).execute(),
+        "latest summary": latest_summary,
+        "messages since summary": messages_since_summary,
+        "get_llm_formatted_messages": lambda thread_id: client.rpc(
+            'get_llm_formatted_messages', {'p_thread_id': thread_id}
+        ).execute()
+    }
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def run_benchmark(client, thread_ids: List[str], runs: int) -> None:
+    """Run every hot query `runs` times per thread and print latency statistics."""
+    print(f"\n{'query':<30} {'p50 ms':>10} {'p95 ms':>10} {'max ms':>10}")
+    for name, query in hot_queries(client).items():
+        # Warm up connections and caches so the first run doesn't skew the numbers
+        await query(thread_ids[0])
+
+        latencies = []
+        for _ in range(runs):
+            for thread_id in thread_ids:
+                started = time.perf_counter()
+                await query(thread_id)
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        latencies.sort()
+        print(f"{name:<30} {percentile(latencies, 0.5):>10.1f} {percentile(latencies, 0.95):>10.1f} {latencies[-1]:>10.1f}")
+
+
+async def main():
+    """Main function to run the script."""
+    parser = argparse.ArgumentParser(description='Benchmark the hot message queries against large seeded threads')
+    parser.add_argument('account_id', help='Account that will own the seeded project')
+    parser.add_argument('--threads', type=int, default=3, help='Number of threads to seed (default: 3)')
+    parser.add_argument('--messages', type=int, default=5000, help='Messages per thread (default: 5000)')
+    parser.add_argument('--runs', type=int, default=20, help='Runs of each query per thread (default: 20)')
+    parser.add_argument('--keep', action='store_true', help='Keep the seeded data instead of deleting it')
+    args = parser.parse_args()
+
+    db = DBConnection()
+    client = await db.client
+    project_id = None
+
+    try:
+        project_id, thread_ids = await seed_threads(client, args.account_id, args.threads, args.messages)
+        await run_benchmark(client, thread_ids, args.runs)
+    except Exception as e:
+        logger.error(f"Error during benchmark: {str(e)}")
+        sys.exit(1)
+    finally:
+        if project_id and not args.keep:
+            await client.table('projects').delete().eq('project_id', project_id).execute()
+            logger.info(f"Deleted seeded project {project_id}")
+        elif project_id:
+            logger.info(f"Kept seeded project {project_id}")
+        # Clean up database connection
+        await DBConnection.disconnect()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,4 +1,4 @@
-import React, { useMemo } from 'react';
+import React, { useEffect, useMemo, useState } from 'react';
 import {
   Globe,
   MonitorPlay,
@@ -17,6 +17,7 @@ import {
 import { ApiMessageType } from '@/components/thread/types';
 import { safeJsonParse } from '@/components/thread/utils';
 import { cn } from '@/lib/utils';
+import { getMessageContent } from '@/lib/api';
 
 export function BrowserToolView({
   name = 'browser-operation',
@@ -72,6 +73,7 @@ export function BrowserToolView({
 
   // Find the browser_state message and extract the screenshot
   let screenshotBase64: string | null = null;
+  let screenshotOmitted = false;
   if (browserStateMessageId && messages.length > 0) {
     const browserStateMessage = messages.find(
       (msg) =>
@@ -80,14 +82,45 @@ export function BrowserToolView({
     );
 
     if (browserStateMessage) {
-      const browserStateContent = safeJsonParse<{ screenshot_base64?: string }>(
-        browserStateMessage.content,
-        {},
-      );
+      const browserStateContent = safeJsonParse<{
+        screenshot_base64?: string;
+        heavy_fields_omitted?: boolean;
+      }>(browserStateMessage.content, {});
       screenshotBase64 = browserStateContent?.screenshot_base64 || null;
+      screenshotOmitted = Boolean(browserStateContent?.heavy_fields_omitted);
     }
   }
 
+  // Messages are loaded without screenshots, so fetch this one on demand
+  const [loadedScreenshot, setLoadedScreenshot] = useState<{
+    messageId: string;
+    base64: string | null;
+  } | null>(null);
+
+  useEffect(() => {
+    if (!screenshotOmitted || !browserStateMessageId) return;
+    if (loadedScreenshot?.messageId === browserStateMessageId) return;
+
+    let cancelled = false;
+    const messageId = browserStateMessageId;
+    getMessageContent(messageId)
+      .then((content) => {
+        if (cancelled) return;
+        const parsed = safeJsonParse<{ screenshot_base64?: string }>(content, {});
+        setLoadedScreenshot({ messageId, base64: parsed?.screenshot_base64 || null });
+      })
+      .catch((error) => {
+        console.error('[BrowserToolView] Error loading screenshot:', error);
+      });
+    return () => {
+      cancelled = true;
+    };
+  }, [screenshotOmitted, browserStateMessageId, loadedScreenshot?.messageId]);
+
+  if (!screenshotBase64 && loadedScreenshot?.messageId === browserStateMessageId) {
+    screenshotBase64 = loadedScreenshot.base64;
+  }
+
   // Check if we have a VNC preview URL from the project
   const vncPreviewUrl = project?.sandbox?.vnc_preview
     ? `${project.sandbox.vnc_preview}/vnc_lite.html?password=${project?.sandbox?.pass}&autoconnect=true&scale=local&width=1024&height=768`
@@ -327,6 +327,33 @@ export function useAgentStream(
                 setToolCall(null);
               }
               break;
+            case 'run_resumed': {
+              // The run was interrupted and another worker repeats the last iteration:
+              // drop its partial output and the messages it saved (rolled back on the server)
+              console.log(
+                `[useAgentStream] Run resumed after iteration ${parsedContent.iteration}, discarding the interrupted iteration.`,
+              );
+              setTextContent('');
+              setToolCall(null);
+              const currentThreadId = threadIdRef.current;
+              if (currentThreadId) {
+                getMessages(currentThreadId)
+                  .then((messagesData: ApiMessageType[]) => {
+                    if (isMountedRef.current && messagesData) {
+                      setMessagesRef.current(
+                        mapApiMessagesToUnified(messagesData, currentThreadId),
+                      );
+                    }
+                  })
+                  .catch((err) => {
+                    console.error(
+                      `[useAgentStream] Error refetching messages for thread ${currentThreadId} after resume:`,
+                      err,
+                    );
+                  });
+              }
+              break;
+            }
             case 'thread_run_end':
               console.log(
                 '[useAgentStream] Received thread run end status, finalizing.',
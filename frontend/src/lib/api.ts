@@ -481,25 +481,102 @@ export const addUserMessage = async (
   }
 };
 
-export const getMessages = async (threadId: string): Promise<Message[]> => {
+export type MessageCursor = {
+  created_at: string;
+  message_id: string;
+};
+
+export type MessagesPageOptions = {
+  limit?: number;
+  cursor?: MessageCursor | null;
+  ascending?: boolean;
+  types?: string[];
+  excludeTypes?: string[];
+  // Include the base64 screenshots/images of browser_state and image_context messages
+  includeHeavyFields?: boolean;
+};
+
+export type MessagesPage = {
+  messages: Message[];
+  nextCursor: MessageCursor | null;
+};
+
+// Fetches one page of a thread's messages, ordered by (created_at, message_id)
+export const getMessagesPage = async (
+  threadId: string,
+  {
+    limit = 200,
+    cursor = null,
+    ascending = true,
+    types,
+    excludeTypes,
+    includeHeavyFields = false,
+  }: MessagesPageOptions = {},
+): Promise<MessagesPage> => {
   const supabase = createClient();
 
-  const { data, error } = await supabase
-    .from('messages')
-    .select('*')
-    .eq('thread_id', threadId)
-    .neq('type', 'cost')
-    .neq('type', 'summary')
-    .order('created_at', { ascending: true });
+  const { data, error } = await supabase.rpc('get_thread_messages', {
+    p_thread_id: threadId,
+    p_limit: limit,
+    p_cursor_created_at: cursor?.created_at ?? null,
+    p_cursor_message_id: cursor?.message_id ?? null,
+    p_ascending: ascending,
+    p_types: types ?? null,
+    p_exclude_types: excludeTypes ?? null,
+    p_include_heavy_fields: includeHeavyFields,
+  });
 
   if (error) {
     console.error('Error fetching messages:', error);
     throw new Error(`Error getting messages: ${error.message}`);
   }
 
-  console.log('[API] Messages fetched:', data);
+  const messages = data || [];
+  const last = messages[messages.length - 1];
+  return {
+    messages,
+    nextCursor:
+      messages.length >= limit && last
+        ? { created_at: last.created_at, message_id: last.message_id }
+        : null,
+  };
+};
+
+export const getMessages = async (threadId: string): Promise<Message[]> => {
+  // Screenshots and images are left out; views load them on demand with getMessageContent
+  const messages: Message[] = [];
+  let cursor: MessageCursor | null = null;
+  do {
+    const page: MessagesPage = await getMessagesPage(threadId, {
+      cursor,
+      limit: 500,
+      excludeTypes: ['cost', 'summary', 'status'],
+    });
+    messages.push(...page.messages);
+    cursor = page.nextCursor;
+  } while (cursor);
+
+  console.log('[API] Messages fetched:', messages.length);
+
+  return messages;
+};
+
+// Fetches the full content of a single message, e.g. a browser_state screenshot
+export const getMessageContent = async (messageId: string): Promise<string | null> => {
+  const supabase = createClient();
+
+  const { data, error } = await supabase
+    .from('messages')
+    .select('content')
+    .eq('message_id', messageId)
+    .single();
+
+  if (error) {
+    console.error('Error fetching message content:', error);
+    throw new Error(`Error getting message content: ${error.message}`);
+  }
 
-  return data || [];
+  return data?.content ?? null;
 };
 
 // Agent APIs
@@ -571,6 +648,20 @@ export const startAgent = async (
         }
       }
 
+      // Too many concurrent agents (429) or agents at capacity (503)
+      if (response.status === 429 || response.status === 503) {
+        const errorData = await response.json().catch(() => null);
+        console.error(
+          `[API] Agent not admitted (${response.status}):`,
+          errorData,
+        );
+        const message =
+          typeof errorData?.detail?.message === 'string'
+            ? errorData.detail.message
+            : `Error starting agent: ${response.statusText} (${response.status})`;
+        throw new Error(message);
+      }
+
       // Handle other errors
       const errorText = await response
         .text()